@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare the url and regex template filters with plain re.sub calls, on many urls.
+
+Usage:
+
+.. code-block:: shell
+
+    poetry run python benchmarks/bench_filters.py --calls 100000
+"""
+
+import argparse
+import re
+import timeit
+
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+from punchbox.utils import ansible
+
+
+def reference_url_to_port(st: str, default_port: Any = None) -> Any:
+    port_string = re.sub(".*:([0-9]+).*", "\\1", st)
+    return default_port if port_string == st else port_string
+
+
+def reference_url_to_path(st: str) -> str:
+    path_string = re.sub("[^/]*/(.*)", "/\\1", st)
+    return "/" if path_string == st else path_string
+
+
+def reference_url_to_host(st: str) -> str:
+    return re.sub(":.*", "", st)
+
+
+def reference_regex_subst(st: str, pat: str, repl: str) -> str:
+    return re.sub(pat, repl, st)
+
+
+def urls(calls: int) -> List[str]:
+    return [
+        f"server{i % 500}.punch:{9000 + i % 100}/path/{i}" if i % 3 else f"server{i}"
+        for i in range(calls)
+    ]
+
+
+def best_of(action: Callable[[], Any], repeat: int) -> float:
+    return min(timeit.repeat(action, number=1, repeat=repeat))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    values = urls(args.calls)
+    filters: Dict[str, Tuple[Callable[..., Any], Callable[..., Any], Tuple]] = {
+        "url_to_port": (reference_url_to_port, ansible.url_to_port, ("9999",)),
+        "url_to_path": (reference_url_to_path, ansible.url_to_path, ()),
+        "url_to_host": (reference_url_to_host, ansible.url_to_host, ()),
+        "regex_subst": (
+            reference_regex_subst,
+            ansible.regex_subst,
+            ("server([0-9]+)", "node\\1"),
+        ),
+    }
+    print(f"{args.calls} calls per filter")
+    for name, (reference, current, extra) in filters.items():
+        expected = [reference(value, *extra) for value in values]
+        assert [current(value, *extra) for value in values] == expected
+        assert current(values, *extra) == expected
+        before = best_of(lambda: [reference(v, *extra) for v in values], args.repeat)
+        after = best_of(lambda: [current(v, *extra) for v in values], args.repeat)
+        bulk = best_of(lambda: current(values, *extra), args.repeat)
+        print(
+            f"{name:<12} re.sub {before:7.3f}s  precompiled {after:7.3f}s "
+            f"x{before / after:.1f}  one list call {bulk:7.3f}s x{before / bulk:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
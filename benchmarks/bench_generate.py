@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Time every phase of the configuration generation, on synthetic platforms of growing size.
+
+The phases are the blueprint passes, the blueprint yaml dump, the deployment settings
+and resolver renders and the legacy json conversion. Each one is timed on its own,
+the best of several runs is kept. The results are written to a json report, pass a
+previous report with --baseline to compare them and catch regressions.
+
+Usage:
+
+.. code-block:: shell
+
+    poetry run python benchmarks/bench_generate.py --output report.json
+    poetry run python benchmarks/bench_generate.py --baseline report.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from synthetic import SERVICES
+from synthetic import synthetic_platform
+
+from punchbox.generate import generate_helper
+from punchbox.generate import layered_settings
+from punchbox.generate.layered_settings import LayeredSettings
+from punchbox.utils import serialization
+
+TEMPLATES_DIR: str = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "conf",
+    "deployment_templates",
+)
+DEPLOYMENT_TEMPLATE: str = os.path.join(TEMPLATES_DIR, "deployment.settings.j2")
+RESOLVER_TEMPLATE: str = os.path.join(TEMPLATES_DIR, "resolv.hjson.j2")
+VERSIONS: Dict[str, str] = {service: "6.4.5" for service in SERVICES}
+# the component versions the deployment settings template reads, besides the services
+TEMPLATE_VERSIONS: Dict[str, str] = {**VERSIONS, "elastic": "7.10.2"}
+
+
+def timed(
+    action: Callable[[], Any], timings: Dict[str, List[float]], phase: str
+) -> Any:
+    start = time.perf_counter()
+    result = action()
+    timings.setdefault(phase, []).append(time.perf_counter() - start)
+    return result
+
+
+def resolver_context(topology: Dict[str, Any]) -> Dict[str, Any]:
+    """The shipped resolver template reads the service hosts from 'topology' and 'punch'"""
+    hosts: Dict[str, List[str]] = {}
+    for server, server_settings in topology["servers"].items():
+        for service in server_settings["services"]:
+            hosts.setdefault(service["service"], []).append(server)
+    # both <service>[0] and <service>.servers[0] are used
+    services = {
+        service: {0: servers[0], "servers": servers}
+        for service, servers in hosts.items()
+    }
+    return {"topology": {"services": services}, "punch": services, "security": True}
+
+
+def fill_services(
+    blueprint: Dict[str, Any], settings: Dict[str, Any], topology: Dict[str, Any]
+) -> None:
+    """Add the services, their clusters and their servers to the blueprint
+
+    compute_blueprint_service_settings builds them but does not keep them in the
+    blueprint. The same layered settings are added here, so that the yaml dump and
+    the renders that follow grow with the platform size.
+    """
+    topology_index = generate_helper.compile_topology_index(topology)
+    for service_name, service in settings["services"].items():
+        service_settings = service.get("settings", {})
+        clusters: Dict[str, Any] = {}
+        for cluster_name, server_names in topology_index.get(service_name, {}).items():
+            cluster = service.get("clusters", {}).get(cluster_name, {})
+            cluster_settings = LayeredSettings(
+                cluster.get("settings", {}), service_settings
+            )
+            clusters[cluster_name] = {
+                "settings": cluster_settings,
+                "servers": {
+                    server_name: {
+                        "settings": cluster_settings.over(
+                            topology["servers"][server_name].get("settings", {})
+                        )
+                    }
+                    for server_name in server_names
+                },
+            }
+        blueprint["services"][service_name] = {
+            "settings": LayeredSettings(settings["platform"], service_settings),
+            "clusters": clusters,
+        }
+
+
+def run_phases(
+    settings: Dict[str, Any], topology: Dict[str, Any], timings: Dict[str, List[float]]
+) -> Dict[str, int]:
+    """Run the whole generation once, timing each phase
+
+    :return: the size, in bytes, of each generated document
+    """
+    blueprint: Dict[str, Any] = {
+        "services": {},
+        "platform": LayeredSettings(settings["platform"]),
+    }
+    timed(
+        lambda: generate_helper.compute_blueprint_setting(
+            blueprint, settings, topology
+        ),
+        timings,
+        "compute_blueprint_setting",
+    )
+    # not timed, the generation itself does not keep the services
+    fill_services(blueprint, settings, topology)
+    timed(
+        lambda: generate_helper.compute_blueprint_users(blueprint, topology),
+        timings,
+        "compute_blueprint_users",
+    )
+    timed(
+        lambda: generate_helper.compute_blueprint_versions(blueprint, None, VERSIONS),
+        timings,
+        "compute_blueprint_versions",
+    )
+    blueprint = timed(
+        lambda: generate_helper.substitute_local_user(
+            layered_settings.materialise(blueprint), "operator", "operator"
+        ),
+        timings,
+        "materialise",
+    )
+    document = timed(lambda: serialization.dump_yaml(blueprint), timings, "yaml_dump")
+    deployment_settings = timed(
+        lambda: generate_helper.render_template(
+            DEPLOYMENT_TEMPLATE, {**blueprint, "versions": TEMPLATE_VERSIONS}
+        ),
+        timings,
+        "deployment_render",
+    )
+    context = resolver_context(topology)
+    resolver = timed(
+        lambda: generate_helper.render_template(RESOLVER_TEMPLATE, context),
+        timings,
+        "resolver_render",
+    )
+    legacy = timed(
+        lambda: generate_helper.legacy_settings(deployment_settings),
+        timings,
+        "legacy_json",
+    )
+    return {
+        "blueprint_bytes": len(document),
+        "deployment_settings_bytes": len(deployment_settings),
+        "resolver_bytes": len(resolver),
+        "legacy_bytes": len(legacy),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(
+    sizes: List[int], repeat: int, services_per_server: int, clusters_per_service: int
+) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for servers in sizes:
+        settings, topology = synthetic_platform(
+            servers, services_per_server, clusters_per_service
+        )
+        # a first untimed run, the templates are compiled once per process
+        sizes_in_bytes = run_phases(settings, topology, {})
+        timings: Dict[str, List[float]] = {}
+        for _ in range(repeat):
+            run_phases(settings, topology, timings)
+        phases = {phase: min(values) for phase, values in timings.items()}
+        results[str(servers)] = {"phases": phases, "sizes": sizes_in_bytes}
+        total = sum(phases.values())
+        print(f"{servers:>6} servers  {total:8.3f}s")
+        for phase, seconds in phases.items():
+            print(f"         {phase:<28} {seconds:8.4f}s")
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "libyaml": serialization.LIBYAML,
+            "repeat": repeat,
+            "services_per_server": services_per_server,
+            "clusters_per_service": clusters_per_service,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    report: Dict[str, Any], baseline: Dict[str, Any], threshold: float, noise: float
+) -> List[str]:
+    """Return the phases slower than in the baseline by more than threshold
+
+    :param noise: phases faster than that, in seconds, in both reports are ignored
+    """
+    regressions: List[str] = []
+    print(f"compared to {baseline['meta'].get('commit')}:")
+    for servers, result in report["results"].items():
+        previous = baseline["results"].get(servers)
+        if previous is None:
+            continue
+        for phase, seconds in result["phases"].items():
+            before = previous["phases"].get(phase)
+            if before is None:
+                continue
+            ratio = seconds / before if before else float("inf")
+            flag = ""
+            if ratio > threshold and max(seconds, before) > noise:
+                flag = "  REGRESSION"
+                regressions.append(f"{servers} servers {phase}")
+            print(
+                f"{servers:>6} servers  {phase:<28} {before:8.4f}s -> {seconds:8.4f}s  x{ratio:.2f}{flag}"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--services-per-server", type=int, default=3)
+    parser.add_argument("--clusters-per-service", type=int, default=2)
+    parser.add_argument("--output", help="where to write the json report")
+    parser.add_argument("--baseline", help="a previous json report to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="a phase slower than the baseline by more than this ratio is a regression",
+    )
+    parser.add_argument(
+        "--noise",
+        type=float,
+        default=0.005,
+        help="phases faster than this, in seconds, are not compared",
+    )
+    args = parser.parse_args()
+
+    report = benchmark(
+        args.sizes, args.repeat, args.services_per_server, args.clusters_per_service
+    )
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump(report, outfile, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as infile:
+            regressions = compare(report, json.load(infile), args.threshold, args.noise)
+        if regressions:
+            print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
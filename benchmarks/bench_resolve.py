@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Resolve a synthetic pp-conf tenants tree with the shipped resolv.yml rules: a cold
+run, a warm run served by the cache, and a run after a few files changed.
+
+Usage:
+
+.. code-block:: shell
+
+    poetry run python benchmarks/bench_resolve.py --files 2000 --jobs 1 4
+"""
+
+import argparse
+import json
+import os
+import tempfile
+
+from typing import Any
+from typing import Dict
+
+from punchbox.resolve import bulk
+
+RESOLV_YML: str = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "conf",
+    "profiles",
+    "standalone",
+    "resolv.yml",
+)
+NODE_TYPES = ("kafka_input", "punchlet_node", "elasticsearch_output", "kafka_output")
+
+
+def punchline(index: int) -> Dict[str, Any]:
+    return {
+        "version": "6.0",
+        "runtime": "storm" if index % 2 else "shiva",
+        "settings": {},
+        "dag": [
+            {"type": NODE_TYPES[(index + i) % len(NODE_TYPES)], "settings": {}}
+            for i in range(6)
+        ],
+    }
+
+
+def write_tree(root: str, files: int) -> None:
+    for index in range(files):
+        channel = os.path.join(
+            root, "tenants", f"tenant{index % 5}", "channels", f"channel{index // 10}"
+        )
+        os.makedirs(channel, exist_ok=True)
+        with open(os.path.join(channel, f"punchline{index}.json"), "w") as outfile:
+            json.dump(punchline(index), outfile, indent=2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--changed", type=int, default=10)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, os.cpu_count()])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        root = os.path.join(workdir, "pp-conf")
+        write_tree(root, args.files)
+        print(f"{args.files} files")
+        for jobs in args.jobs:
+            cache = os.path.join(workdir, f"cache-{jobs}")
+            cold = bulk.resolve_tree(root, RESOLV_YML, cache, processes=jobs)
+            warm = bulk.resolve_tree(root, RESOLV_YML, cache, processes=jobs)
+            for index in range(args.changed):
+                path = os.path.join(root, cold.files[index].path)
+                with open(path, "a") as outfile:
+                    outfile.write(" ")
+            changed = bulk.resolve_tree(root, RESOLV_YML, cache, processes=jobs)
+            assert cold.succeeded and warm.succeeded and changed.succeeded
+            print(
+                f"jobs {jobs:<3} cold {cold.seconds:7.3f}s  warm {warm.seconds:7.3f}s  "
+                f"{args.changed} changed {changed.seconds:7.3f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare the pure python and the libyaml backed yaml loader and dumper on a large blueprint.
+
+Usage:
+
+.. code-block:: shell
+
+    poetry run python benchmarks/bench_yaml.py --servers 800
+"""
+
+import argparse
+import timeit
+
+from typing import Any
+from typing import Callable
+from typing import Dict
+
+import yaml
+
+from punchbox.utils import serialization
+
+
+def large_blueprint(servers: int) -> Dict[str, Any]:
+    cluster_settings = {f"setting_{i}": f"value-{i}" for i in range(20)}
+    cluster_settings["tags"] = ["common", "front", "back"]
+    return {
+        "platform": {"id": "bench", "data_root": "/data", "setups_root": "/opt"},
+        "services": {
+            service: {
+                "settings": {"version": "6.3.0"},
+                "clusters": {
+                    "common": {
+                        "settings": dict(cluster_settings),
+                        "servers": {
+                            f"server{i}": {
+                                "settings": {
+                                    **cluster_settings,
+                                    "cpu": 2,
+                                    "memory": 4096,
+                                }
+                            }
+                            for i in range(servers)
+                        },
+                    }
+                },
+            }
+            for service in ("zookeeper", "kafka", "shiva", "elasticsearch")
+        },
+        "users": {"operator": {}},
+    }
+
+
+def best_of(action: Callable[[], Any], repeat: int) -> float:
+    return min(timeit.repeat(action, number=1, repeat=repeat))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--servers", type=int, default=800)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    blueprint = large_blueprint(args.servers)
+    document = yaml.dump(blueprint, Dumper=yaml.SafeDumper)
+    print(f"blueprint: {args.servers} servers, {len(document) / 1e6:.1f} MB of yaml")
+    if not serialization.LIBYAML:
+        print("PyYAML is not built with libyaml, nothing to compare")
+        return
+    assert serialization.dump_yaml(blueprint) == document
+    results = {
+        "dump python": best_of(
+            lambda: yaml.dump(blueprint, Dumper=yaml.SafeDumper), args.repeat
+        ),
+        "dump libyaml": best_of(
+            lambda: serialization.dump_yaml(blueprint), args.repeat
+        ),
+        "load python": best_of(
+            lambda: yaml.load(document, Loader=yaml.SafeLoader), args.repeat
+        ),
+        "load libyaml": best_of(lambda: serialization.load_yaml(document), args.repeat),
+    }
+    for name, seconds in results.items():
+        print(f"{name:<14} {seconds:8.3f}s")
+    for action in ("dump", "load"):
+        gain = results[f"{action} python"] / results[f"{action} libyaml"]
+        print(f"{action} speedup: x{gain:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Generate synthetic settings.yml and topology.yml pairs, at any scale.
+
+The platforms are made of the usual punch services, spread over several clusters.
+Each server runs a few of them and carries its own settings. The same arguments
+always generate the same platform.
+
+Usage:
+
+.. code-block:: shell
+
+    poetry run python benchmarks/synthetic.py --servers 1000 --output /tmp/platform-1000
+"""
+
+import argparse
+import os
+import random
+
+from typing import Any
+from typing import Dict
+from typing import Tuple
+
+from punchbox.utils import serialization
+
+SERVICES: Tuple[str, ...] = (
+    "zookeeper",
+    "kafka",
+    "shiva",
+    "elasticsearch",
+    "kibana",
+    "gateway",
+    "clickhouse",
+    "minio",
+)
+
+
+def synthetic_platform(
+    servers: int,
+    services_per_server: int = 3,
+    clusters_per_service: int = 2,
+    seed: int = 0,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Return a synthetic (settings, topology) pair
+
+    :param servers: the number of servers of the topology
+    :param services_per_server: the number of services running on each server
+    :param clusters_per_service: the number of clusters of each service
+    :param seed: the random generator seed
+    :return: the settings and the topology, as parsed from their yaml files
+    """
+    generator = random.Random(seed)
+    clusters = [f"cluster{index}" for index in range(clusters_per_service)]
+    settings: Dict[str, Any] = {
+        "platform": {
+            "id": f"synthetic-{servers}",
+            "punch_daemons_user": "localusername",
+            "punch_daemons_group": "localusergroup",
+            "data_root": "/data",
+            "logs_root": "/var/log/punch",
+            "setups_root": "/opt",
+        },
+        "services": {
+            service: {
+                "settings": {
+                    f"{service}_childopts": "-Xmx512m -Xms512m",
+                    "production_interface": "eth0",
+                },
+                "clusters": {
+                    cluster: {
+                        "settings": {
+                            "cluster_port": 9000 + index,
+                            "tags": [cluster, "synthetic"],
+                            # read by the shipped deployment settings template
+                            "punchplatform_root_node": f"/punchplatform-{cluster}",
+                            "zk_root": cluster,
+                            "brokers_config": "punchplatform-kafka.properties",
+                            "default_replication_factor": 1,
+                            "default_partitions": 2,
+                            "partition_retention_bytes": 1073741824,
+                            "partition_retention_hours": 24,
+                            "kafka_brokers_jvm_xmx": "512M",
+                            "storage": {"type": "kafka", "cluster": cluster},
+                            "reporter": ["kafka"],
+                        }
+                    }
+                    for index, cluster in enumerate(clusters)
+                },
+            }
+            for service in SERVICES
+        },
+    }
+    topology: Dict[str, Any] = {"servers": {}}
+    for index in range(servers):
+        services = generator.sample(SERVICES, min(services_per_server, len(SERVICES)))
+        topology["servers"][f"server{index}"] = {
+            "settings": {
+                "disksize": "40GB",
+                "memory": generator.choice((2000, 4000, 8000)),
+                "cpu": generator.choice((1, 2, 4)),
+                "runner": True,
+                "can_be_master": index < 3,
+            },
+            "services": [
+                {"service": service, "cluster": generator.choice(clusters)}
+                for service in services
+            ],
+            "users": [{"user": "operator"}] if index % 10 == 0 else [],
+        }
+    return settings, topology
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--servers", type=int, required=True)
+    parser.add_argument("--services-per-server", type=int, default=3)
+    parser.add_argument("--clusters-per-service", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="the destination folder")
+    args = parser.parse_args()
+
+    settings, topology = synthetic_platform(
+        args.servers, args.services_per_server, args.clusters_per_service, args.seed
+    )
+    os.makedirs(args.output, exist_ok=True)
+    for name, document in (("settings.yml", settings), ("topology.yml", topology)):
+        with open(os.path.join(args.output, name), "w") as outfile:
+            serialization.dump_yaml(document, outfile)
+    print(f"{args.servers} servers platform written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
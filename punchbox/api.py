@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The punchbox python API.
+
+The punchbox commands are thin shells over these functions. They take and return
+plain dicts and strings, so that many platforms can be generated in a single
+process, without forking a punchbox command each time:
+
+.. code-block:: python
+
+    from punchbox import api
+
+    versions = api.component_versions("/opt/punch-deployer-6.4.5")
+    for name, (settings, topology) in platforms.items():
+        blueprint = api.build_blueprint(settings, topology, versions)
+        deployment_settings = api.render_deployment(blueprint, "deployment.settings.j2")
+        legacy_settings = api.legacy_settings(deployment_settings)
+
+Templates are compiled once per process, and the deployer component versions are
+cached on disk, see PUNCHPLATFORM_PUNCHBOX_CACHE_DIR.
+"""
+
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Union
+
+from punchbox.generate import blueprint_format
+from punchbox.generate import generate_helper
+from punchbox.utils import ansible
+from punchbox.utils import serialization
+from punchbox.utils.hostnames import HostnameResolver
+from punchbox.workspace import build_pipeline
+
+
+def component_versions(deployer: str) -> Dict[str, str]:
+    """Return the version of every component shipped by a punch deployer
+
+    :param deployer: the punch deployer folder or zip archive
+    :return: component -> version
+    """
+    return ansible.get_components_version(deployer)
+
+
+def build_blueprint(
+    settings: Dict[str, Any],
+    topology: Dict[str, Any],
+    versions: Union[Dict[str, str], str],
+    normalised: bool = False,
+) -> Dict[str, Any]:
+    """Compute a platform blueprint
+
+    :param settings: the parsed settings.yml
+    :param topology: the parsed topology.yml
+    :param versions: the component_versions map, or the punch deployer folder or zip
+        archive to resolve them from
+    :param normalised: only keep, for each server, the settings overriding the ones of
+        its cluster
+    :return: the blueprint
+    """
+    if isinstance(versions, str):
+        blueprint = generate_helper.build_blueprint(settings, topology, versions)
+    else:
+        blueprint = generate_helper.build_blueprint(
+            settings, topology, None, versions=versions
+        )
+    if normalised:
+        return blueprint_format.normalise(blueprint)
+    return blueprint
+
+
+def dump_blueprint(blueprint: Dict[str, Any]) -> str:
+    """Return the blueprint yaml document, as written by 'generate blueprint'
+
+    :param blueprint: a build_blueprint result
+    :return: the yaml document
+    """
+    return serialization.dump_yaml(blueprint)
+
+
+def _render_blueprint(
+    blueprint: Dict[str, Any],
+    template: str,
+    template_cache: Optional[str],
+    resolver: Optional[HostnameResolver],
+) -> str:
+    # templates always get the expanded blueprint, whatever its encoding
+    return generate_helper.render_template(
+        template, blueprint_format.expand(blueprint), template_cache, resolver
+    )
+
+
+def render_deployment(
+    blueprint: Dict[str, Any],
+    template: str,
+    template_cache: Optional[str] = None,
+    resolver: Optional[HostnameResolver] = None,
+) -> str:
+    """Render the deployment settings of a platform
+
+    :param blueprint: a build_blueprint result, normalised or not
+    :param template: the deployment settings template file
+    :param template_cache: a folder where to keep the compiled templates, if any
+    :param resolver: resolves the hostnames of the template, for instance offline
+        from a hosts map. Configured from the environment if None
+    :return: the deployment settings yaml document
+    """
+    return _render_blueprint(blueprint, template, template_cache, resolver)
+
+
+def render_resolver(
+    blueprint: Dict[str, Any],
+    template: str,
+    template_cache: Optional[str] = None,
+    resolver: Optional[HostnameResolver] = None,
+) -> str:
+    """Render the resolver of a platform
+
+    :param blueprint: a build_blueprint result, normalised or not
+    :param template: the resolver template file
+    :param template_cache: a folder where to keep the compiled templates, if any
+    :param resolver: resolves the hostnames of the template, for instance offline
+        from a hosts map. Configured from the environment if None
+    :return: the resolv.hjson document
+    """
+    return _render_blueprint(blueprint, template, template_cache, resolver)
+
+
+def render_vagrantfile(
+    settings: Dict[str, Any],
+    topology: Dict[str, Any],
+    template: str,
+    template_cache: Optional[str] = None,
+) -> str:
+    """Render the Vagrantfile of a platform
+
+    :param settings: the parsed settings.yml, with its vagrant section
+    :param topology: the parsed topology.yml
+    :param template: the Vagrantfile template
+    :param template_cache: a folder where to keep the compiled templates, if any
+    :return: the Vagrantfile
+    """
+    return generate_helper.render_template(
+        template,
+        generate_helper.vagrantfile_context(settings["vagrant"], topology),
+        template_cache,
+    )
+
+
+def legacy_settings(deployment_settings: str) -> str:
+    """Convert deployment settings to the legacy json punchplatform-deployment.settings
+
+    :param deployment_settings: a render_deployment result
+    :return: the json document
+    """
+    return generate_helper.legacy_settings(deployment_settings)
+
+
+def build(
+    workspace: str,
+    force: bool = False,
+    jobs: int = 4,
+    confirmed: Optional[Callable[[str], bool]] = None,
+) -> Dict[str, float]:
+    """Build a workspace, as 'punchbox workspace build' does
+
+    Only the files whose inputs changed since the last build are generated again.
+
+    :param workspace: the workspace folder
+    :param force: generate every file, even the ones whose inputs did not change
+    :param jobs: the maximum number of files generated at the same time
+    :param confirmed: asks whether to generate a file, every file is generated if None
+    :return: generated file -> duration in seconds
+    """
+    return build_pipeline.build(workspace, force=force, jobs=jobs, confirmed=confirmed)
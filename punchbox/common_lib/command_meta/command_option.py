@@ -14,6 +14,17 @@ class CommandOption(object):
     SETTINGS_OPT: ClassVar[str] = "--settings"
     OUTPUT_OPT: ClassVar[str] = "--output"
     BLUEPRINT_OPT: ClassVar[str] = "--blueprint"
+    DEPLOYMENT_SETTINGS_OPT: ClassVar[str] = "--deployment-settings"
     TEMPLATE_OPT: ClassVar[str] = "--template"
+    TEMPLATE_CACHE_OPT: ClassVar[str] = "--template-cache"
+    NORMALISED_OPT: ClassVar[str] = "--normalised"
+    FORCE_OPT: ClassVar[str] = "--force"
+    SOCKET_OPT: ClassVar[str] = "--socket"
+    FILE_OPT: ClassVar[str] = "--file"
+    RESOLVER_OPT: ClassVar[str] = "--resolver"
+    TIMINGS_OPT: ClassVar[str] = "--timings"
+    CPROFILE_OPT: ClassVar[str] = "--cprofile"
+    TRACEMALLOC_OPT: ClassVar[str] = "--tracemalloc"
+    JOBS_OPT: ClassVar[Tuple[str, ...]] = ("--jobs", "-j")
     YES_OPT: ClassVar[Tuple[str, ...]] = ("--yes", "-y")
     VERBOSE_OPT: ClassVar[Tuple[str, ...]] = ("--verbose", "-v")
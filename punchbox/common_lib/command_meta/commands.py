@@ -8,8 +8,12 @@ class Commands(object):
 
     CREATE_CMD: ClassVar[str] = "create"
     BUILD_CMD: ClassVar[str] = "build"
+    BUILD_ALL_CMD: ClassVar[str] = "build-all"
     AUDIT_CMD: ClassVar[str] = "audit"
     BLUEPRINT_CMD: ClassVar[str] = "blueprint"
     DEPLOYMENT_SETTINGS_CMD: ClassVar[str] = "deployment-settings"
+    LEGACY_SETTINGS_CMD: ClassVar[str] = "legacy-settings"
     RESOLVER_CMD: ClassVar[str] = "resolver"
     VAGRANTFILE_CMD: ClassVar[str] = "vagrantfile"
+    SERVER_CMD: ClassVar[str] = "server"
+    RESOLVE_CMD: ClassVar[str] = "resolve"
@@ -11,6 +11,8 @@ class WorkspaceHierarchy(object):
     conf_dir: str = dataclasses.field(init=False)
     punchbox_conf_dir: str = dataclasses.field(init=False)
     generated_conf_dir: str = dataclasses.field(init=False)
+    jinja_cache_dir: str = dataclasses.field(init=False)
+    resolve_cache_dir: str = dataclasses.field(init=False)
     pp_conf_dir: str = dataclasses.field(init=False)
     vagrant_dir: str = dataclasses.field(init=False)
     template_dir: str = dataclasses.field(init=False)
@@ -20,6 +22,7 @@ class WorkspaceHierarchy(object):
     dest_resolv_yml_file: str = dataclasses.field(init=False)
     target_vagrant_file: str = dataclasses.field(init=False)
     target_blueprint_yml_file: str = dataclasses.field(init=False)
+    target_build_manifest_file: str = dataclasses.field(init=False)
     target_workspace_yml_file: str = dataclasses.field(init=False)
     target_deployment_settings_yml_file: str = dataclasses.field(init=False)
     target_deployment_settings_yml_j2_file: str = dataclasses.field(init=False)
@@ -30,6 +33,8 @@ class WorkspaceHierarchy(object):
         self.conf_dir = f"{self.workspace_path}/conf"
         self.punchbox_conf_dir = f"{self.conf_dir}/punchbox"
         self.generated_conf_dir = f"{self.punchbox_conf_dir}/generated"
+        self.jinja_cache_dir = f"{self.generated_conf_dir}/.jinja-cache"
+        self.resolve_cache_dir = f"{self.generated_conf_dir}/.resolve-cache"
         self.pp_conf_dir = f"{self.workspace_path}/pp-conf"
         self.vagrant_dir = f"{self.workspace_path}/vagrant"
         self.template_dir = f"{self.generated_conf_dir}/conf/deployment_templates"
@@ -39,6 +44,9 @@ class WorkspaceHierarchy(object):
         self.dest_resolv_yml_file = f"{self.punchbox_conf_dir}/resolv.yml"
         self.target_vagrant_file = f"{self.vagrant_dir}/Vagrantfile"
         self.target_blueprint_yml_file = f"{self.generated_conf_dir}/blueprint.yml"
+        self.target_build_manifest_file = (
+            f"{self.generated_conf_dir}/build-manifest.json"
+        )
         self.target_workspace_yml_file = f"{self.punchbox_conf_dir}/punchbox.yml"
         self.target_deployment_settings_yml_file = (
             f"{self.pp_conf_dir}/deployment-settings.yml"
@@ -15,6 +15,26 @@ class Environment(object):
 
     PUNCHPLATFORM_PUNCHBOX_LOG_LEVEL: ClassVar[str] = "PUNCHPLATFORM_PUNCHBOX_LOG_LEVEL"
 
+    PUNCHPLATFORM_PUNCHBOX_TIMINGS: ClassVar[str] = "PUNCHPLATFORM_PUNCHBOX_TIMINGS"
+
+    PUNCHPLATFORM_PUNCHBOX_HOSTS_FILE: ClassVar[
+        str
+    ] = "PUNCHPLATFORM_PUNCHBOX_HOSTS_FILE"
+
+    PUNCHPLATFORM_PUNCHBOX_HOSTNAME_PREFETCH: ClassVar[
+        str
+    ] = "PUNCHPLATFORM_PUNCHBOX_HOSTNAME_PREFETCH"
+
+    PUNCHPLATFORM_PUNCHBOX_CACHE_DIR: ClassVar[str] = "PUNCHPLATFORM_PUNCHBOX_CACHE_DIR"
+
+    PUNCHPLATFORM_PUNCHBOX_VERSION_BACKEND: ClassVar[
+        str
+    ] = "PUNCHPLATFORM_PUNCHBOX_VERSION_BACKEND"
+
+    PUNCHPLATFORM_PUNCHBOX_SERVER_SOCKET: ClassVar[
+        str
+    ] = "PUNCHPLATFORM_PUNCHBOX_SERVER_SOCKET"
+
     def __init__(self) -> None:
         """
         static class
@@ -52,3 +72,63 @@ class Environment(object):
         by default return NOTSET
         """
         return os.getenv(Environment.PUNCHPLATFORM_PUNCHBOX_LOG_LEVEL, "NOTSET")
+
+    @staticmethod
+    def punchbox_timings() -> bool:
+        """
+        Print the timing tree of every command, as the --timings option does
+        by default return False, any value but '', '0' and 'false' enables it
+        """
+        value: str = os.getenv(Environment.PUNCHPLATFORM_PUNCHBOX_TIMINGS, "")
+        return value.strip().lower() not in ("", "0", "false")
+
+    @staticmethod
+    def punchbox_hosts_file() -> Optional[str]:
+        """
+        /etc/hosts style file the templates resolve hostnames from, offline, when set
+        by default return None, hostnames are then resolved by the system resolver
+        """
+        return os.getenv(Environment.PUNCHPLATFORM_PUNCHBOX_HOSTS_FILE, None)
+
+    @staticmethod
+    def punchbox_hostname_prefetch() -> bool:
+        """
+        Resolve all the platform servers concurrently before rendering a template that
+        resolves hostnames, by default return False, any value but '', '0' and 'false'
+        enables it
+        """
+        value: str = os.getenv(Environment.PUNCHPLATFORM_PUNCHBOX_HOSTNAME_PREFETCH, "")
+        return value.strip().lower() not in ("", "0", "false")
+
+    @staticmethod
+    def punchbox_cache_dir() -> str:
+        """
+        Directory where punchbox keeps its persistent caches (component versions...).
+
+        By default $XDG_CACHE_HOME/punchbox, or ~/.cache/punchbox if XDG_CACHE_HOME is not set
+        """
+        cache_directory: Optional[str] = os.getenv(
+            Environment.PUNCHPLATFORM_PUNCHBOX_CACHE_DIR, None
+        )
+        if cache_directory is None:
+            xdg_cache_home: str = os.getenv(
+                "XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")
+            )
+            cache_directory = os.path.join(xdg_cache_home, "punchbox")
+        return cache_directory
+
+    @staticmethod
+    def punchbox_version_backend() -> str:
+        """
+        How component versions are resolved from the punch deployer: 'auto', 'native' or 'shell'
+        by default return auto
+        """
+        return os.getenv(Environment.PUNCHPLATFORM_PUNCHBOX_VERSION_BACKEND, "auto")
+
+    @staticmethod
+    def punchbox_server_socket() -> Optional[str]:
+        """
+        Unix socket of a running 'punchbox server', commands are forwarded to it when set
+        by default return None
+        """
+        return os.getenv(Environment.PUNCHPLATFORM_PUNCHBOX_SERVER_SOCKET, None)
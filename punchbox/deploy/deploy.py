@@ -14,6 +14,7 @@ from punchbox.common_lib.data_classes.punchbox_configuration import Punchbox
 from punchbox.common_lib.runtime_meta import state_code
 from punchbox.punch_entry_point import cli_configuration
 from punchbox.punch_entry_point.cli_configuration import PunchLogger
+from punchbox.utils import timings
 from punchbox.utils.file import File
 
 
@@ -53,9 +54,9 @@ def deploy_audit(ctx, workspace: Union[str, bytes, os.PathLike], verbose: bool)
         PunchLogger().debug_yellow(
             f"audit command: \n" f" {audit_cmd} {audit_yml} {conf_file} \n"
         )
-    if state_code.StateCode.SUCCESS == os.system(
-        f" {audit_cmd} {audit_yml} {conf_file}"
-    ):
+    with timings.span("audit subprocess"):
+        audit_status = os.system(f" {audit_cmd} {audit_yml} {conf_file}")
+    if state_code.StateCode.SUCCESS == audit_status:
         PunchLogger().info_green(
             f"INFO: your generated settings {conf_file} are correct \n"
         )
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from typing import Any
+from typing import Dict
+from typing import Mapping
+
+# top level blueprint key telling how the blueprint is encoded
+FORMAT_KEY: str = "blueprint_format"
+# servers only carry the settings overriding the ones of their cluster
+NORMALISED: str = "normalised"
+
+
+def _server_overrides(
+    server_settings: Mapping[str, Any], cluster_settings: Mapping[str, Any]
+) -> Dict[str, Any]:
+    return {
+        key: value
+        for key, value in server_settings.items()
+        if key not in cluster_settings or cluster_settings[key] != value
+    }
+
+
+def _sorted(mapping: Mapping[str, Any]) -> Dict[str, Any]:
+    # keys in the order of the dumped yaml document, whatever the encoding
+    return {key: mapping[key] for key in sorted(mapping)}
+
+
+def _map_servers(blueprint: Dict[str, Any], normalise: bool) -> Dict[str, Any]:
+    services: Dict[str, Any] = {}
+    for service_name, service in blueprint.get("services", {}).items():
+        clusters: Dict[str, Any] = {}
+        for cluster_name, cluster in service.get("clusters", {}).items():
+            cluster_settings = cluster.get("settings") or {}
+            servers: Dict[str, Any] = {}
+            for server_name, server in cluster.get("servers", {}).items():
+                server_settings = server.get("settings") or {}
+                if normalise:
+                    server_settings = _server_overrides(
+                        server_settings, cluster_settings
+                    )
+                else:
+                    server_settings = {**cluster_settings, **server_settings}
+                servers[server_name] = _sorted(
+                    {**server, "settings": _sorted(server_settings)}
+                )
+            clusters[cluster_name] = _sorted({**cluster, "servers": servers})
+        services[service_name] = _sorted({**service, "clusters": clusters})
+    return services
+
+
+def normalise(blueprint: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the normalised encoding of a blueprint
+
+    The servers of every cluster only keep the settings that differ from their cluster
+    settings, they inherit the others. The blueprint is marked as normalised so that
+    expand can restore it.
+
+    :param blueprint: a plain (materialised) blueprint
+    :return: the normalised blueprint
+    """
+    if blueprint.get(FORMAT_KEY) == NORMALISED:
+        return blueprint
+    return {
+        **blueprint,
+        "services": _map_servers(blueprint, normalise=True),
+        FORMAT_KEY: NORMALISED,
+    }
+
+
+def expand(blueprint: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the full blueprint whatever its encoding
+
+    A blueprint that is not normalised is returned as is, so that templates always
+    get each server with its complete settings.
+
+    :param blueprint: a loaded blueprint
+    :return: the expanded blueprint
+    """
+    if blueprint.get(FORMAT_KEY) != NORMALISED:
+        return blueprint
+    expanded = {key: value for key, value in blueprint.items() if key != FORMAT_KEY}
+    expanded["services"] = _map_servers(blueprint, normalise=False)
+    return expanded
@@ -1,26 +1,42 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import copy
-import getpass
-import grp
 import logging
 import os
-import pwd
 import sys
 
+from typing import Callable
 from typing import IO
+from typing import Optional
 from typing import Union
 
 import click
-import yaml
 
+from punchbox import api
 from punchbox.common_lib.command_meta.command_option import CommandOption
 from punchbox.common_lib.command_meta.commands import Commands
+from punchbox.generate import blueprint_format
 from punchbox.generate import generate_helper
 from punchbox.punch_entry_point import cli_configuration
 from punchbox.punch_entry_point.cli_configuration import PunchLogger
-from punchbox.utils import ansible
+from punchbox.utils import serialization
+
+
+def stream_output(write: Callable[[IO[bytes]], None], output: IO[bytes]) -> None:
+    """Write a generated document to the output file, or else to stdout
+
+    :param write: writes the document to the binary stream it is given
+    :param output: the output file, None for stdout
+    :return: None
+    """
+    if output is not None:
+        write(output)
+        return
+    stdout = click.get_binary_stream("stdout")
+    write(stdout)
+    # as click.echo does
+    stdout.write(b"\n")
+    stdout.flush()
 
 
 @click.group(**cli_configuration.CliConfiguration.click_command_settings())
@@ -44,7 +60,7 @@ def generate() -> None:
     CommandOption.DEPLOYER_OPT,
     required=True,
     type=click.Path(exists=True),
-    help="path to the punch deployer folder",
+    help="path to the punch deployer folder or zip archive",
 )
 @click.option(
     CommandOption.TOPOLOGY_OPT,
@@ -67,11 +83,19 @@ def generate() -> None:
     help="the generated platform inventory topology. "
     "If not provided the file is written to stdout",
 )
+@click.option(
+    CommandOption.NORMALISED_OPT,
+    is_flag=True,
+    default=False,
+    help="only write, for each server, the settings overriding the ones of its cluster. "
+    "Much smaller for large platforms, the other generate commands expand it back.",
+)
 def generate_blueprint(
     deployer: Union[str, bytes, os.PathLike],
     topology: IO[bytes],
     settings: IO[bytes],
     output: IO[bytes],
+    normalised: bool = False,
 ) -> None:
     """
         Generate the punch blueprint configuration file. That file is the one used
@@ -83,26 +107,15 @@ def generate_blueprint(
         You should not need to understand it, and certainly not to edit it as it is generated.
         It can be useful to debug a deployment issue.
     """
-    settings_dict = yaml.load(settings.read(), Loader=yaml.SafeLoader)
-    topology_dict = yaml.load(topology.read(), Loader=yaml.SafeLoader)
-    # create a fresh new blueprint
-    blueprint = {"services": {}, "platform": copy.deepcopy(settings_dict["platform"])}
-    # first pass to fill all the settings
-    generate_helper.compute_blueprint_setting(blueprint, settings_dict, topology_dict)
-    # second pass to take care of users
-    generate_helper.compute_blueprint_users(blueprint, topology_dict)
-    # last path to add versions wherever needed
-    generate_helper.compute_blueprint_versions(blueprint, str(deployer))
-    formatted_model = yaml.dump(blueprint)
-    userid = getpass.getuser()
-    groupid = pwd.getpwnam(userid).pw_gid
-    groupname = grp.getgrgid(groupid).gr_name
-    formatted_model = formatted_model.replace("localusername", userid)
-    formatted_model = formatted_model.replace("localusergroup", groupname)
+    settings_dict = serialization.load_yaml(settings.read())
+    topology_dict = serialization.load_yaml(topology.read())
+    blueprint = api.build_blueprint(
+        settings_dict, topology_dict, str(deployer), normalised=normalised
+    )
     if output is None:
-        PunchLogger().logger.info(formatted_model)
+        PunchLogger().logger.info(serialization.dump_yaml(blueprint))
     else:
-        output.write(formatted_model.encode(encoding="UTF-8"))
+        serialization.dump_yaml(blueprint, output, encoding="UTF-8")
 
 
 @generate.command(name=Commands.DEPLOYMENT_SETTINGS_CMD)
@@ -120,9 +133,19 @@ def generate_blueprint(
     "templates/punchplatform_deployment_settings.j2 in your punchbox. It provides all the required "
     "settings ",
 )
+@click.option(
+    CommandOption.TEMPLATE_CACHE_OPT,
+    required=False,
+    type=click.Path(file_okay=False),
+    help="a folder where to keep the compiled templates, so that they are only "
+    "compiled again when they change",
+)
 @click.option(CommandOption.OUTPUT_OPT, type=click.File("wb"), help="Output file")
 def generate_deployment(
-    blueprint: IO[bytes], template: Union[str, bytes, os.PathLike], output: IO[bytes]
+    blueprint: IO[bytes],
+    template: Union[str, bytes, os.PathLike],
+    output: IO[bytes],
+    template_cache: Optional[str] = None,
 ) -> None:
     """
         Generate the punch deployment settings file. That file is your input to use the punch
@@ -134,14 +157,14 @@ def generate_deployment(
 
         Once you have that file you are good to go to deploy your punch.
     """
-    blueprint_dict = yaml.load(blueprint.read(), Loader=yaml.SafeLoader)
-    deployment_template = ansible.load_template(template)
+    blueprint_dict = blueprint_format.expand(serialization.load_yaml(blueprint.read()))
     try:
-        output_yml = deployment_template.render(**blueprint_dict)
-        if output is not None:
-            output.write(output_yml.encode(encoding="UTF-8"))
-        else:
-            click.echo(output_yml)
+        stream_output(
+            lambda stream: generate_helper.stream_template(
+                str(template), blueprint_dict, stream, template_cache
+            ),
+            output,
+        )
     except TypeError:
         logging.exception(
             "your punchplatform-deployment-settings.j2.yaml template must be wrong"
@@ -149,6 +172,33 @@ def generate_deployment(
         sys.exit(1)
 
 
+@generate.command(name=Commands.LEGACY_SETTINGS_CMD)
+@click.option(
+    CommandOption.DEPLOYMENT_SETTINGS_OPT,
+    required=True,
+    type=click.File("rb"),
+    help="the deployment settings file generated using the "
+    "'generate deployment-settings' command",
+)
+@click.option(
+    CommandOption.OUTPUT_OPT,
+    type=click.File("wb"),
+    help="the output file. If not provided the json is written to stdout",
+)
+def generate_legacy_settings(deployment_settings: IO[bytes], output: IO[bytes]) -> None:
+    """
+        Generate the legacy json deployment settings file.
+
+        That file, punchplatform-deployment.settings, is the json version of the
+        deployment settings, still expected by older punch deployers and tools.
+    """
+    legacy_json = generate_helper.legacy_settings(deployment_settings)
+    if output is not None:
+        output.write(legacy_json.encode(encoding="UTF-8"))
+    else:
+        click.echo(legacy_json)
+
+
 @generate.command(name=Commands.RESOLVER_CMD)
 @click.option(
     CommandOption.BLUEPRINT_OPT,
@@ -163,22 +213,36 @@ def generate_deployment(
     help="the resolver template. In doubt use the  "
     "templates/resolv.hjson.j2 in your punchbox.",
 )
+@click.option(
+    CommandOption.TEMPLATE_CACHE_OPT,
+    required=False,
+    type=click.Path(file_okay=False),
+    help="a folder where to keep the compiled templates, so that they are only "
+    "compiled again when they change",
+)
 @click.option(CommandOption.OUTPUT_OPT, type=click.File("wb"), help="Output file")
 def generate_resolver(
-    blueprint: IO[bytes], template: Union[str, bytes, os.PathLike], output: IO[bytes]
+    blueprint: IO[bytes],
+    template: Union[str, bytes, os.PathLike],
+    output: IO[bytes],
+    template_cache: Optional[str] = None,
 ) -> None:
     """
         Generate the punch deployment resolver file. That file is required to
         deploy the punch but can be empty.
     """
-    blueprint_dict = yaml.load(blueprint.read(), Loader=yaml.SafeLoader)
-    deployment_template = ansible.load_template(template)
+    blueprint_dict = blueprint_format.expand(serialization.load_yaml(blueprint.read()))
     try:
-        output_yml = deployment_template.render(**blueprint_dict)
         if output is not None:
-            output.write(output_yml.encode(encoding="UTF-8"))
+            generate_helper.stream_template(
+                str(template), blueprint_dict, output, template_cache
+            )
         else:
-            PunchLogger().logger.info(output_yml)
+            PunchLogger().logger.info(
+                generate_helper.render_template(
+                    str(template), blueprint_dict, template_cache
+                )
+            )
     except TypeError:
         PunchLogger().logger.exception(
             "your resolv_hjson.j2.yaml template must be wrong"
@@ -205,6 +269,13 @@ def generate_resolver(
     type=click.Path(exists=True),
     help="a vagrant template file",
 )
+@click.option(
+    CommandOption.TEMPLATE_CACHE_OPT,
+    required=False,
+    type=click.Path(file_okay=False),
+    help="a folder where to keep the compiled templates, so that they are only "
+    "compiled again when they change",
+)
 @click.option(
     CommandOption.OUTPUT_OPT,
     type=click.File("wb"),
@@ -216,6 +287,7 @@ def generate_vagrantfile(
     settings: IO[bytes],
     template: Union[str, bytes, os.PathLike],
     output: IO[bytes],
+    template_cache: Optional[str] = None,
 ) -> None:
     """
     Generate Vagrantfile.
@@ -235,11 +307,14 @@ def generate_vagrantfile(
         template = f"{punchbox_dir}/vagrant/Vagrantfile.j2"
         click.echo(f"using default vagrant template {template}")
 
-    template_jinja = ansible.load_template(template)
-    settings_dict = yaml.load(settings.read(), Loader=yaml.SafeLoader)["vagrant"]
-    topology_dict = yaml.load(topology.read(), Loader=yaml.SafeLoader)
-    rendered_template = template_jinja.render(**settings_dict, **topology_dict)
-    if output is not None:
-        output.write(rendered_template.encode(encoding="UTF-8"))
-    else:
-        click.echo(rendered_template)
+    settings_dict = serialization.load_yaml(settings.read())["vagrant"]
+    topology_dict = serialization.load_yaml(topology.read())
+    stream_output(
+        lambda stream: generate_helper.stream_template(
+            str(template),
+            generate_helper.vagrantfile_context(settings_dict, topology_dict),
+            stream,
+            template_cache,
+        ),
+        output,
+    )
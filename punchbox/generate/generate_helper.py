@@ -1,15 +1,30 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import copy
+import functools
+import getpass
+import grp
+import json
+import pwd
 
 from typing import Any
+from typing import IO
 from typing import Dict
+from typing import List
 from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import Union
 
 import click
 
+from punchbox.generate import layered_settings
+from punchbox.generate.layered_settings import LayeredSettings
 from punchbox.utils import ansible
+from punchbox.utils import hostnames
+from punchbox.utils import serialization
+from punchbox.utils import timings
+from punchbox.utils.hostnames import HostnameResolver
 
 
 def raise_if_platform_missing_else_return(
@@ -41,20 +56,47 @@ def empty_dict_if_key_not_exist(
         return {}
 
 
+def compile_topology_index(
+    topology_dict: Dict[str, Any]
+) -> Dict[str, Dict[str, List[str]]]:
+    """Index the topology servers by service and cluster, in a single pass.
+
+    :param topology_dict: the user topology dictionary, It contains the servers dictionary
+    :return: a service -> cluster -> server names dictionary, in topology order
+    """
+    # ordered dicts of server names, a server listing a service twice is kept once
+    cluster_servers: Dict[str, Dict[str, Dict[str, None]]] = {}
+    for server_name, server_dict in topology_dict["servers"].items():
+        for server_service in server_dict.get("services") or []:
+            # the default cluster name is 'common'
+            cluster_name = server_service.get("cluster", "common")
+            cluster_servers.setdefault(server_service["service"], {}).setdefault(
+                cluster_name, {}
+            )[server_name] = None
+    return {
+        service_name: {
+            cluster_name: list(servers) for cluster_name, servers in clusters.items()
+        }
+        for service_name, clusters in cluster_servers.items()
+    }
+
+
 # flake8: noqa: C901
 def compute_blueprint_service_settings(
     blueprint: Dict[str, Any],
     service_name: str,
     settings_dict: Dict[str, Any],
     topology_dict: Dict[str, Any],
+    topology_index: Optional[Dict[str, Dict[str, List[str]]]] = None,
 ) -> None:
-    """Form a complex number.
+    """Compute the settings of a service, of its clusters and of their servers.
 
     Keyword arguments:
         blueprint -- the blueprint to fill
         service_name -- the name of a service, i.e. kafka, shiva
         settings_dict -- the user settings dictionary. It contains platform and cluster wide settings
         topology_dict -- the user topology dictionary, It contains the servers dictionary
+        topology_index -- the compile_topology_index result, computed if not provided
     """
     plf_global_settings: Dict[str, Any] = raise_if_platform_missing_else_return(
         settings_dict
@@ -65,59 +107,36 @@ def compute_blueprint_service_settings(
     plf_service_settings: Dict[str, Any] = empty_dict_if_key_not_exist(
         settings_dict, service_name
     )
+    if topology_index is None:
+        topology_index = compile_topology_index(topology_dict)
 
     # Add these platform wide settings, if any, to the blueprint
-    blp_service_dict["settings"] = copy.deepcopy(
-        {**plf_service_settings, **plf_global_settings}
+    blp_service_dict["settings"] = LayeredSettings(
+        plf_global_settings, plf_service_settings
     )
-    # print(yaml.dump(blueprint))
-    # loop over all the servers of the topology and find out where we have this
-    # service
-    for server_name, server_dict in topology_dict["servers"].items():
-        if "services" in server_dict:
-            # print(yaml.dump(blueprint))
-            for this_server_service in server_dict["services"]:
-                # the default cluster name is 'common'
-                this_cluster_name = "common"
-                if "cluster" in this_server_service:
-                    this_cluster_name = this_server_service["cluster"]
-
-                if this_cluster_name not in blp_service_dict["clusters"]:
-                    # here we set the cluster section of this server.
-                    blp_service_dict["clusters"][this_cluster_name] = {}
-                    blp_service_dict["clusters"][this_cluster_name]["servers"] = {}
-                    blp_service_dict["clusters"][this_cluster_name][
-                        "settings"
-                    ] = copy.deepcopy(plf_service_settings)
-                # print(yaml.dump(blueprint))
-                blp_cluster = blp_service_dict["clusters"][this_cluster_name]
-                if server_name not in blp_cluster["servers"]:
-                    blp_cluster["servers"][server_name] = {}
-                    blp_cluster["servers"][server_name]["settings"] = {}
-                # print(yaml.dump(blueprint))
-                try:
-                    for prop_key, prop_value in settings_dict["services"][service_name][
-                        "clusters"
-                    ][this_cluster_name]["settings"].items():
-                        blp_cluster["settings"][prop_key] = prop_value
-                except KeyError:
-                    pass
-                # print(yaml.dump(blueprint))
-                try:
-                    for prop_key, prop_value in blp_cluster["settings"].items():
-                        blp_cluster["servers"][server_name]["settings"][
-                            prop_key
-                        ] = prop_value
-                except KeyError:
-                    pass
-                try:
-                    for prop_key, prop_value in server_dict["settings"].items():
-                        blp_cluster["servers"][server_name]["settings"][
-                            prop_key
-                        ] = prop_value
-                except KeyError:
-                    pass
-                # print(yaml.dump(blueprint))
+    # only visit the servers of the topology where we have this service
+    for cluster_name, server_names in topology_index.get(service_name, {}).items():
+        try:
+            plf_cluster_settings: Dict[str, Any] = settings_dict["services"][
+                service_name
+            ]["clusters"][cluster_name]["settings"]
+        except KeyError:
+            plf_cluster_settings = {}
+        # here we set the cluster section of these servers.
+        blp_cluster_settings = LayeredSettings(
+            plf_cluster_settings, plf_service_settings
+        )
+        blp_service_dict["clusters"][cluster_name] = {
+            "servers": {
+                server_name: {
+                    "settings": blp_cluster_settings.over(
+                        topology_dict["servers"][server_name].get("settings", {})
+                    )
+                }
+                for server_name in server_names
+            },
+            "settings": blp_cluster_settings,
+        }
 
 
 def compute_blueprint_setting(
@@ -127,6 +146,8 @@ def compute_blueprint_setting(
 ) -> None:
     """Compute the blueprint settings at all three levels: platform, cluster and server.
 
+    The topology is indexed once, each service then only visits its own servers.
+
     :param blueprint:  the blueprint to fill
     :param settings_dict: the user settings dictionary. It contains platform and cluster wide settings
     :param topology_dict: the user topology dictionary, It contains the servers dictionary
@@ -134,27 +155,53 @@ def compute_blueprint_setting(
     """
 
     if "services" in settings_dict:
+        topology_index = compile_topology_index(topology_dict)
         for service_name, service_dict in settings_dict["services"].items():
             compute_blueprint_service_settings(
-                blueprint, service_name, settings_dict, topology_dict
+                blueprint, service_name, settings_dict, topology_dict, topology_index
             )
 
 
-def compute_blueprint_versions(blueprint: Dict[str, Any], deployer_path: str) -> None:
+def services_missing_version(blueprint: Dict[str, Any]) -> Set[str]:
+    """Return the names of the blueprint services that do not specify a version.
+
+    :param blueprint: the blueprint
+    :return: the set of service names
+    """
+    return {
+        service_name
+        for service_name, service in blueprint["services"].items()
+        if "version" not in service["settings"]
+    }
+
+
+def compute_blueprint_versions(
+    blueprint: Dict[str, Any],
+    deployer_path: Optional[str],
+    versions: Optional[Dict[str, str]] = None,
+) -> None:
     """Add the version to each service settings.
 
     This is only performed if the service is known to the punch deployer and if a version
-    is not already specified in there.
+    is not already specified in there. Only those services are probed.
 
-    :param deployer_path:
     :param blueprint:
+    :param deployer_path: the punch deployer, probed unless versions are provided
+    :param versions: component -> version map, known beforehand
     :return:
     """
-    versions_dict = ansible.get_components_version(deployer_path)
-    for service_name, service in blueprint["services"].items():
-        if "version" not in service["settings"]:
-            if service_name in versions_dict:
-                service["settings"]["version"] = versions_dict[service_name]
+    if versions is None:
+        versions_dict = ansible.get_components_version(
+            deployer_path, services_missing_version(blueprint)
+        )
+    else:
+        versions_dict = {
+            service_name: versions[service_name]
+            for service_name in services_missing_version(blueprint)
+            if service_name in versions
+        }
+    for service_name, version in versions_dict.items():
+        blueprint["services"][service_name]["settings"]["version"] = version
 
 
 def compute_blueprint_users(blueprint, topology_dict) -> None:
@@ -183,4 +230,196 @@ def compute_blueprint_users(blueprint, topology_dict) -> None:
                             )
                     if user not in blueprint["users"]:
                         blueprint["users"][user] = {}
-                    blueprint["users"][user] = copy.deepcopy(settings)
+                    blueprint["users"][user] = LayeredSettings(settings)
+
+
+# the number of rendered characters written at once by stream_template
+STREAM_BUFFER_SIZE: int = 64 * 1024
+# the settings values standing for the user running punchbox, and its group
+LOCAL_USER_NAME: str = "localusername"
+LOCAL_USER_GROUP: str = "localusergroup"
+
+
+@functools.lru_cache(maxsize=1)
+def local_user_and_group() -> Tuple[str, str]:
+    """Return the name of the current unix user and of its primary group.
+
+    The password and group databases are only looked up once per process.
+    """
+    userid = getpass.getuser()
+    groupid = pwd.getpwnam(userid).pw_gid
+    groupname = grp.getgrgid(groupid).gr_name
+    return userid, groupname
+
+
+def substitute_local_user(value: Any, username: str, groupname: str) -> Any:
+    """Replace the localusername and localusergroup placeholders.
+
+    Only the keys and strings that are exactly a placeholder are replaced, a value
+    merely containing one, a path or a description for instance, is left untouched.
+
+    :param value: a materialised blueprint, or any part of it
+    :param username: the localusername replacement
+    :param groupname: the localusergroup replacement
+    :return: a copy of value with its placeholders replaced
+    """
+    replacements = {LOCAL_USER_NAME: username, LOCAL_USER_GROUP: groupname}
+
+    def substitute(item: Any) -> Any:
+        if isinstance(item, str):
+            return replacements.get(item, item)
+        if isinstance(item, dict):
+            return {substitute(key): substitute(child) for key, child in item.items()}
+        if isinstance(item, list):
+            return [substitute(child) for child in item]
+        return item
+
+    return substitute(value)
+
+
+def build_blueprint(
+    settings_dict: Dict[str, Any],
+    topology_dict: Dict[str, Any],
+    deployer_path: Optional[str],
+    versions: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """Compute the platform blueprint.
+
+    :param settings_dict: the user settings dictionary. It contains platform and cluster wide settings
+    :param topology_dict: the user topology dictionary, It contains the servers dictionary
+    :param deployer_path: the punch deployer folder or zip archive, used to resolve versions
+    :param versions: component -> version map, the deployer is not probed if provided
+    :return: the blueprint, made of plain dicts, lists and scalars
+    """
+    # create a fresh new blueprint
+    blueprint: Dict[str, Any] = {
+        "services": {},
+        "platform": LayeredSettings(settings_dict["platform"]),
+    }
+    # first pass to fill all the settings
+    with timings.span("blueprint settings"):
+        compute_blueprint_setting(blueprint, settings_dict, topology_dict)
+    # second pass to take care of users
+    with timings.span("blueprint users"):
+        compute_blueprint_users(blueprint, topology_dict)
+    # last path to add versions wherever needed
+    with timings.span("blueprint versions"):
+        compute_blueprint_versions(blueprint, deployer_path, versions)
+    # settings are only copied here, once, right before serialisation
+    with timings.span("blueprint materialise"):
+        return substitute_local_user(
+            layered_settings.materialise(blueprint), *local_user_and_group()
+        )
+
+
+def render_resolver(
+    template: Any, context: Dict[str, Any], resolver: Optional[HostnameResolver]
+) -> HostnameResolver:
+    """Return the hostname resolver of a render.
+
+    If the resolver prefetches servers and the template resolves hostnames, the
+    server names of the context are all resolved up front, concurrently, rather than
+    one after the other while rendering. Names the template never resolves are then
+    looked up too, so this is off by default.
+
+    :param template: the compiled template
+    :param context: the template variables
+    :param resolver: the resolver to use, a new one configured from the environment if None
+    :return: the resolver
+    """
+    if resolver is None:
+        resolver = HostnameResolver.from_environment()
+    if resolver.prefetch_servers and hostnames.template_resolves_hostnames(
+        template.filename
+    ):
+        with timings.span("hostname prefetch"):
+            resolver.prefetch(hostnames.context_hostnames(context))
+    return resolver
+
+
+def render_template(
+    template: str,
+    context: Dict[str, Any],
+    template_cache: Optional[str] = None,
+    resolver: Optional[HostnameResolver] = None,
+) -> str:
+    """Render a jinja template.
+
+    :param template: the template file path
+    :param context: the template variables
+    :param template_cache: a folder where to keep the compiled templates, if any
+    :param resolver: resolves the template hostnames, a new one for this render if None
+    :return: the rendered template
+    """
+    loaded = ansible.load_template(template, template_cache)
+    resolver = render_resolver(loaded, context, resolver)
+    with hostnames.resolving(resolver), timings.span(f"template render {loaded.name}"):
+        return loaded.render(**context)
+
+
+def stream_template(
+    template: str,
+    context: Dict[str, Any],
+    output: IO[bytes],
+    template_cache: Optional[str] = None,
+    buffer_size: int = STREAM_BUFFER_SIZE,
+    resolver: Optional[HostnameResolver] = None,
+) -> None:
+    """Render a jinja template straight to a binary stream.
+
+    The rendered chunks are encoded and written as soon as about buffer_size
+    characters are pending, the whole rendered document is never held in memory.
+
+    :param template: the template file path
+    :param context: the template variables
+    :param output: where to write the UTF-8 encoded rendered template
+    :param template_cache: a folder where to keep the compiled templates, if any
+    :param buffer_size: the number of characters buffered before each write
+    :param resolver: resolves the template hostnames, a new one for this render if None
+    :return: None
+    """
+    pending: List[str] = []
+    pending_size = 0
+    loaded = ansible.load_template(template, template_cache)
+    resolver = render_resolver(loaded, context, resolver)
+    with hostnames.resolving(resolver), timings.span(f"template render {loaded.name}"):
+        for chunk in loaded.generate(**context):
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size >= buffer_size:
+                output.write("".join(pending).encode(encoding="UTF-8"))
+                pending, pending_size = [], 0
+        output.write("".join(pending).encode(encoding="UTF-8"))
+
+
+def vagrantfile_context(
+    vagrant_settings: Dict[str, Any], topology_dict: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Return the Vagrantfile template variables.
+
+    The vagrant settings and the topology are both top level variables of the
+    template, none of them may override the other.
+
+    :param vagrant_settings: the vagrant section of the user settings
+    :param topology_dict: the user topology dictionary
+    :return: the template variables
+    :raise click.BadParameter: if a vagrant setting has the name of a topology key
+    """
+    duplicates = sorted(set(vagrant_settings) & set(topology_dict))
+    if duplicates:
+        raise click.BadParameter(
+            f"vagrant settings {', '.join(duplicates)} are also topology keys"
+        )
+    return {**vagrant_settings, **topology_dict}
+
+
+def legacy_settings(deployment_settings: Union[str, bytes, IO]) -> str:
+    """Convert the deployment settings to the legacy json punchplatform-deployment.settings.
+
+    The yaml is parsed once, by libyaml when available, and the json is encoded in a
+    single pass by the C encoder, json.dump would use the much slower pure python one.
+
+    :param deployment_settings: the deployment settings yaml document or stream
+    :return: the legacy json document
+    """
+    return json.dumps(serialization.load_yaml(deployment_settings))
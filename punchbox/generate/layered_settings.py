@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import collections
+
+from typing import Any
+from typing import Mapping
+
+
+class LayeredSettings(collections.ChainMap):
+    """
+    Copy-on-write view over a stack of settings layers, the most specific one first.
+
+    Blueprint settings are layered platform -> service -> cluster -> server. Instead of
+    copying the less specific layers into every more specific one, each level only
+    references them. Lookups fall through the layers, while writes only ever touch the
+    view own (first) layer, leaving the shared layers and the user settings untouched.
+
+    Nested values are shared with the layers they come from until the view is
+    materialised, they must not be modified in place.
+    """
+
+    def __init__(self, *layers: Mapping[str, Any]) -> None:
+        # a fresh own layer receives all the writes made through this view
+        super().__init__({}, *(layer for layer in layers if layer is not None))
+
+    def over(self, *layers: Mapping[str, Any]) -> "LayeredSettings":
+        """Return a new view with layers stacked over this one
+
+        :param layers: the more specific layers, the most specific one first
+        :return: the new view
+        """
+        return LayeredSettings(*layers, *self.maps)
+
+
+def materialise(value: Any) -> Any:
+    """Return a plain copy of value where every settings view is flattened into a dict
+
+    This is where the settings are copied, only once, right before serialisation.
+    The keys are sorted, as in the dumped yaml document: templates iterate over the
+    blueprint in the same order whether it is rendered from memory or from its file.
+
+    :param value: a blueprint, or any part of it
+    :return: plain dicts, lists and scalars
+    """
+    if isinstance(value, Mapping):
+        return {key: materialise(value[key]) for key in sorted(value)}
+    if isinstance(value, list):
+        return [materialise(item) for item in value]
+    return value
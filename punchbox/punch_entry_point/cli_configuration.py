@@ -2,14 +2,19 @@
 # -*- coding: utf-8 -*-
 
 import dataclasses
+import importlib
 import logging
+import threading
 
 from typing import Any
 from typing import Dict
+from typing import List
+from typing import Optional
 from typing import Type
 
+import click
+
 from click_help_colors import HelpColorsGroup
-from rich.logging import RichHandler
 
 from punchbox.common_lib.runtime_meta.environment import Environment
 from punchbox.common_lib.runtime_meta.key import Key
@@ -23,6 +28,83 @@ class ClickSettings(object):
     help_options_color: str
 
 
+@dataclasses.dataclass()
+class LazyCommand(object):
+    """A subcommand only imported when it is invoked"""
+
+    # "package.module:attribute" of the click command
+    import_path: str
+    # shown by --help and shell completion, which do not import the command
+    short_help: str
+
+
+class LazyGroup(HelpColorsGroup):
+    """
+    A click group whose subcommands are imported the first time they are invoked.
+
+    Listing the subcommands, for --help or shell completion, only uses their declared
+    short help: the modules behind them and their dependencies (jinja2, yaml...) are
+    not imported.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        lazy_commands: Optional[Dict[str, LazyCommand]] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.lazy_commands: Dict[str, LazyCommand] = lazy_commands or {}
+
+    def list_commands(self, ctx: click.Context) -> List[str]:
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def load_command(self, cmd_name: str) -> Optional[click.Command]:
+        if cmd_name not in self.commands and cmd_name in self.lazy_commands:
+            module_name, attribute = self.lazy_commands[cmd_name].import_path.split(":")
+            self.add_command(
+                getattr(importlib.import_module(module_name), attribute), cmd_name
+            )
+        return self.commands.get(cmd_name)
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        if cmd_name not in self.commands and cmd_name in self.lazy_commands:
+            if ctx.resilient_parsing:
+                # shell completion listing the subcommands
+                return click.Command(
+                    cmd_name, help=self.lazy_commands[cmd_name].short_help
+                )
+        return self.load_command(cmd_name)
+
+    def resolve_command(self, ctx: click.Context, args: List[str]) -> Any:
+        # the invoked subcommand, or the one being completed, is always the real one
+        if args:
+            self.load_command(args[0])
+        return super().resolve_command(ctx, args)
+
+    def format_commands(
+        self, ctx: click.Context, formatter: click.HelpFormatter
+    ) -> None:
+        rows = []
+        for cmd_name in self.list_commands(ctx):
+            command = self.commands.get(cmd_name)
+            if command is None:
+                command = click.Command(
+                    cmd_name, help=self.lazy_commands[cmd_name].short_help
+                )
+            if not command.hidden:
+                rows.append((cmd_name, command))
+        if rows:
+            limit = formatter.width - 6 - max(len(cmd_name) for cmd_name, _ in rows)
+            with formatter.section("Commands"):
+                formatter.write_dl(
+                    [
+                        (cmd_name, command.get_short_help_str(limit))
+                        for cmd_name, command in rows
+                    ]
+                )
+
+
 class CliConfiguration(object):
     """
     static class grouping all essential configuration settings
@@ -42,17 +124,39 @@ class CliConfiguration(object):
         )
 
 
+_LOGGING_LOCK: threading.Lock = threading.Lock()
+_LOGGING_CONFIGURED: bool = False
+
+
+def configure_logging() -> None:
+    """Install the rich logging handler, once, the first time a PunchLogger is created
+
+    Importing rich is costly, commands that do not log, --help or shell completion,
+    do not pay for it.
+    """
+    global _LOGGING_CONFIGURED
+    with _LOGGING_LOCK:
+        if _LOGGING_CONFIGURED:
+            return
+        from rich.logging import RichHandler
+
+        # noinspection PyArgumentList
+        logging.basicConfig(
+            level=Environment.punchbox_log_level(),
+            format="%(message)s",
+            datefmt="[%X]",
+            handlers=[RichHandler(rich_tracebacks=True)],
+        )
+        _LOGGING_CONFIGURED = True
+
+
 class PunchLogger(object):
 
-    # noinspection PyArgumentList
-    logging.basicConfig(
-        level=Environment.punchbox_log_level(),
-        format="%(message)s",
-        datefmt="[%X]",
-        handlers=[RichHandler(rich_tracebacks=True)],
-    )
     __log: logging.Logger = logging.getLogger(Key.PUNCH_LOGGER)
 
+    def __init__(self) -> None:
+        configure_logging()
+
     @property
     def logger(self) -> logging.Logger:
         return self.__log
@@ -1,13 +1,66 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+from typing import Optional
+
 import click
 
+from punchbox.common_lib.command_meta.command_option import CommandOption
+from punchbox.common_lib.runtime_meta.environment import Environment
 from punchbox.punch_entry_point import cli_configuration
+from punchbox.utils import timings
 
 
-@click.group(**cli_configuration.CliConfiguration.click_command_settings())
-def cli() -> None:
+@click.group(
+    **dict(
+        cli_configuration.CliConfiguration.click_command_settings(),
+        cls=cli_configuration.LazyGroup,
+    ),
+    lazy_commands={
+        "deploy": cli_configuration.LazyCommand(
+            "punchbox.deploy.deploy:deploy", "Commands required to deploy your punch."
+        ),
+        "generate": cli_configuration.LazyCommand(
+            "punchbox.generate.generate:generate", "Generate deployment files."
+        ),
+        "resolve": cli_configuration.LazyCommand(
+            "punchbox.resolve.resolve:resolve",
+            "Preview resolved punchlines and channels.",
+        ),
+        "server": cli_configuration.LazyCommand(
+            "punchbox.server.server:server",
+            "Serve punchbox commands from a warm process.",
+        ),
+        "workspace": cli_configuration.LazyCommand(
+            "punchbox.workspace.workspace:workspace", "Setup your workspace."
+        ),
+    },
+)
+@click.option(
+    CommandOption.TIMINGS_OPT,
+    "print_timings",
+    is_flag=True,
+    default=False,
+    help="print how long each phase of the command took, when it is done. Also "
+    "enabled by $PUNCHPLATFORM_PUNCHBOX_TIMINGS",
+)
+@click.option(
+    CommandOption.CPROFILE_OPT,
+    type=click.Path(dir_okay=False),
+    help="write a cProfile dump of the command there, readable with pstats",
+)
+@click.option(
+    CommandOption.TRACEMALLOC_OPT,
+    type=click.Path(dir_okay=False),
+    help="write a tracemalloc snapshot of the command memory allocations there",
+)
+@click.pass_context
+def cli(
+    ctx: click.Context,
+    print_timings: bool,
+    cprofile: Optional[str],
+    tracemalloc: Optional[str],
+) -> None:
     """Welcome to punchbox. This tool is your easy way to deploy, test or develop on
     top of the punch or kast.
 
@@ -22,6 +75,12 @@ def cli() -> None:
     the configuration files.
 
     A good starting point is to type 'punchbox workspace create'
+
+    To see where the time of a command goes, run it with --timings.
     \f
     """
-    ...
+    ctx.call_on_close(
+        timings.instrument(
+            print_timings or Environment.punchbox_timings(), cprofile, tracemalloc
+        )
+    )
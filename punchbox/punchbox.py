@@ -1,25 +1,43 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from typing import Any
+import os
+import sys
 
-from rich.traceback import install
+from typing import Any
 
-from punchbox.deploy import deploy
-from punchbox.generate import generate
+from punchbox.common_lib.command_meta.commands import Commands
+from punchbox.common_lib.runtime_meta.environment import Environment
 from punchbox.punch_entry_point import punchbox
-from punchbox.workspace import workspace
+from punchbox.server import protocol
 
 
-install()
+def rich_excepthook(*exc_info: Any) -> None:
+    """Print uncaught exceptions with rich, only imported when one occurs"""
+    from rich.traceback import install
 
+    install()
+    sys.excepthook(*exc_info)
 
-def main() -> None:
 
+def forward_to_server() -> None:
+    """Let a running punchbox server run the command, if one is configured"""
+    socket_path = Environment.punchbox_server_socket()
+    argv = sys.argv[1:]
+    if socket_path is None or not argv or argv[0] == Commands.SERVER_CMD:
+        return
+    if "_PUNCHBOX_COMPLETE" in os.environ:
+        return
+    exit_code = protocol.forward(socket_path, argv)
+    if exit_code is not None:
+        sys.exit(exit_code)
+
+
+def main() -> None:
+    forward_to_server()
+    # the subcommands are imported when invoked, see cli_configuration.LazyGroup
+    sys.excepthook = rich_excepthook
     cli: Any = punchbox.cli
-    cli.add_command(deploy.deploy)
-    cli.add_command(generate.generate)
-    cli.add_command(workspace.workspace)
     cli()
 
 
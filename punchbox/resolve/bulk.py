@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import collections
+import dataclasses
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from punchbox.resolve import resolver as resolver_engine
+from punchbox.utils import serialization
+
+# the compiled rules of a worker process, by resolv.yml hash. Compiled on the first
+# chunk of files, rather than by a pool initializer, which needs python 3.7
+_WORKER_RESOLVER: Tuple[Optional[str], Optional[resolver_engine.Resolver]] = (
+    None,
+    None,
+)
+
+
+@dataclasses.dataclass()
+class FileResolution(object):
+    """The outcome of the resolution of one punchline or channel file"""
+
+    # the file path, relative to the resolved tree
+    path: str
+    # the sha256 of the file content
+    file_hash: str
+    # the names of the rules that set values in the file, in order
+    applied: List[str] = dataclasses.field(default_factory=list)
+    # the error message if the file could not be resolved
+    error: Optional[str] = None
+    # whether the outcome comes from the cache
+    cached: bool = False
+    # the resolved document, formatted as the file. None once cached
+    content: Optional[str] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+@dataclasses.dataclass()
+class TreeResolution(object):
+    """The outcome of the resolution of a whole tree"""
+
+    files: List[FileResolution]
+    seconds: float
+
+    @property
+    def succeeded(self) -> bool:
+        return all(resolution.succeeded for resolution in self.files)
+
+
+def file_hash(filename: str) -> str:
+    """The sha256 of a file content"""
+    digest = hashlib.sha256()
+    with open(filename, "rb") as infile:
+        for block in iter(lambda: infile.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ResolutionCache(object):
+    """
+    Persistent cache of the resolved files of a tree.
+
+    The index is a single json file, one entry per file path, recording the file and
+    resolv.yml hashes it was resolved with. The resolved documents are stored next to
+    it, one file per entry. An entry is only used while both hashes are unchanged.
+    """
+
+    INDEX_FILE_NAME: str = "index.json"
+    # bumped whenever the resolver semantics change, older caches are then ignored
+    FORMAT: int = 1
+
+    def __init__(self, cache_dir: str, resolver_hash: str) -> None:
+        self.cache_dir: str = cache_dir
+        self.resolver_hash: str = resolver_hash
+        self.index: Dict[str, Dict[str, Any]] = self.__load()
+
+    def __load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.cache_dir, self.INDEX_FILE_NAME)) as infile:
+                content = json.load(infile)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(content, dict) or content.get("format") != self.FORMAT:
+            return {}
+        files = content.get("files")
+        return files if isinstance(files, dict) else {}
+
+    def __document_path(self, path: str, file_hash: str) -> str:
+        key = hashlib.sha256(
+            f"{path}\0{file_hash}\0{self.resolver_hash}".encode("utf-8")
+        ).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, path: str, file_hash: str) -> Optional[FileResolution]:
+        """Return the cached outcome of a file, if it is still valid
+
+        :param path: the file path, relative to the resolved tree
+        :param file_hash: the current file content hash
+        :return: the cached outcome, without its content, or None
+        """
+        entry = self.index.get(path)
+        if not isinstance(entry, dict):
+            return None
+        hashes = (entry.get("file_hash"), entry.get("resolver_hash"))
+        if hashes != (file_hash, self.resolver_hash):
+            return None
+        if entry.get("error") is None and not os.path.exists(
+            self.__document_path(path, file_hash)
+        ):
+            return None
+        return FileResolution(
+            path=path,
+            file_hash=file_hash,
+            applied=list(entry.get("applied") or []),
+            error=entry.get("error"),
+            cached=True,
+        )
+
+    def read(self, resolution: FileResolution) -> str:
+        """Return the resolved document of a cached outcome"""
+        document_path = self.__document_path(resolution.path, resolution.file_hash)
+        with open(document_path, "r", encoding="utf-8") as infile:
+            return infile.read()
+
+    def put(self, resolution: FileResolution) -> None:
+        """Record a new outcome, and its resolved document. Call save once done"""
+        if resolution.content is not None:
+            document_path = self.__document_path(resolution.path, resolution.file_hash)
+            try:
+                write_atomically(document_path, resolution.content)
+            except OSError:
+                # the entry is not used without its document
+                pass
+        self.index[resolution.path] = {
+            "file_hash": resolution.file_hash,
+            "resolver_hash": self.resolver_hash,
+            "applied": resolution.applied,
+            "error": resolution.error,
+        }
+
+    def save(self, paths: List[str]) -> None:
+        """Write the index, only keeping the entries of the given paths
+
+        A cache that cannot be written is silently ignored, it only costs a new
+        resolution next time.
+
+        :param paths: the files of the tree, the entries of removed files are dropped
+        """
+        files = {path: self.index[path] for path in paths if path in self.index}
+        content = {"format": self.FORMAT, "files": files}
+        try:
+            write_atomically(
+                os.path.join(self.cache_dir, self.INDEX_FILE_NAME),
+                json.dumps(content, indent=2, sort_keys=True),
+            )
+        except OSError:
+            return
+        # the documents of the previous file versions are never read again
+        kept = {
+            self.__document_path(path, entry["file_hash"])
+            for path, entry in files.items()
+        }
+        for directory, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                document_path = os.path.join(directory, filename)
+                if directory != self.cache_dir and document_path not in kept:
+                    os.remove(document_path)
+
+
+def write_atomically(filename: str, content: str) -> None:
+    """Replace a file, readers never see it partially written"""
+    directory = os.path.dirname(filename)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as outfile:
+            outfile.write(content)
+        os.replace(tmp_path, filename)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def tree_documents(root: str) -> List[str]:
+    """Return the punchline and channel files of a tree, in order
+
+    :param root: the pp-conf folder, its tenants folder is walked
+    :return: the file paths, relative to root
+    """
+    documents: List[str] = []
+    for directory, subdirectories, filenames in os.walk(os.path.join(root, "tenants")):
+        subdirectories[:] = sorted(d for d in subdirectories if not d.startswith("."))
+        for filename in sorted(filenames):
+            if filename.endswith(resolver_engine.DOCUMENT_SUFFIXES):
+                documents.append(
+                    os.path.relpath(os.path.join(directory, filename), root)
+                )
+    return documents
+
+
+def _worker_resolver(
+    resolver_hash: str, rules: Dict[str, Any]
+) -> resolver_engine.Resolver:
+    global _WORKER_RESOLVER
+    if _WORKER_RESOLVER[0] != resolver_hash:
+        _WORKER_RESOLVER = (resolver_hash, resolver_engine.Resolver(rules))
+    return _WORKER_RESOLVER[1]
+
+
+def _resolve_file(
+    engine: resolver_engine.Resolver, root: str, path: str, current_hash: str
+) -> FileResolution:
+    """Resolve a file. Failures are reported, not raised"""
+    filename = os.path.join(root, path)
+    try:
+        document = resolver_engine.load_document(filename)
+        resolved, applied = engine.resolve(
+            document, resolver_engine.document_location(filename)
+        )
+        content = resolver_engine.dump_document(resolved, filename)
+    except Exception as error:
+        return FileResolution(
+            path=path,
+            file_hash=current_hash,
+            error=" ".join(f"{type(error).__name__}: {error}".split()),
+        )
+    return FileResolution(
+        path=path, file_hash=current_hash, applied=applied, content=content
+    )
+
+
+def _resolve_chunk(
+    resolver_hash: str, rules: Dict[str, Any], root: str, files: List[Tuple[str, str]]
+) -> List[FileResolution]:
+    """Resolve a chunk of files, in a worker process. The rules are sent once per
+    chunk, and only compiled again if they differ from the previous chunk ones"""
+    engine = _worker_resolver(resolver_hash, rules)
+    return [_resolve_file(engine, root, path, current) for path, current in files]
+
+
+def write_resolved_files(
+    files: List[FileResolution], cache: ResolutionCache, output: str
+) -> None:
+    """Write the resolved documents under their relative path, the failed ones aside"""
+    for resolution in files:
+        if not resolution.succeeded:
+            continue
+        content = resolution.content
+        if content is None:
+            content = cache.read(resolution)
+        destination = os.path.join(output, resolution.path)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        with open(destination, "w", encoding="utf-8") as outfile:
+            outfile.write(content)
+
+
+def resolve_tree(
+    root: str,
+    resolv_yml_file: str,
+    cache_dir: str,
+    output: Optional[str] = None,
+    force: bool = False,
+    processes: Optional[int] = None,
+) -> TreeResolution:
+    """Resolve every punchline and channel file of a tree, in parallel on a process pool
+
+    The resolv.yml rules are compiled once per worker process. Files whose content
+    and rules did not change since the previous run are taken from the cache,
+    without being parsed again.
+
+    :param root: the pp-conf folder
+    :param resolv_yml_file: the rules to apply
+    :param cache_dir: the cache folder of the tree
+    :param output: a folder to write the resolved files to, under their relative path
+    :param force: resolve every file, even the cached ones
+    :param processes: the number of worker processes, the number of cpus if None
+    :return: the outcome of each file, in tree order
+    :raise ResolverError: if a rule cannot be compiled
+    """
+    start = time.perf_counter()
+    with open(resolv_yml_file, "rb") as infile:
+        rules_content = infile.read()
+    rules = serialization.load_yaml(rules_content) or {}
+    # fail early, rather than once per worker
+    resolver_engine.Resolver(rules)
+    cache = ResolutionCache(cache_dir, hashlib.sha256(rules_content).hexdigest())
+
+    paths = tree_documents(root)
+    outcomes: Dict[str, FileResolution] = {}
+    jobs: List[Tuple[str, str]] = []
+    for path in paths:
+        current_hash = file_hash(os.path.join(root, path))
+        cached = None if force else cache.get(path, current_hash)
+        if cached is None:
+            jobs.append((path, current_hash))
+        else:
+            outcomes[path] = cached
+
+    if jobs:
+        workers = processes or os.cpu_count() or 1
+        chunksize = max(1, len(jobs) // (workers * 4))
+        chunks: List[List[Tuple[str, str]]] = []
+        for first in range(0, len(jobs), chunksize):
+            last = first + chunksize
+            chunks.append(jobs[first:last])
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [
+                executor.submit(_resolve_chunk, cache.resolver_hash, rules, root, chunk)
+                for chunk in chunks
+            ]
+            for future in futures:
+                for resolution in future.result():
+                    outcomes[resolution.path] = resolution
+                    cache.put(resolution)
+    if jobs or set(cache.index) != set(paths):
+        cache.save(paths)
+
+    files = [outcomes[path] for path in paths]
+    if output is not None:
+        write_resolved_files(files, cache, output)
+    for resolution in files:
+        # the documents are only needed for the output
+        resolution.content = None
+    return TreeResolution(files=files, seconds=time.perf_counter() - start)
+
+
+def summary(resolution: TreeResolution) -> str:
+    """Format a tree resolution outcome
+
+    :param resolution: the resolve_tree result
+    :return: the failed files, the number of files each rule applied to, then the
+        totals
+    """
+    lines: List[str] = []
+    failures = [file for file in resolution.files if not file.succeeded]
+    for failure in failures:
+        lines.append(f"    {failure.path}: failed")
+        lines.append(f"      {failure.error}")
+    usage: Dict[str, int] = collections.Counter(
+        rule for file in resolution.files for rule in file.applied
+    )
+    if usage:
+        width = max(len(rule) for rule in usage)
+        lines.append(f"    {'rule':<{width}}  {'files':>6}")
+        for rule, count in sorted(usage.items()):
+            lines.append(f"    {rule:<{width}}  {count:>6}")
+    cached = len([file for file in resolution.files if file.cached])
+    lines.append(
+        f"    {len(resolution.files)} files, {len(resolution.files) - cached} "
+        f"resolved, {cached} cached, {len(failures)} failed in "
+        f"{resolution.seconds:.3f}s"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+from pathlib import Path
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import click
+
+from punchbox.common_lib.command_meta.command_option import CommandOption
+from punchbox.common_lib.command_meta.commands import Commands
+from punchbox.common_lib.data_classes.workspace_hierarchy import WorkspaceHierarchy
+from punchbox.punch_entry_point.cli_configuration import PunchLogger
+from punchbox.resolve import bulk
+from punchbox.resolve import resolver as resolver_engine
+from punchbox.utils import timings
+
+
+@click.command(name=Commands.RESOLVE_CMD)
+@click.option(
+    CommandOption.FILE_OPT,
+    "files",
+    required=False,
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="a punchline or channel file to resolve, can be repeated. The whole "
+    "workspace pp-conf tenants tree is resolved otherwise",
+)
+@click.option(
+    CommandOption.WORKSPACE_OPT,
+    required=False,
+    default=str(Path.home()) + "/punchbox-workspace",
+    type=click.Path(),
+    help="the punchbox workspace, its resolv.yml rules are applied",
+)
+@click.option(
+    CommandOption.RESOLVER_OPT,
+    required=False,
+    type=click.Path(exists=True, dir_okay=False),
+    help="the resolv.yml rules to apply instead of the workspace ones",
+)
+@click.option(
+    CommandOption.OUTPUT_OPT,
+    required=False,
+    type=click.Path(file_okay=False),
+    help="folder to write the resolved files to. The given files are printed "
+    "otherwise, a tree resolution only prints its summary",
+)
+@click.option(
+    CommandOption.FORCE_OPT,
+    is_flag=True,
+    default=False,
+    help="resolve every file of the tree, even the ones cached by a previous run",
+)
+@click.option(
+    *CommandOption.JOBS_OPT,
+    default=None,
+    type=click.IntRange(min=1),
+    help="the number of files of the tree resolved at the same time. The default is "
+    "the number of cpus",
+)
+def resolve(
+    files: Tuple[str, ...],
+    workspace: Union[str, bytes, os.PathLike],
+    resolver: Optional[str],
+    output: Optional[str],
+    force: bool = False,
+    jobs: Optional[int] = None,
+) -> None:
+    """Preview resolved punchlines and channels.
+
+    The resolv.yml rules are applied to each file, as the punch resolver does, the
+    files themselves are left untouched.
+
+    Without --file, every punchline and channel file of the workspace pp-conf
+    tenants tree is resolved, in parallel on a pool of processes, and a summary is
+    printed. The outcomes are cached in the workspace: the next run only resolves
+    the files changed since, or all of them if the resolv.yml rules changed.
+    """
+    work_struct = WorkspaceHierarchy(str(workspace))
+    if resolver is None:
+        resolver = work_struct.dest_resolv_yml_file
+    if files:
+        resolve_files(files, resolver, output)
+        return
+    try:
+        with timings.span("resolve tree"):
+            resolution = bulk.resolve_tree(
+                work_struct.pp_conf_dir,
+                resolver,
+                work_struct.resolve_cache_dir,
+                output=output,
+                force=force,
+                processes=jobs,
+            )
+    except (OSError, resolver_engine.ResolverError) as error:
+        raise click.ClickException(str(error))
+    click.echo(bulk.summary(resolution))
+    if not resolution.succeeded:
+        sys.exit(1)
+
+
+def resolve_files(files: Tuple[str, ...], resolver: str, output: Optional[str]) -> None:
+    """Resolve the given files, print them or write them to the output folder"""
+    try:
+        with timings.span("resolver compile"):
+            engine = resolver_engine.load_resolver(resolver)
+    except (OSError, resolver_engine.ResolverError) as error:
+        raise click.ClickException(str(error))
+    for filename in files:
+        with timings.span("resolve"):
+            try:
+                document = resolver_engine.load_document(filename)
+            except (OSError, resolver_engine.DocumentError) as error:
+                raise click.ClickException(str(error))
+            resolved, applied = engine.resolve(
+                document, resolver_engine.document_location(filename)
+            )
+            content = resolver_engine.dump_document(resolved, filename)
+        rules = ", ".join(applied) or "no rule"
+        if output is None:
+            PunchLogger().info_green(f"# {filename}: {rules}")
+            click.echo(content, nl=False)
+            continue
+        os.makedirs(output, exist_ok=True)
+        destination = os.path.join(output, os.path.basename(filename))
+        with open(destination, "w", encoding="utf-8") as stream:
+            stream.write(content)
+        PunchLogger().info_green(f"{filename} -> {destination}: {rules}")
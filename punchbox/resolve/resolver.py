@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+The punch resolver, on the punchbox side.
+
+A resolv.yml file holds named rules. Each one selects nodes of the punchlines and
+channel files with a JSONPath 'match' expression, and sets its 'additional_values'
+in them:
+
+.. code-block:: yaml
+
+    kafka_input:
+      match: "$.dag[?(@.type=='kafka_input' || @.type=='kafka_output')].settings"
+      additional_values:
+        brokers: common
+
+The supported JSONPath subset is the one resolv.yml files use: '$', '.key', '[*]' and
+'[?(predicate)]' filters, made of '@.path' existence tests, '==' and '!=' comparisons
+with literals, '!', '&&', '||' and parentheses. A filter applies to each element of a
+list, or to a mapping itself.
+
+All the rules are compiled once into a single tree of path steps. A filter made of
+'@.field == literal' comparisons, such as the type and runtime ones, is indexed by its
+literals: an element is dispatched with one lookup of its field value, rather than
+by evaluating every rule predicate. A document is then resolved in a single
+traversal. Rules only see the document as it was read, then the values of the
+matching rules are set in resolv.yml order, overriding the existing ones.
+"""
+
+import copy
+import dataclasses
+import fnmatch
+import json
+import os
+import re
+
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import yaml
+
+from punchbox.utils import serialization
+
+try:
+    import hjson
+except ImportError:  # pragma: no cover
+    # json documents are valid hjson ones, hjson only syntax needs the hjson package
+    hjson = None
+
+# the 'selection' keys, matched against the resolved document location
+SELECTION_KEYS: Tuple[str, ...] = ("tenant", "channel", "runtime", "name")
+# the punchline and channel file formats
+DOCUMENT_SUFFIXES: Tuple[str, ...] = (".hjson", ".json", ".yml", ".yaml")
+
+_MISSING: Any = object()
+_TOKEN: Any = re.compile(
+    r"\s*(?:(?P<string>'[^']*'|\"[^\"]*\")|(?P<op>==|!=|&&|\|\||[!()])"
+    r"|(?P<path>@(?:\.[A-Za-z0-9_\-]+)*)"
+    r"|(?P<literal>-?[0-9]+(?:\.[0-9]+)?|true|false|null))"
+)
+_LITERALS: Dict[str, Any] = {"true": True, "false": False, "null": None}
+_STEP: Any = re.compile(
+    r"\.?\[\?\((?P<filter>.*?)\)\](?=\.|\[|$)|\.?\[\*\]|\.?\[['\"](?P<quoted>[^'\"]+)['\"]\]"
+    r"|\.(?P<key>[^.\[]+)"
+)
+
+
+class ResolverError(ValueError):
+    """A resolv.yml rule that cannot be compiled"""
+
+
+class DocumentError(ValueError):
+    """A punchline or channel file that cannot be parsed"""
+
+
+# A predicate takes a node and tells whether it is selected
+Predicate = Callable[[Any], bool]
+
+
+def _lookup(node: Any, path: Tuple[str, ...]) -> Any:
+    for key in path:
+        if not isinstance(node, dict) or key not in node:
+            return _MISSING
+        node = node[key]
+    return node
+
+
+@dataclasses.dataclass()
+class _Filter(object):
+    """A compiled filter predicate, with its indexable comparisons if any"""
+
+    predicate: Predicate
+    # set when the filter is '@.field == literal' comparisons joined by '||'
+    field: Optional[str] = None
+    values: Tuple[Any, ...] = ()
+
+
+class _PredicateParser(object):
+    """Recursive descent parser of the JSONPath filter predicates"""
+
+    def __init__(self, expression: str) -> None:
+        self.expression: str = expression
+        self.tokens: List[Tuple[str, str]] = []
+        position = 0
+        expression = expression.rstrip()
+        while position < len(expression):
+            token = _TOKEN.match(expression, position)
+            if token is None or token.end() == position:
+                raise ResolverError(
+                    f"unexpected '{expression[position:]}' in filter '{self.expression}'"
+                )
+            kind = token.lastgroup
+            self.tokens.append((kind, token.group(kind)))
+            position = token.end()
+        self.position: int = 0
+
+    def __peek(self) -> Optional[Tuple[str, str]]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def __next(self) -> Tuple[str, str]:
+        token = self.__peek()
+        if token is None:
+            raise ResolverError(f"incomplete filter '{self.expression}'")
+        self.position += 1
+        return token
+
+    def parse(self) -> _Filter:
+        compiled = self.__or()
+        if self.__peek() is not None:
+            raise ResolverError(
+                f"unexpected '{self.__peek()[1]}' in filter '{self.expression}'"
+            )
+        return compiled
+
+    def __or(self) -> _Filter:
+        operands = [self.__and()]
+        while self.__peek() == ("op", "||"):
+            self.__next()
+            operands.append(self.__and())
+        if len(operands) == 1:
+            return operands[0]
+        predicates = [operand.predicate for operand in operands]
+        compiled = _Filter(lambda node: any(p(node) for p in predicates))
+        fields = {operand.field for operand in operands}
+        if None not in fields and len(fields) == 1:
+            compiled.field = fields.pop()
+            compiled.values = sum((operand.values for operand in operands), ())
+        return compiled
+
+    def __and(self) -> _Filter:
+        operands = [self.__unary()]
+        while self.__peek() == ("op", "&&"):
+            self.__next()
+            operands.append(self.__unary())
+        if len(operands) == 1:
+            return operands[0]
+        predicates = [operand.predicate for operand in operands]
+        return _Filter(lambda node: all(p(node) for p in predicates))
+
+    def __unary(self) -> _Filter:
+        kind, value = self.__next()
+        if (kind, value) == ("op", "!"):
+            negated = self.__unary().predicate
+            return _Filter(lambda node: not negated(node))
+        if (kind, value) == ("op", "("):
+            compiled = self.__or()
+            if self.__next() != ("op", ")"):
+                raise ResolverError(f"unbalanced parentheses in '{self.expression}'")
+            return compiled
+        if kind != "path":
+            raise ResolverError(f"unexpected '{value}' in filter '{self.expression}'")
+        path = tuple(value.split(".")[1:])
+        operator = self.__peek()
+        if operator not in (("op", "=="), ("op", "!=")):
+            return _Filter(lambda node: _lookup(node, path) not in (_MISSING, None))
+        self.__next()
+        literal = self.__literal()
+        if operator[1] == "!=":
+            return _Filter(lambda node: _lookup(node, path) != literal)
+        compiled = _Filter(lambda node: _lookup(node, path) == literal)
+        if len(path) == 1 and isinstance(literal, (str, int, float, bool)):
+            compiled.field, compiled.values = path[0], (literal,)
+        return compiled
+
+    def __literal(self) -> Any:
+        kind, value = self.__next()
+        if kind == "string":
+            return value[1:-1]
+        if kind == "literal":
+            if value in _LITERALS:
+                return _LITERALS[value]
+            return float(value) if "." in value else int(value)
+        raise ResolverError(f"expected a literal, got '{value}' in '{self.expression}'")
+
+
+def compile_match(match: str) -> List[Tuple[str, Any]]:
+    """Compile a JSONPath match expression into path steps
+
+    :param match: the rule match expression
+    :return: ('key', name), ('all', None) or ('filter', _Filter) steps
+    """
+    expression = match.strip()
+    if expression.startswith("$"):
+        expression = expression[1:]
+    steps: List[Tuple[str, Any]] = []
+    position = 0
+    while position < len(expression):
+        step = _STEP.match(expression, position)
+        if step is None:
+            raise ResolverError(
+                f"unsupported '{expression[position:]}' in match '{match}'"
+            )
+        if step.group("filter") is not None:
+            steps.append(("filter", _PredicateParser(step.group("filter")).parse()))
+        elif step.group("key") is not None:
+            steps.append(("key", step.group("key")))
+        elif step.group("quoted") is not None:
+            steps.append(("key", step.group("quoted")))
+        else:
+            steps.append(("all", None))
+        position = step.end()
+    # '$.' alone, or a trailing dot, selects the root
+    return steps
+
+
+@dataclasses.dataclass()
+class Rule(object):
+    """A resolv.yml rule"""
+
+    name: str
+    # the order of the rule in its file, values are set in that order
+    index: int
+    match: str
+    additional_values: Dict[str, Any]
+    # selection key -> glob pattern, the documents the rule applies to
+    selection: Dict[str, str] = dataclasses.field(default_factory=dict)
+
+    def selects(self, location: Dict[str, Optional[str]]) -> bool:
+        """Whether the rule applies to a document
+
+        :param location: selection key -> value, the document tenant, channel...
+        """
+        for key, pattern in self.selection.items():
+            value = location.get(key)
+            if value is None:
+                if str(pattern) != "*":
+                    return False
+            elif not fnmatch.fnmatchcase(value, str(pattern)):
+                return False
+        return True
+
+
+class _Node(object):
+    """A position in the compiled rules tree, reached by the same path steps"""
+
+    def __init__(self) -> None:
+        # the rules selecting the document nodes found at this position
+        self.rules: List[Rule] = []
+        self.keys: Dict[str, "_Node"] = {}
+        self.all: Optional["_Node"] = None
+        # field -> value -> position, for '@.field == value' filters
+        self.indexed: Dict[str, Dict[Any, "_Node"]] = {}
+        self.filters: List[Tuple[_Filter, "_Node"]] = []
+
+    def insert(self, steps: List[Tuple[str, Any]], rule: Rule) -> None:
+        if not steps:
+            self.rules.append(rule)
+            return
+        (kind, argument), rest = steps[0], steps[1:]
+        if kind == "key":
+            self.keys.setdefault(argument, _Node()).insert(rest, rule)
+        elif kind == "all":
+            if self.all is None:
+                self.all = _Node()
+            self.all.insert(rest, rule)
+        elif argument.field is not None:
+            by_value = self.indexed.setdefault(argument.field, {})
+            for value in dict.fromkeys(argument.values):
+                by_value.setdefault(value, _Node()).insert(rest, rule)
+        else:
+            child = _Node()
+            child.insert(rest, rule)
+            self.filters.append((argument, child))
+
+    def collect(self, value: Any, matches: List[Tuple[int, int, Any, Rule]]) -> None:
+        """Record the document nodes selected from value, for each rule"""
+        for rule in self.rules:
+            matches.append((rule.index, len(matches), value, rule))
+        if isinstance(value, dict):
+            for key, child in self.keys.items():
+                if key in value:
+                    child.collect(value[key], matches)
+        if self.all is not None:
+            elements = value.values() if isinstance(value, dict) else value
+            if isinstance(value, (dict, list)):
+                for element in list(elements):
+                    self.all.collect(element, matches)
+        if self.indexed or self.filters:
+            elements = value if isinstance(value, list) else [value]
+            for element in elements:
+                self.__dispatch(element, matches)
+
+    def __dispatch(
+        self, element: Any, matches: List[Tuple[int, int, Any, Rule]]
+    ) -> None:
+        if isinstance(element, dict):
+            for field, by_value in self.indexed.items():
+                field_value = element.get(field, _MISSING)
+                try:
+                    child = by_value.get(field_value)
+                except TypeError:
+                    # an unhashable field value never equals a literal
+                    child = None
+                if child is not None:
+                    child.collect(element, matches)
+        for compiled, child in self.filters:
+            if compiled.predicate(element):
+                child.collect(element, matches)
+
+
+class Resolver(object):
+    """
+    The rules of a resolv.yml file, compiled once and applied to many documents
+    """
+
+    def __init__(self, rules: Dict[str, Any]) -> None:
+        """
+        :param rules: the parsed resolv.yml, rule name -> match, additional_values and
+            optional selection
+        """
+        self.rules: List[Rule] = []
+        self.__root: _Node = _Node()
+        for index, (name, definition) in enumerate((rules or {}).items()):
+            if not isinstance(definition, dict) or "match" not in definition:
+                raise ResolverError(f"resolver rule '{name}' has no 'match' expression")
+            rule = Rule(
+                name=name,
+                index=index,
+                match=definition["match"],
+                additional_values=definition.get("additional_values") or {},
+                selection=dict(definition.get("selection") or {}),
+            )
+            try:
+                steps = compile_match(rule.match)
+            except ResolverError as error:
+                raise ResolverError(f"resolver rule '{name}': {error}") from error
+            self.__root.insert(steps, rule)
+            self.rules.append(rule)
+
+    def resolve(
+        self, document: Any, location: Optional[Dict[str, Optional[str]]] = None
+    ) -> Tuple[Any, List[str]]:
+        """Set the additional values of the matching rules in a document
+
+        :param document: a parsed punchline or channel file, it is left untouched
+        :param location: the document tenant, channel, runtime and name, matched
+            against the rules selection. The runtime defaults to the document one
+        :return: the resolved copy of the document, and the names of the rules that
+            set values in it, in order
+        """
+        location = dict(location or {})
+        if location.get("runtime") is None and isinstance(document, dict):
+            runtime = document.get("runtime")
+            location["runtime"] = runtime if isinstance(runtime, str) else None
+        resolved = copy.deepcopy(document)
+        matches: List[Tuple[int, int, Any, Rule]] = []
+        self.__root.collect(resolved, matches)
+        selected: Dict[int, bool] = {}
+        applied: List[str] = []
+        for index, _, node, rule in sorted(matches, key=lambda match: match[:2]):
+            if not isinstance(node, dict):
+                continue
+            if index not in selected:
+                selected[index] = rule.selects(location)
+            if not selected[index]:
+                continue
+            node.update(copy.deepcopy(rule.additional_values))
+            if rule.name not in applied:
+                applied.append(rule.name)
+        return resolved, applied
+
+
+def load_resolver(resolv_yml_file: str) -> Resolver:
+    """Compile the rules of a resolv.yml file
+
+    :param resolv_yml_file: path to the resolv.yml file
+    """
+    with open(resolv_yml_file, "r") as stream:
+        return Resolver(serialization.load_yaml(stream))
+
+
+def load_document(filename: str) -> Any:
+    """Parse a punchline or channel file, according to its extension
+
+    :param filename: a .hjson, .json, .yml or .yaml file
+    :raise DocumentError: if the file cannot be parsed
+    """
+    with open(filename, "r", encoding="utf-8") as stream:
+        try:
+            if filename.endswith((".yml", ".yaml")):
+                return serialization.load_yaml(stream)
+            if filename.endswith(".hjson") and hjson is not None:
+                return hjson.load(stream)
+            return json.load(stream)
+        except (ValueError, yaml.YAMLError) as error:
+            if filename.endswith(".hjson") and hjson is None:
+                raise DocumentError(
+                    f"{filename}: not a plain json document, the hjson python "
+                    f"package is needed to parse hjson ({error})"
+                )
+            raise DocumentError(f"{filename}: {error}")
+
+
+def dump_document(document: Any, filename: str) -> str:
+    """Format a document as the file it was read from
+
+    :param document: the resolved document
+    :param filename: the file name, its extension tells the format
+    :return: the formatted document
+    """
+    if filename.endswith((".yml", ".yaml")):
+        return serialization.dump_yaml(document, default_flow_style=False)
+    if filename.endswith(".hjson") and hjson is not None:
+        return hjson.dumps(document, indent=2) + "\n"
+    return json.dumps(document, indent=2) + "\n"
+
+
+def document_location(filename: str) -> Dict[str, Optional[str]]:
+    """The tenant, channel and name of a document, from its path
+
+    :param filename: a file under a tenants/<tenant>/channels/<channel> folder, or
+        any other file, its tenant and channel are then unknown
+    :return: selection key -> value, None if unknown
+    """
+    parts = os.path.normpath(os.path.abspath(filename)).split(os.sep)
+    location: Dict[str, Optional[str]] = dict.fromkeys(SELECTION_KEYS)
+    location["name"] = os.path.splitext(parts[-1])[0]
+    for position in range(len(parts) - 2, -1, -1):
+        if parts[position] == "tenants" and position + 1 < len(parts) - 1:
+            location["tenant"] = parts[position + 1]
+            if position + 3 < len(parts) - 1 and parts[position + 2] == "channels":
+                location["channel"] = parts[position + 3]
+            break
+    return location
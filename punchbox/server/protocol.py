@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import socket
+import sys
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+# Kept free of heavy imports: the cli imports this module before deciding whether to
+# run a command itself or forward it to a running punchbox server.
+
+# the environment variables sent along with a forwarded command
+FORWARDED_ENVIRONMENT_PREFIXES = ("PUNCHPLATFORM_", "PUNCHBOX_")
+
+
+def send_message(connection: socket.socket, message: Dict[str, Any]) -> None:
+    """Send a json message, terminated by a new line
+
+    :param connection: a connected unix socket
+    :param message: the message
+    :return: None
+    """
+    connection.sendall(json.dumps(message).encode("UTF-8") + b"\n")
+
+
+def receive_message(connection: socket.socket) -> Optional[Dict[str, Any]]:
+    """Receive a json message sent with send_message
+
+    :param connection: a connected unix socket
+    :return: the message, None if the connection was closed before a full message
+    """
+    chunks: List[bytes] = []
+    while True:
+        chunk = connection.recv(1 << 16)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        if chunk.endswith(b"\n"):
+            return json.loads(b"".join(chunks).decode("UTF-8"))
+
+
+def command_request(argv: List[str]) -> Dict[str, Any]:
+    """Describe a command to run on the server, as if run from this process
+
+    :param argv: the punchbox arguments, without the program name
+    :return: the request message
+    """
+    return {
+        "argv": argv,
+        "cwd": os.getcwd(),
+        "environment": {
+            key: value
+            for key, value in os.environ.items()
+            if key.startswith(FORWARDED_ENVIRONMENT_PREFIXES)
+        },
+    }
+
+
+def write_output(message: Dict[str, Any]) -> None:
+    """Print the command output carried by a server message"""
+    sys.stdout.buffer.write(message["stdout"].encode("UTF-8"))
+    sys.stdout.flush()
+    sys.stderr.buffer.write(message["stderr"].encode("UTF-8"))
+    sys.stderr.flush()
+
+
+def is_listening(socket_path: str) -> bool:
+    """Tell if a punchbox server accepts connections on a unix socket"""
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except OSError:
+        return False
+    finally:
+        connection.close()
+    return True
+
+
+def forward(socket_path: str, argv: List[str]) -> Optional[int]:
+    """Run a command on a punchbox server, and print its output
+
+    The command prompts are answered from this process input, one line each.
+
+    :param socket_path: the server unix socket
+    :param argv: the punchbox arguments, without the program name
+    :return: the command exit code, None if no server is listening
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except OSError:
+        connection.close()
+        return None
+    # from here on the command may have started, it must not be run locally again
+    try:
+        send_message(connection, command_request(argv))
+        response = receive_message(connection)
+        # the command prompts: show its output so far, then send the answer
+        while response is not None and response.get("input"):
+            write_output(response)
+            send_message(connection, {"line": sys.stdin.readline()})
+            response = receive_message(connection)
+    except OSError:
+        response = None
+    finally:
+        connection.close()
+    if response is None:
+        sys.stderr.write(f"punchbox server {socket_path} closed the connection\n")
+        return 1
+    write_output(response)
+    return int(response["exit_code"])
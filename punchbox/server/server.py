@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import contextlib
+import io
+import os
+import signal
+import socket
+import sys
+import traceback
+
+from typing import IO
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+
+import click
+
+from punchbox.common_lib.command_meta.command_option import CommandOption
+from punchbox.common_lib.command_meta.commands import Commands
+from punchbox.common_lib.runtime_meta.environment import Environment
+from punchbox.punch_entry_point.cli_configuration import PunchLogger
+from punchbox.server import protocol
+
+
+def default_socket() -> str:
+    return Environment.punchbox_server_socket() or os.path.join(
+        Environment.punchbox_cache_dir(), "server.sock"
+    )
+
+
+class CapturedOutput(object):
+    """The output of a command, sent to the client piece by piece"""
+
+    def __init__(self) -> None:
+        self.stdout: io.TextIOWrapper = io.TextIOWrapper(
+            io.BytesIO(), encoding="UTF-8", write_through=True
+        )
+        self.stderr: io.TextIOWrapper = io.TextIOWrapper(
+            io.BytesIO(), encoding="UTF-8", write_through=True
+        )
+        self.__sent: Dict[str, int] = {"stdout": 0, "stderr": 0}
+
+    def drain(self) -> Dict[str, str]:
+        """Return the output written since the previous call"""
+        drained: Dict[str, str] = {}
+        for name, stream in (("stdout", self.stdout), ("stderr", self.stderr)):
+            content = stream.buffer.getvalue()
+            sent, self.__sent[name] = self.__sent[name], len(content)
+            drained[name] = content[sent:].decode("UTF-8", errors="replace")
+        return drained
+
+
+class ClientInput(io.TextIOBase):
+    """The command input, read from the client one line at a time
+
+    Each line is asked for along with the output written so far, the client shows
+    the prompt before reading the answer from its own input.
+    """
+
+    def __init__(self, connection: socket.socket, output: CapturedOutput) -> None:
+        super().__init__()
+        self.connection: socket.socket = connection
+        self.output: CapturedOutput = output
+
+    def readable(self) -> bool:
+        return True
+
+    def readline(self, size: Optional[int] = -1) -> str:
+        message: Dict[str, Any] = self.output.drain()
+        message["input"] = True
+        protocol.send_message(self.connection, message)
+        answer = protocol.receive_message(self.connection)
+        # an empty line is the end of the input, as for a closed file
+        return "" if answer is None else str(answer.get("line", ""))
+
+
+@contextlib.contextmanager
+def captured_streams(
+    stdin: IO[str], stdout: IO[str], stderr: IO[str]
+) -> Iterator[None]:
+    """Run with the client input and a captured output"""
+    previous = sys.stdin, sys.stdout, sys.stderr
+    sys.stdin, sys.stdout, sys.stderr = stdin, stdout, stderr
+    try:
+        yield
+    finally:
+        sys.stdin, sys.stdout, sys.stderr = previous
+
+
+@contextlib.contextmanager
+def request_environment(cwd: str, environment: Dict[str, str]) -> Iterator[None]:
+    """Run from the client working directory, with its punchbox environment variables
+
+    The server's own punchbox variables that the client did not send are unset
+    meanwhile.
+    """
+    previous_cwd = os.getcwd()
+    previous_environment: Dict[str, Optional[str]] = {
+        key: value
+        for key, value in os.environ.items()
+        if key.startswith(protocol.FORWARDED_ENVIRONMENT_PREFIXES)
+    }
+    previous_environment.update({key: os.environ.get(key) for key in environment})
+    os.chdir(cwd)
+    for key in previous_environment:
+        if key not in environment:
+            del os.environ[key]
+    os.environ.update(environment)
+    try:
+        yield
+    finally:
+        os.chdir(previous_cwd)
+        for key, value in previous_environment.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def run_command(
+    request: Dict[str, Any], connection: Optional[socket.socket] = None
+) -> Dict[str, Any]:
+    """Run a punchbox command in this process, as the client would have
+
+    :param request: the protocol.command_request message
+    :param connection: the client connection, prompts read their answer from the
+        client input through it. Prompts read an empty input if None
+    :return: the response message, the command exit code and the output not sent yet
+    """
+    # imported here, the cli module itself lazily loads the subcommands
+    from punchbox.punch_entry_point import punchbox
+
+    output = CapturedOutput()
+    stdin: IO[str] = io.StringIO()
+    if connection is not None:
+        stdin = ClientInput(connection, output)
+    exit_code: Any = 0
+    with request_environment(request["cwd"], request["environment"]):
+        with captured_streams(stdin, output.stdout, output.stderr):
+            try:
+                punchbox.cli.main(args=request["argv"], prog_name="punchbox")
+            except SystemExit as exit_request:
+                exit_code = exit_request.code
+            except Exception:
+                traceback.print_exc()
+                exit_code = 1
+    if exit_code is None:
+        exit_code = 0
+    elif not isinstance(exit_code, int):
+        output.stderr.write(f"{exit_code}\n")
+        exit_code = 1
+    response: Dict[str, Any] = output.drain()
+    response["exit_code"] = exit_code
+    return response
+
+
+def serve(socket_path: str, max_requests: Optional[int] = None) -> None:
+    """Serve punchbox commands on a unix socket, one at a time
+
+    :param socket_path: the unix socket to listen on
+    :param max_requests: stop after that many commands, serve forever if None
+    :return: None
+    """
+    if protocol.is_listening(socket_path):
+        raise click.ClickException(
+            f"a punchbox server already listens on {socket_path}"
+        )
+    if os.path.exists(socket_path):
+        # left over by a server that did not stop cleanly
+        os.remove(socket_path)
+    os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        # only the server user can connect, from the moment the socket exists
+        previous_umask = os.umask(0o077)
+        try:
+            listener.bind(socket_path)
+        finally:
+            os.umask(previous_umask)
+        os.chmod(socket_path, 0o600)
+        listener.listen(16)
+        served = 0
+        while max_requests is None or served < max_requests:
+            connection, _ = listener.accept()
+            with connection:
+                request = protocol.receive_message(connection)
+                if request is None:
+                    continue
+                protocol.send_message(connection, run_command(request, connection))
+                served += 1
+    finally:
+        listener.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+@click.command(name=Commands.SERVER_CMD)
+@click.option(
+    CommandOption.SOCKET_OPT,
+    "socket_path",
+    default=default_socket,
+    type=click.Path(dir_okay=False),
+    help="the unix socket to listen on. The default is "
+    "$PUNCHPLATFORM_PUNCHBOX_SERVER_SOCKET, or else server.sock in the punchbox cache "
+    "folder",
+)
+def server(socket_path: str) -> None:
+    """
+    Serve punchbox commands from a warm process.
+
+    The server keeps the compiled templates and the deployer component versions in
+    memory, the commands it runs do not pay for python startup, imports and template
+    compilation again.
+
+    Set PUNCHPLATFORM_PUNCHBOX_SERVER_SOCKET to the server socket and every punchbox
+    command is forwarded to the server, or run locally if no server is listening.
+    Commands run from the client working directory and with its PUNCHPLATFORM_ and
+    PUNCHBOX_ environment variables, one at a time. Their prompts are shown by the
+    client, and answered from its input.
+    """
+    # stopped by a SIGTERM as by a ctrl-c, the socket is removed either way
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    PunchLogger().info_green(f"punchbox server listening on {socket_path}")
+    try:
+        serve(socket_path)
+    except KeyboardInterrupt:
+        PunchLogger().info_green("punchbox server stopped")
@@ -1,19 +1,39 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import functools
 import json
 import os
 import re
-import socket
 import subprocess
-import sys
+import tempfile
+import threading
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Pattern
+from typing import Tuple
+from typing import Union
 
 import jinja2
-import yaml
+import jinja2.meta
 
 from punchbox import components
+from punchbox.common_lib.runtime_meta.environment import Environment
+from punchbox.utils import deployer
+from punchbox.utils import hostnames
+from punchbox.utils import serialization
+from punchbox.utils import timings
+from punchbox.utils.deployer import VersionBackend
+from punchbox.utils.serialization_filters import AnsibleJSONEncoder  # noqa: F401
+from punchbox.utils.serialization_filters import to_json
+from punchbox.utils.serialization_filters import to_nice_json
+from punchbox.utils.serialization_filters import to_nice_yaml
+from punchbox.utils.serialization_filters import to_yaml
+from punchbox.utils.version_cache import VersionCache
 
 
 # This main module is used to render a jinja2 template
@@ -21,34 +41,42 @@ from punchbox import components
 # must be provided as a json dictionnary string
 
 
-class AnsibleJSONEncoder(json.JSONEncoder):
-    """
-    Simple encoder class to deal with JSON encoding of internal
-    types like HostVars
-    """
+# the url filters patterns, compiled once
+URL_PORT_PATTERN: Pattern = re.compile(".*:([0-9]+).*")
+URL_PATH_PATTERN: Pattern = re.compile("[^/]*/(.*)")
+URL_HOST_PATTERN: Pattern = re.compile(":.*")
+# the number of distinct regex_subst patterns kept compiled
+REGEX_CACHE_SIZE: int = 256
 
-    def default(self, o):
-        if isinstance(o):
-            return dict(o)
-        else:
-            return super(AnsibleJSONEncoder, self).default(o)
 
+@functools.lru_cache(maxsize=REGEX_CACHE_SIZE)
+def compiled_pattern(pat: Union[str, Pattern]) -> Pattern:
+    return re.compile(pat)
 
-def regex_subst(st, pat, repl):
+
+def _subst(st, pattern, repl):
     if isinstance(st, list):
-        return [regex_subst(a_string, pat, repl) for a_string in st]
-    return re.sub(pat, repl, st)
+        return [_subst(a_string, pattern, repl) for a_string in st]
+    return pattern.sub(repl, st)
+
+
+def regex_subst(st, pat, repl):
+    return _subst(st, compiled_pattern(pat), repl)
 
 
 def url_to_port(st, default_port=None):
-    port_string = re.sub(".*:([0-9]+).*", "\\1", st)
+    if isinstance(st, list):
+        return [url_to_port(a_string, default_port) for a_string in st]
+    port_string = URL_PORT_PATTERN.sub("\\1", st)
     if port_string == st:
         port_string = default_port
     return port_string
 
 
 def url_to_path(st):
-    path_string = re.sub("[^/]*/(.*)", "/\\1", st)
+    if isinstance(st, list):
+        return [url_to_path(a_string) for a_string in st]
+    path_string = URL_PATH_PATTERN.sub("/\\1", st)
     if path_string == st:
         path_string = "/"
     return path_string
@@ -57,7 +85,7 @@ def url_to_path(st):
 def url_to_host(st):
     if isinstance(st, list):
         return [url_to_host(a_string) for a_string in st]
-    return re.sub(":.*", "", st)
+    return URL_HOST_PATTERN.sub("", st)
 
 
 @jinja2.contextfunction
@@ -66,10 +94,8 @@ def get_context(c):
 
 
 def resolve_hostname_to_ip(st):
-    ip = socket.gethostbyname(st)
-    if ip == "":
-        raise Exception("Could not resolve provided hostname '" + st + "'.")
-    return ip
+    # memoised for the duration of the render, see generate_helper.render_template
+    return hostnames.active_resolver().resolve(st)
 
 
 def remove_duplicates(mylist):
@@ -84,73 +110,73 @@ def env_override(value, key):
     return os.getenv(key, value)
 
 
-def to_json(a, *args, **kw):
-    """Convert the value to JSON"""
-
-    return json.dumps(a, cls=AnsibleJSONEncoder, *args, **kw)
-
+def to_basename(path):
+    return os.path.basename(path)
 
-def to_yaml(a, *args, **kw):
-    return a
 
+class SourceBytecodeCache(jinja2.FileSystemBytecodeCache):
+    """
+    Compiled templates keyed by template name and source rather than by path.
 
-def to_basename(path):
-    return os.path.basename(path)
+    Identical templates copied into several workspaces are compiled once, whichever
+    workspace they are loaded from. The compiled code keeps the filename of the
+    template it was first compiled from: a rendering error traceback may point at the
+    same template in another workspace.
 
+    The cache files are replaced atomically, several processes can share the cache
+    directory without reading a partially written file.
+    """
 
-def to_nice_yaml(a, indentation=4, line_breaker="\n", optional_indent=0, *args, **kw):
-    """Make verbose, human readable yaml"""
-    transformed = yaml.safe_dump(
-        a, indent=indentation, default_flow_style=False, line_break=line_breaker
-    )
-    shift = ""
-    for i in range(optional_indent):
-        shift = " " + shift
-    transformed2 = ""
-    for line in transformed.split("\n"):
-        transformed2 += shift + line + "\n"
-    return transformed2
-
-
-def to_nice_json(a, indent=4, *args, **kw):
-    """Make verbose, human readable JSON"""
-    # python-2.6's json encoder is buggy (can't encode hostvars)
-    if sys.version_info < (2, 7):
-        try:
-            import simplejson
-        except ImportError:
-            pass
-        else:
-            try:
-                major = int(simplejson.__version__.split(".")[0])
-            except Exception:
-                pass
-            else:
-                if major >= 2:
-                    return simplejson.dumps(
-                        a, indent=indent, sort_keys=True, *args, **kw
-                    )
-
-    try:
-        return json.dumps(
-            a, indent=indent, sort_keys=True, cls=AnsibleJSONEncoder, *args, **kw
+    def get_bucket(
+        self,
+        environment: jinja2.Environment,
+        name: str,
+        filename: Optional[str],
+        source: str,
+    ) -> jinja2.bccache.Bucket:
+        checksum = self.get_source_checksum(source)
+        bucket = jinja2.bccache.Bucket(
+            environment, self.get_cache_key(name, checksum), checksum
         )
-    except Exception:
-        # Fallback to the to_json filter
-        return to_json(a, *args, **kw)
+        self.load_bytecode(bucket)
+        return bucket
 
-
-def load_template(template_filename):
-    template_dir = os.path.dirname(template_filename)
+    def dump_bytecode(self, bucket: jinja2.bccache.Bucket) -> None:
+        tmp_path: Optional[str] = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as outfile:
+                bucket.write_bytecode(outfile)
+            os.replace(tmp_path, self._get_cache_filename(bucket))
+        except OSError:
+            # a cache that cannot be written only costs a compilation next time
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+# jinja environments, one per template directory and bytecode cache directory. They
+# keep the compiled templates in memory and only recompile a template when its source
+# file changes.
+_ENVIRONMENTS: Dict[Tuple[str, Optional[str]], jinja2.Environment] = {}
+_ENVIRONMENTS_LOCK: threading.Lock = threading.Lock()
+
+
+def _create_environment(
+    template_dir: str, bytecode_cache_dir: Optional[str]
+) -> jinja2.Environment:
+    bytecode_cache: Optional[jinja2.BytecodeCache] = None
+    if bytecode_cache_dir is not None:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        bytecode_cache = SourceBytecodeCache(bytecode_cache_dir)
     env = jinja2.Environment(
         loader=jinja2.FileSystemLoader(template_dir),
         undefined=jinja2.StrictUndefined,
         extensions=["jinja2.ext.do"],
         trim_blocks=True,
         lstrip_blocks=True,
+        bytecode_cache=bytecode_cache,
     )
-    template_name = os.path.basename(template_filename)
-    env.filters["jsonify"] = json.dumps
+    env.filters["jsonify"] = to_json
     env.filters["regex_subst"] = regex_subst
     env.filters["url_to_host"] = url_to_host
     env.filters["url_to_port"] = url_to_port
@@ -164,23 +190,206 @@ def load_template(template_filename):
     env.filters["to_yaml"] = to_yaml
     env.filters["to_basename"] = to_basename
     env.filters["is_dict_empty"] = is_dict_empty
-    template = env.get_template(template_name)
-    template.globals["context"] = get_context
-    template.globals["callable"] = callable
-    return template
+    env.globals["context"] = get_context
+    env.globals["callable"] = callable
+    return env
+
+
+def _environment(
+    template_dir: str, bytecode_cache_dir: Optional[str]
+) -> jinja2.Environment:
+    if bytecode_cache_dir is not None:
+        bytecode_cache_dir = os.path.abspath(bytecode_cache_dir)
+    key = (template_dir, bytecode_cache_dir)
+    with _ENVIRONMENTS_LOCK:
+        env = _ENVIRONMENTS.get(key)
+        if env is None:
+            env = _create_environment(template_dir, bytecode_cache_dir)
+            _ENVIRONMENTS[key] = env
+    return env
+
+
+def load_template(
+    template_filename: str, bytecode_cache_dir: Optional[str] = None
+) -> jinja2.Template:
+    """
+    Return the compiled template, using the jinja environment of its directory.
+
+    If bytecode_cache_dir is provided, compiled templates are also persisted there so
+    that a template is compiled once per revision rather than once per process.
+    """
+    template_dir = os.path.abspath(os.path.dirname(str(template_filename)))
+    env = _environment(template_dir, bytecode_cache_dir)
+    template_name = os.path.basename(str(template_filename))
+    with timings.span(f"template load {template_name}"):
+        return env.get_template(template_name)
+
+
+@functools.lru_cache(maxsize=64)
+def _template_references(
+    template_dir: str, filename: str, mtime_ns: int
+) -> Tuple[str, ...]:
+    with open(filename, encoding="UTF-8") as infile:
+        source = infile.read()
+    ast = _environment(template_dir, None).parse(source)
+    # names computed at render time are None, they cannot be known beforehand
+    return tuple(
+        os.path.join(template_dir, name)
+        for name in jinja2.meta.find_referenced_templates(ast)
+        if name is not None
+    )
 
 
-def get_components_version(deployer_path: str) -> Dict[str, str]:
+def referenced_templates(template_filename: str) -> List[str]:
+    """
+    Return the templates a template includes, imports or extends, and theirs in turn.
+
+    They are looked up in the template directory, as load_template does. The ones
+    that do not exist are returned as well, a render would fail on them.
+    """
+    template_dir = os.path.abspath(os.path.dirname(str(template_filename)))
+    referenced: List[str] = []
+    pending: List[str] = [os.path.abspath(str(template_filename))]
+    while pending:
+        filename = pending.pop()
+        try:
+            references = _template_references(
+                template_dir, filename, os.stat(filename).st_mtime_ns
+            )
+        except (OSError, jinja2.TemplateSyntaxError):
+            continue
+        for reference in references:
+            if reference not in referenced:
+                referenced.append(reference)
+                pending.append(reference)
+    return sorted(referenced)
+
+
+VERSIONOF_SHELL: str = "bin/punchplatform-versionof.sh"
+VERSION_PROBE_TIMEOUT: float = 60.0
+VERSION_PROBE_MAX_WORKERS: int = 8
+
+
+def deployer_fingerprint(deployer_path: str) -> Optional[str]:
+    """
+    Return a key identifying the deployer version sources, None if there is none.
+
+    The key is made of the absolute path, mtime and size of the deployer zip archive,
+    or of the version script and version manifest of a deployer folder.
+    """
+    deployer_path = os.path.abspath(deployer_path)
+    sources = [deployer_path]
+    if not os.path.isfile(deployer_path):
+        sources = [
+            os.path.join(deployer_path, VERSIONOF_SHELL),
+            os.path.join(deployer_path, deployer.VERSION_MANIFEST),
+        ]
+    keys: List[str] = []
+    for source in sources:
+        try:
+            stat = os.stat(source)
+        except OSError:
+            continue
+        keys.append(f"{source}:{stat.st_mtime_ns}:{stat.st_size}")
+    return "|".join(keys) if keys else None
+
+
+def probe_component_version(
+    versionof_shell: str, component: str, timeout: float = VERSION_PROBE_TIMEOUT
+) -> str:
+    """
+    Ask the deployer version script for the version of a single component
+    """
+    result = subprocess.run(
+        [versionof_shell, "--legacy", component],
+        stdout=subprocess.PIPE,
+        check=True,
+        timeout=timeout,
+    )
+    return result.stdout.decode("utf-8").rstrip()
+
+
+def read_components_version(
+    deployer_path: str, component_names: List[str], backend: str
+) -> Dict[str, str]:
+    """
+    Read component versions from the deployer version manifest, without forking anything
+
+    With the native backend, a missing manifest or component is an error. Otherwise
+    only the components found in the manifest are returned.
+    """
+    manifest = deployer.read_version_manifest(deployer_path)
+    if manifest is None:
+        if backend == VersionBackend.NATIVE:
+            raise FileNotFoundError(
+                f"no {deployer.VERSION_MANIFEST} found in deployer {deployer_path}"
+            )
+        return {}
+    unknown = [c for c in component_names if c not in manifest]
+    if unknown and backend == VersionBackend.NATIVE:
+        raise KeyError(f"no version for {unknown} in deployer {deployer_path}")
+    return {c: manifest[c] for c in component_names if c in manifest}
+
+
+def get_components_version(
+    deployer_path: str,
+    component_names: Optional[Iterable[str]] = None,
+    timeout: float = VERSION_PROBE_TIMEOUT,
+    max_workers: int = VERSION_PROBE_MAX_WORKERS,
+    use_cache: bool = True,
+    backend: Optional[str] = None,
+) -> Dict[str, str]:
     """
     Return a map containing all component version
+
+    If component_names is provided, only the known components among them are
+    resolved. Components missing from the persistent version cache are read from the
+    deployer version manifest (native backend), or else probed concurrently with the
+    deployer version script (shell backend) on a bounded pool, each probe being killed
+    after timeout seconds. The backend defaults to the
+    PUNCHPLATFORM_PUNCHBOX_VERSION_BACKEND environment variable.
     """
-    data = {}
-    versionof_shell = os.path.join(deployer_path, "bin/punchplatform-versionof.sh")
-    for component in components.COMPONENTS:
-        cmd = "{0} --legacy {1}".format(versionof_shell, component)
-        result = subprocess.check_output(cmd, shell=True)
-        data[component] = result.decode("utf-8").rstrip()
-    return data
+    if backend is None:
+        backend = Environment.punchbox_version_backend()
+    if backend not in VersionBackend.ALL:
+        raise ValueError(
+            f"unknown version backend {backend}, expected one of {VersionBackend.ALL}"
+        )
+    wanted: List[str] = components.COMPONENTS
+    if component_names is not None:
+        names = set(component_names)
+        wanted = [c for c in components.COMPONENTS if c in names]
+    if not wanted:
+        return {}
+    versionof_shell = os.path.join(deployer_path, VERSIONOF_SHELL)
+    fingerprint = deployer_fingerprint(deployer_path) if use_cache else None
+    cache = VersionCache(Environment.punchbox_cache_dir())
+    data: Dict[str, str] = {}
+    if fingerprint is not None:
+        cached = cache.get(fingerprint)
+        data = {c: cached[c] for c in wanted if c in cached}
+    missing: List[str] = [c for c in wanted if c not in data]
+    resolved: Dict[str, str] = {}
+    if missing and backend != VersionBackend.SHELL:
+        with timings.span("version manifest"):
+            resolved = read_components_version(deployer_path, missing, backend)
+        missing = [c for c in missing if c not in resolved]
+    if missing:
+        with timings.span("version probe"), ThreadPoolExecutor(
+            max_workers=max(1, max_workers)
+        ) as executor:
+            probed = executor.map(
+                lambda component: probe_component_version(
+                    versionof_shell, component, timeout
+                ),
+                missing,
+            )
+            resolved.update(zip(missing, probed))
+    if resolved:
+        data.update(resolved)
+        if fingerprint is not None:
+            cache.update(fingerprint, resolved)
+    return {c: data[c] for c in wanted}
 
 
 def dict_to_string(dictionary: dict, file_format: str) -> str:
@@ -192,6 +401,6 @@ def dict_to_string(dictionary: dict, file_format: str) -> str:
     if file_format.lower() == "json":
         return json.dumps(dictionary, indent=4)
     elif file_format.lower() == "yaml":
-        return yaml.safe_dump(dictionary)
+        return serialization.dump_yaml(dictionary)
     else:
         raise NotImplementedError(f"Unknown file format {file_format}")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import functools
+import os
+import zipfile
+
+from typing import ClassVar
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+from punchbox.utils import serialization
+
+
+class VersionBackend(object):
+    """
+    The ways component versions can be resolved from a punch deployer
+    """
+
+    # read the version manifest if the deployer has one, else run the version script
+    AUTO: ClassVar[str] = "auto"
+    # read the version manifest, in process, from the deployer folder or zip archive
+    NATIVE: ClassVar[str] = "native"
+    # run bin/punchplatform-versionof.sh once per component
+    SHELL: ClassVar[str] = "shell"
+    ALL: ClassVar[Tuple[str, ...]] = (AUTO, NATIVE, SHELL)
+
+
+# component -> version mapping shipped at the root of the deployer
+VERSION_MANIFEST: str = "punchplatform-versions.yml"
+
+
+def _parse_version_manifest(content: bytes) -> Dict[str, str]:
+    manifest = serialization.load_yaml(content)
+    if not isinstance(manifest, dict):
+        raise ValueError(f"invalid deployer {VERSION_MANIFEST}, expected a mapping")
+    return {str(key): str(value) for key, value in manifest.items()}
+
+
+def _find_manifest_member(archive: zipfile.ZipFile) -> Optional[str]:
+    """Return the manifest member name, at the archive root or under the deployer top folder"""
+    for name in archive.namelist():
+        parts = name.split("/")
+        if parts[-1] == VERSION_MANIFEST and len(parts) <= 2:
+            return name
+    return None
+
+
+@functools.lru_cache(maxsize=16)
+def _read_version_manifest(
+    deployer_path: str, mtime_ns: int, size: int
+) -> Optional[Dict[str, str]]:
+    if os.path.isdir(deployer_path):
+        manifest_path = os.path.join(deployer_path, VERSION_MANIFEST)
+        if not os.path.isfile(manifest_path):
+            return None
+        with open(manifest_path, "rb") as infile:
+            return _parse_version_manifest(infile.read())
+    if not zipfile.is_zipfile(deployer_path):
+        return None
+    # only the central directory and the manifest member are read from the archive
+    with zipfile.ZipFile(deployer_path) as archive:
+        member = _find_manifest_member(archive)
+        if member is None:
+            return None
+        return _parse_version_manifest(archive.read(member))
+
+
+def read_version_manifest(deployer_path: str) -> Optional[Dict[str, str]]:
+    """
+    Return the component versions declared by a deployer folder or zip archive.
+
+    The manifest is parsed once per deployer revision and kept in memory.
+
+    :param deployer_path: the punch deployer folder or zip archive
+    :return: a component -> version map, None if the deployer has no version manifest
+    """
+    deployer_path = os.path.abspath(deployer_path)
+    target = deployer_path
+    if os.path.isdir(deployer_path):
+        target = os.path.join(deployer_path, VERSION_MANIFEST)
+    try:
+        stat = os.stat(target)
+    except OSError:
+        return None
+    manifest = _read_version_manifest(deployer_path, stat.st_mtime_ns, stat.st_size)
+    return None if manifest is None else dict(manifest)
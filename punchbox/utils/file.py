@@ -1,14 +1,19 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import contextlib
 import os
 import shutil
+import uuid
 
+from typing import IO
+from typing import Iterator
 from typing import Tuple
 
 from punchbox.common_lib.data_classes import punchbox_configuration
 from punchbox.common_lib.runtime_meta.key import Key
 from punchbox.punch_entry_point.cli_configuration import PunchLogger
+from punchbox.utils import serialization
 
 
 class File(object):
@@ -46,15 +51,38 @@ class File(object):
     @staticmethod
     def write_dict_as_yaml(path: str, content: dict) -> None:
         with open(path, "w+") as outfile:
-            import yaml
-
-            yaml.dump(content, outfile)
+            serialization.dump_yaml(content, outfile)
 
     @staticmethod
     def write_unicode_as_text_file(path: str, content: str) -> None:
         with open(path, "w+") as file:
             file.write(content)
 
+    @staticmethod
+    @contextlib.contextmanager
+    def atomic_output(path: str) -> Iterator[IO[bytes]]:
+        """Open a binary file to replace path, only once it is completely written
+
+        If writing fails, path is left untouched and the partial file is removed.
+
+        :param path: the file to write
+        :return: the opened temporary file, in the same directory
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        tmp_path = os.path.join(
+            directory, f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp"
+        )
+        # unlike mkstemp, the file gets the usual permissions, as with open
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            with os.fdopen(fd, "wb") as output:
+                yield output
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
     @staticmethod
     def read_punchbox_settings_file(path: str) -> punchbox_configuration.Punchbox:
         conf: dict = File.read_file_yaml_as_dict(path)
@@ -72,11 +100,9 @@ class File(object):
 
     @staticmethod
     def read_file_yaml_as_dict(path: str) -> dict:
-        import yaml
-
         conf: dict
         with open(path) as infile:
-            conf = yaml.load(infile.read(), Loader=yaml.SafeLoader)
+            conf = serialization.load_yaml(infile.read())
         return conf
 
     @staticmethod
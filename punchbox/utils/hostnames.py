@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import contextlib
+import functools
+import os
+import socket
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+
+from punchbox.common_lib.runtime_meta.environment import Environment
+
+PREFETCH_MAX_WORKERS: int = 16
+RESOLVE_FILTER: str = "resolve_hostname_to_ip"
+
+
+def read_hosts_file(path: str) -> Dict[str, str]:
+    """Parse an /etc/hosts style file
+
+    :param path: the hosts file, 'address hostname [aliases...]' lines
+    :return: hostname -> address, the first line naming a host wins
+    """
+    hosts: Dict[str, str] = {}
+    with open(path) as infile:
+        for line in infile:
+            fields = line.split("#", 1)[0].split()
+            for hostname in fields[1:]:
+                hosts.setdefault(hostname, fields[0])
+    return hosts
+
+
+class HostnameResolver(object):
+    """
+    Resolves hostnames to ip addresses, each hostname once.
+
+    Offline, hostnames are only looked up in the hosts map, no network request is
+    ever made and an unknown hostname is an error. Otherwise the hosts map entries
+    take precedence over the system resolver, and a failed lookup is remembered: it
+    is raised again rather than retried. A resolver can be shared by threads.
+    """
+
+    def __init__(
+        self,
+        hosts: Optional[Dict[str, str]] = None,
+        offline: bool = False,
+        prefetch_servers: bool = False,
+    ) -> None:
+        """
+        :param hosts: hostname -> address entries
+        :param offline: only resolve hostnames from the hosts entries
+        :param prefetch_servers: resolve all the server names of a template context
+            before rendering it, if the template resolves hostnames
+        """
+        self.offline: bool = offline
+        self.prefetch_servers: bool = prefetch_servers
+        self.__addresses: Dict[str, str] = dict(hosts or {})
+        self.__failures: Dict[str, Exception] = {}
+        self.__lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def from_environment() -> "HostnameResolver":
+        """An offline resolver if PUNCHPLATFORM_PUNCHBOX_HOSTS_FILE is set, else online.
+        Servers are prefetched if PUNCHPLATFORM_PUNCHBOX_HOSTNAME_PREFETCH is set"""
+        hosts_file = Environment.punchbox_hosts_file()
+        prefetch_servers = Environment.punchbox_hostname_prefetch()
+        if hosts_file is None:
+            return HostnameResolver(prefetch_servers=prefetch_servers)
+        return HostnameResolver(
+            read_hosts_file(hosts_file),
+            offline=True,
+            prefetch_servers=prefetch_servers,
+        )
+
+    def resolve(self, hostname: str) -> str:
+        """Return the address of a hostname, only looked up the first time
+
+        :param hostname: the hostname
+        :return: its ipv4 address
+        """
+        with self.__lock:
+            address = self.__addresses.get(hostname)
+            failure = self.__failures.get(hostname)
+        if address is not None:
+            return address
+        if failure is not None:
+            raise failure
+        if self.offline:
+            raise Exception(
+                f"Could not resolve provided hostname '{hostname}'. It is not in "
+                f"the hosts file, and hostnames are resolved offline."
+            )
+        try:
+            address = socket.gethostbyname(hostname)
+            if address == "":
+                raise Exception(f"Could not resolve provided hostname '{hostname}'.")
+        except Exception as error:
+            with self.__lock:
+                self.__failures[hostname] = error
+            raise
+        with self.__lock:
+            self.__addresses[hostname] = address
+        return address
+
+    def prefetch(
+        self, hostnames: Iterable[str], max_workers: int = PREFETCH_MAX_WORKERS
+    ) -> None:
+        """Resolve hostnames concurrently, ahead of their use
+
+        A hostname that cannot be resolved is skipped, the error is remembered and
+        raised if and when it is actually resolved.
+
+        :param hostnames: the hostnames to resolve
+        :param max_workers: the maximum number of concurrent lookups
+        """
+        if self.offline:
+            return
+        with self.__lock:
+            missing = {
+                name
+                for name in hostnames
+                if name not in self.__addresses and name not in self.__failures
+            }
+        if not missing:
+            return
+
+        def lookup(hostname: str) -> None:
+            try:
+                self.resolve(hostname)
+            except Exception:
+                pass
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            list(executor.map(lookup, sorted(missing)))
+
+
+_LOCAL: threading.local = threading.local()
+
+
+@contextlib.contextmanager
+def resolving(resolver: HostnameResolver) -> Iterator[HostnameResolver]:
+    """Make resolver the one used by the resolve filter, in this thread
+
+    :param resolver: the resolver of a render, its memo lives as long as the render
+    """
+    previous = getattr(_LOCAL, "resolver", None)
+    _LOCAL.resolver = resolver
+    try:
+        yield resolver
+    finally:
+        _LOCAL.resolver = previous
+
+
+def active_resolver() -> HostnameResolver:
+    """The resolver of the current render, a fresh one outside of any render"""
+    resolver = getattr(_LOCAL, "resolver", None)
+    if resolver is None:
+        return HostnameResolver.from_environment()
+    return resolver
+
+
+def context_hostnames(context: Any) -> List[str]:
+    """Return the server names of a template context
+
+    :param context: a blueprint, or a topology
+    :return: the keys of every 'servers' mapping, in order and once each
+    """
+    hostnames: Dict[str, None] = {}
+
+    def visit(item: Any) -> None:
+        if isinstance(item, dict):
+            for key, child in item.items():
+                if key == "servers" and isinstance(child, dict):
+                    hostnames.update(dict.fromkeys(child))
+                visit(child)
+        elif isinstance(item, list):
+            for child in item:
+                visit(child)
+
+    visit(context)
+    return list(hostnames)
+
+
+@functools.lru_cache(maxsize=64)
+def _source_resolves_hostnames(filename: str, mtime_ns: int) -> bool:
+    with open(filename, encoding="UTF-8") as infile:
+        return RESOLVE_FILTER in infile.read()
+
+
+def template_resolves_hostnames(filename: Optional[str]) -> bool:
+    """Whether a template file uses the resolve_hostname_to_ip filter
+
+    :param filename: the template file
+    :return: False as well if the file cannot be read
+    """
+    if filename is None:
+        return False
+    try:
+        return _source_resolves_hostnames(filename, os.stat(filename).st_mtime_ns)
+    except OSError:
+        return False
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from typing import IO
+from typing import Any
+from typing import Optional
+from typing import Union
+
+import yaml
+
+from punchbox.utils import timings
+
+# All punchbox yaml parsing and dumping goes through this module. The libyaml based
+# loader and dumper are several times faster than the pure python ones, they are
+# picked whenever PyYAML was built with libyaml.
+LIBYAML: bool = hasattr(yaml, "CSafeLoader") and hasattr(yaml, "CSafeDumper")
+
+SafeLoader: Any = yaml.CSafeLoader if LIBYAML else yaml.SafeLoader
+SafeDumper: Any = yaml.CSafeDumper if LIBYAML else yaml.SafeDumper
+
+
+class _BinaryStream(object):
+    """Only exposes the write method of a binary stream"""
+
+    def __init__(self, stream: IO[bytes]) -> None:
+        self.write = stream.write
+
+
+def load_yaml(stream: Union[str, bytes, IO[Any]]) -> Any:
+    """Parse a yaml document
+
+    :param stream: the yaml document, as a string or an opened file
+    :return: the parsed document
+    """
+    with timings.span("yaml load"):
+        return yaml.load(stream, Loader=SafeLoader)
+
+
+def dump_yaml(data: Any, stream: Optional[IO[Any]] = None, **kwargs: Any) -> Any:
+    """Dump data as a yaml document
+
+    :param data: the data to dump
+    :param stream: an opened file to write to, if not provided the document is returned
+    :param kwargs: the yaml.dump formatting options (indent, line_break, encoding...)
+    :return: the yaml document if no stream is provided, None otherwise
+    """
+    if stream is not None and kwargs.get("encoding") is not None:
+        # libyaml writes text, not bytes, to any stream having an encoding attribute,
+        # click lazy files for instance
+        stream = _BinaryStream(stream)
+    with timings.span("yaml dump"):
+        return yaml.dump(data, stream, Dumper=SafeDumper, **kwargs)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import collections.abc
+import datetime
+import json
+
+from typing import Any
+
+from punchbox.utils import serialization
+
+
+class AnsibleJSONEncoder(json.JSONEncoder):
+    """
+    Encoder of the values handed to the templates: mappings such as the blueprint
+    layered settings, sets, dates and times. Anything else is left to json.JSONEncoder
+    """
+
+    def default(self, o: Any) -> Any:
+        if isinstance(o, collections.abc.Mapping):
+            return dict(o)
+        if isinstance(o, (set, frozenset)):
+            return list(o)
+        if isinstance(o, (datetime.date, datetime.time)):
+            return o.isoformat()
+        return super(AnsibleJSONEncoder, self).default(o)
+
+
+_ENCODER: AnsibleJSONEncoder = AnsibleJSONEncoder()
+
+
+def to_json(a, *args, **kw):
+    """Convert the value to JSON"""
+    if not args and not kw:
+        # the C encoder, without building an encoder each call
+        return _ENCODER.encode(a)
+    return json.dumps(a, cls=AnsibleJSONEncoder, *args, **kw)
+
+
+def to_nice_json(a, indent=4, *args, **kw):
+    """Make verbose, human readable JSON"""
+    try:
+        return json.dumps(
+            a, indent=indent, sort_keys=True, cls=AnsibleJSONEncoder, *args, **kw
+        )
+    except Exception:
+        # Fallback to the to_json filter
+        return to_json(a, *args, **kw)
+
+
+def to_yaml(a, *args, **kw):
+    return a
+
+
+def to_nice_yaml(a, indentation=4, line_breaker="\n", optional_indent=0, *args, **kw):
+    """Make verbose, human readable yaml"""
+    transformed = serialization.dump_yaml(
+        a, indent=indentation, default_flow_style=False, line_break=line_breaker
+    )
+    shift = " " * optional_indent
+    return shift + ("\n" + shift).join(transformed.split("\n")) + "\n"
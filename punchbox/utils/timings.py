@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import contextlib
+import dataclasses
+import sys
+import threading
+import time
+
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+
+@dataclasses.dataclass()
+class Span(object):
+    """A timed phase, the spans of the same name under the same parent are summed"""
+
+    name: str
+    seconds: float = 0.0
+    calls: int = 0
+    children: Dict[str, "Span"] = dataclasses.field(default_factory=dict)
+
+
+_LOCK: threading.Lock = threading.Lock()
+# the root span while timings are enabled, None otherwise
+_ROOT: Optional[Span] = None
+_ROOT_START: float = 0.0
+# the open spans of each thread
+_LOCAL: threading.local = threading.local()
+
+
+def enable(name: str = "punchbox") -> None:
+    """Start recording spans, forgetting the ones recorded before"""
+    global _ROOT, _ROOT_START
+    with _LOCK:
+        _ROOT = Span(name, calls=1)
+        _ROOT_START = time.perf_counter()
+
+
+def disable() -> Optional[Span]:
+    """Stop recording spans
+
+    :return: the root span, holding every span recorded since enable, None if
+        timings were not enabled
+    """
+    global _ROOT
+    with _LOCK:
+        root, _ROOT = _ROOT, None
+    if root is not None:
+        root.seconds = time.perf_counter() - _ROOT_START
+    return root
+
+
+def _stack(root: Span) -> List[Span]:
+    # a stack left over by a previous recording is dropped
+    if getattr(_LOCAL, "root", None) is not root:
+        _LOCAL.root = root
+        _LOCAL.stack = []
+    return _LOCAL.stack
+
+
+def current() -> Optional[Span]:
+    """The innermost open span of this thread, None if timings are disabled
+
+    Pass it as the parent of the spans opened by worker threads.
+    """
+    root = _ROOT
+    if root is None:
+        return None
+    stack = _stack(root)
+    return stack[-1] if stack else root
+
+
+@contextlib.contextmanager
+def span(name: str, parent: Optional[Span] = None) -> Iterator[None]:
+    """Time a phase, nested in the innermost open span of this thread
+
+    Does nothing unless timings are enabled.
+
+    :param name: the phase name
+    :param parent: the span to nest this one in, instead of the innermost open one
+    """
+    root = _ROOT
+    if root is None:
+        yield
+        return
+    stack = _stack(root)
+    if parent is None:
+        parent = stack[-1] if stack else root
+    with _LOCK:
+        node = parent.children.get(name)
+        if node is None:
+            node = parent.children[name] = Span(name)
+    stack.append(node)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+        with _LOCK:
+            node.seconds += elapsed
+            node.calls += 1
+
+
+def report(root: Span) -> str:
+    """Format a span tree, one line per span with its total duration
+
+    :param root: the disable result
+    :return: the timing tree
+    """
+    rows: List[Tuple[str, Span]] = []
+
+    def visit(node: Span, depth: int) -> None:
+        rows.append(("  " * depth + node.name, node))
+        for child in node.children.values():
+            visit(child, depth + 1)
+
+    visit(root, 0)
+    width = max(len(label) for label, _ in rows)
+    total = root.seconds or 1.0
+    lines = [f"{'span':<{width}}  {'calls':>5} {'time':>9} {'share':>6}"]
+    for label, node in rows:
+        lines.append(
+            f"{label:<{width}}  {node.calls:>5} {node.seconds:8.3f}s "
+            f"{100 * node.seconds / total:5.1f}%"
+        )
+    return "\n".join(lines)
+
+
+def instrument(
+    timings: bool, profile: Optional[str] = None, trace_memory: Optional[str] = None
+) -> Callable[[], None]:
+    """Start the requested instrumentation of a command
+
+    :param timings: record spans, and print the timing tree to stderr when done
+    :param profile: write a cProfile dump there when done, readable with pstats
+    :param trace_memory: write a tracemalloc snapshot there when done
+    :return: what to call once the command is done
+    """
+    profiler = None
+    if profile is not None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+    if trace_memory is not None:
+        import tracemalloc
+
+        tracemalloc.start()
+    if timings:
+        enable()
+    else:
+        disable()
+    if profiler is not None:
+        profiler.enable()
+
+    def done() -> None:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile)
+        if trace_memory is not None:
+            import tracemalloc
+
+            tracemalloc.take_snapshot().dump(trace_memory)
+            tracemalloc.stop()
+        root = disable()
+        if root is not None:
+            sys.stderr.write(report(root) + "\n")
+
+    return done
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import tempfile
+
+from typing import Dict
+from typing import Optional
+
+
+class VersionCache(object):
+    """
+    Persistent component version cache.
+
+    Versions are stored in a single json file, one entry per deployer fingerprint.
+    A fingerprint changes whenever the deployer is moved or its version script is
+    replaced, so stale entries are simply never looked up again.
+    """
+
+    CACHE_FILE_NAME: str = "component-versions.json"
+
+    def __init__(self, cache_dir: str) -> None:
+        self.path: str = os.path.join(cache_dir, VersionCache.CACHE_FILE_NAME)
+
+    def __load(self) -> Dict[str, Dict[str, str]]:
+        try:
+            with open(self.path) as infile:
+                content = json.load(infile)
+        except (OSError, ValueError):
+            return {}
+        return content if isinstance(content, dict) else {}
+
+    def get(self, fingerprint: str) -> Dict[str, str]:
+        """Return the cached component versions for this deployer fingerprint
+
+        :param fingerprint: the deployer fingerprint
+        :return: a possibly empty component -> version map
+        """
+        return dict(self.__load().get(fingerprint, {}))
+
+    def update(self, fingerprint: str, versions: Dict[str, str]) -> None:
+        """Merge versions into the cache entry of this deployer fingerprint
+
+        The cache file is replaced atomically so that concurrent punchbox processes
+        never read a partially written file. A cache that cannot be written is
+        silently ignored, it only costs a new probe next time.
+
+        :param fingerprint: the deployer fingerprint
+        :param versions: component -> version map to record
+        :return: None
+        """
+        content: Dict[str, Dict[str, str]] = self.__load()
+        content.setdefault(fingerprint, {}).update(versions)
+        cache_dir: str = os.path.dirname(self.path)
+        tmp_path: Optional[str] = None
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as outfile:
+                json.dump(content, outfile, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
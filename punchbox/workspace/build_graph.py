@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import dataclasses
+import time
+
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+from punchbox.utils import timings
+
+
+class StageExit(RuntimeError):
+    """A build stage that called sys.exit, rather than raising an exception"""
+
+
+@dataclasses.dataclass()
+class Stage(object):
+    """A build step, only started once all the stages it depends on succeeded"""
+
+    name: str
+    action: Callable[[], None]
+    dependencies: Tuple[str, ...] = ()
+
+
+def topological_order(stages: List[Stage]) -> List[Stage]:
+    """Return the stages sorted so that each one comes after its dependencies
+
+    :param stages: the build graph
+    :return: the sorted stages
+    """
+    by_name: Dict[str, Stage] = {stage.name: stage for stage in stages}
+    ordered: List[Stage] = []
+    visiting: Set[str] = set()
+    visited: Set[str] = set()
+
+    def visit(stage: Stage) -> None:
+        if stage.name in visited:
+            return
+        if stage.name in visiting:
+            raise ValueError(f"build stage {stage.name} depends on itself")
+        visiting.add(stage.name)
+        for dependency in stage.dependencies:
+            if dependency not in by_name:
+                raise ValueError(f"unknown build stage {dependency}")
+            visit(by_name[dependency])
+        visiting.discard(stage.name)
+        visited.add(stage.name)
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return ordered
+
+
+def _run_stage(stage: Stage, parent: Optional[timings.Span]) -> Tuple[str, float]:
+    start = time.perf_counter()
+    with timings.span(f"stage {stage.name}", parent):
+        try:
+            stage.action()
+        except SystemExit as exit_request:
+            # it would otherwise end the worker thread, not the build
+            raise StageExit(
+                f"build stage {stage.name} exited with {exit_request.code}"
+            ) from exit_request
+    return stage.name, time.perf_counter() - start
+
+
+def run_stages(stages: List[Stage], jobs: int = 1) -> Dict[str, float]:
+    """Run a build graph, independent stages overlapping on a thread pool
+
+    A stage starts as soon as all its dependencies are done. When a stage fails, the
+    stages depending on it are not started, the running ones are waited for, then the
+    first error is raised. A stage calling sys.exit fails with a StageExit error.
+
+    :param stages: the build graph
+    :param jobs: the maximum number of stages running at the same time
+    :return: stage name -> duration in seconds, for every stage that completed
+    """
+    pending: List[Stage] = topological_order(stages)
+    done: Set[str] = set()
+    durations: Dict[str, float] = {}
+    errors: List[BaseException] = []
+
+    # the stages run on worker threads, their spans are nested in the caller one
+    parent = timings.current()
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        running: Set[Future] = set()
+        while pending or running:
+            if not errors:
+                ready = [s for s in pending if set(s.dependencies) <= done]
+                for stage in ready:
+                    pending.remove(stage)
+                    running.add(executor.submit(_run_stage, stage, parent))
+            if not running:
+                break
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                try:
+                    name, seconds = future.result()
+                except Exception as error:
+                    errors.append(error)
+                    continue
+                done.add(name)
+                durations[name] = seconds
+    if errors:
+        raise errors[0]
+    return durations
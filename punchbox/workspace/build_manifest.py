@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import threading
+
+from typing import ClassVar
+from typing import Dict
+from typing import List
+from typing import Optional
+
+
+class BuildStage(object):
+    """
+    The workspace build stages, each one generates a single file
+    """
+
+    VAGRANTFILE: ClassVar[str] = "vagrantfile"
+    BLUEPRINT: ClassVar[str] = "blueprint"
+    DEPLOYMENT_SETTINGS: ClassVar[str] = "deployment-settings"
+    LEGACY_SETTINGS: ClassVar[str] = "legacy-settings"
+
+
+def file_digest(path: str) -> Optional[str]:
+    """Return the sha256 of a file content, None if the file does not exist
+
+    :param path: the file path
+    :return: the hex digest
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as infile:
+            for chunk in iter(lambda: infile.read(1 << 20), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def text_digest(text: str) -> str:
+    """Return the sha256 of a string
+
+    :param text: the string
+    :return: the hex digest
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class BuildManifest(object):
+    """
+    Records, for each workspace build stage, the digests of its inputs and outputs.
+
+    A stage is up to date when its inputs did not change since it was last run and
+    its outputs are still the ones it produced. The manifest is a json file, written
+    next to the generated configuration files. Stages running concurrently can share it.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self.__lock: threading.RLock = threading.RLock()
+        self.__stages: Dict[str, Dict[str, Dict[str, Optional[str]]]] = {}
+        try:
+            with open(path) as infile:
+                content = json.load(infile)
+            if isinstance(content, dict):
+                self.__stages = content
+        except (OSError, ValueError):
+            pass
+
+    def is_up_to_date(
+        self, stage: str, inputs: Dict[str, Optional[str]], outputs: List[str]
+    ) -> bool:
+        """Tell if a stage can be skipped
+
+        :param stage: the stage name
+        :param inputs: input name -> digest of what the stage would be built from
+        :param outputs: the paths of the files the stage generates
+        :return: True if the stage inputs and outputs did not change since its last run
+        """
+        with self.__lock:
+            recorded = self.__stages.get(stage)
+        if recorded is None or recorded.get("inputs") != inputs:
+            return False
+        recorded_outputs = recorded.get("outputs", {})
+        for path in outputs:
+            digest = file_digest(path)
+            if digest is None or recorded_outputs.get(path) != digest:
+                return False
+        return True
+
+    def record(
+        self, stage: str, inputs: Dict[str, Optional[str]], outputs: List[str]
+    ) -> None:
+        """Record that a stage was just built from these inputs
+
+        :param stage: the stage name
+        :param inputs: input name -> digest the stage was built from
+        :param outputs: the paths of the files the stage generated
+        :return: None
+        """
+        outputs_digest = {path: file_digest(path) for path in outputs}
+        with self.__lock:
+            self.__stages[stage] = {"inputs": dict(inputs), "outputs": outputs_digest}
+
+    def save(self) -> None:
+        """Write the manifest
+
+        :return: None
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self.__lock, open(self.path, "w+") as outfile:
+            json.dump(self.__stages, outfile, indent=2, sort_keys=True)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import getpass
+import os
+import threading
+
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from punchbox.common_lib.data_classes import punchbox_configuration
+from punchbox.common_lib.data_classes import workspace_hierarchy
+from punchbox.common_lib.runtime_meta.environment import Environment
+from punchbox.generate import blueprint_format
+from punchbox.generate import generate_helper
+from punchbox.punch_entry_point.cli_configuration import PunchLogger
+from punchbox.utils import ansible
+from punchbox.utils import serialization
+from punchbox.utils import timings
+from punchbox.utils.file import File
+from punchbox.workspace.build_graph import Stage
+from punchbox.workspace.build_graph import run_stages
+from punchbox.workspace.build_manifest import BuildManifest
+from punchbox.workspace.build_manifest import BuildStage
+from punchbox.workspace.build_manifest import file_digest
+from punchbox.workspace.build_manifest import text_digest
+from punchbox.workspace.workspace_helper import BuildStep
+from punchbox.workspace.workspace_helper import WorkspaceHelper
+
+
+def _write_text(path: str, content: str) -> None:
+    with timings.span("file write"), File.atomic_output(path) as output:
+        output.write(content.encode(encoding="UTF-8"))
+
+
+class BuildPipeline(object):
+    """
+    Generates the workspace files, handing parsed documents from one stage to the next.
+
+    The user settings and topology are parsed once. The blueprint and the deployment
+    settings stay in memory once built, the following stages use them as they are.
+    A file written by a previous build is only read when the stage producing it was
+    skipped. Stages running concurrently can share a pipeline.
+    """
+
+    def __init__(
+        self,
+        conf: punchbox_configuration.Punchbox,
+        template_cache: Optional[str] = None,
+    ) -> None:
+        self.conf: punchbox_configuration.Punchbox = conf
+        self.template_cache: Optional[str] = template_cache
+        self.__lock: threading.RLock = threading.RLock()
+        self.__settings: Optional[Dict[str, Any]] = None
+        self.__topology: Optional[Dict[str, Any]] = None
+        self.__blueprint: Optional[Dict[str, Any]] = None
+        self.__deployment_settings: Optional[str] = None
+
+    @staticmethod
+    def __load(path: str) -> Any:
+        with open(path, "rb") as infile:
+            return serialization.load_yaml(infile)
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        """The user settings"""
+        with self.__lock:
+            if self.__settings is None:
+                self.__settings = self.__load(self.conf.punch.user_settings)
+            return self.__settings
+
+    @property
+    def topology(self) -> Dict[str, Any]:
+        """The user topology"""
+        with self.__lock:
+            if self.__topology is None:
+                self.__topology = self.__load(self.conf.punch.user_topology)
+            return self.__topology
+
+    @property
+    def blueprint_dict(self) -> Dict[str, Any]:
+        """The platform blueprint, generated by this build or else read from disk"""
+        with self.__lock:
+            if self.__blueprint is None:
+                self.__blueprint = blueprint_format.expand(
+                    self.__load(self.conf.punch.blueprint)
+                )
+            return self.__blueprint
+
+    @property
+    def deployment_settings_text(self) -> str:
+        """The deployment settings, generated by this build or else read from disk"""
+        with self.__lock:
+            if self.__deployment_settings is None:
+                path = self.conf.punch.deployment_settings
+                with open(path, encoding="UTF-8") as infile:
+                    self.__deployment_settings = infile.read()
+            return self.__deployment_settings
+
+    def vagrantfile(self) -> None:
+        """Generate the Vagrantfile"""
+        PunchLogger().info_green(
+            f"  Punchbox generate vagrantfile \n"
+            f"    --settings {self.conf.punch.user_settings}  \n"
+            f"    --topology {self.conf.punch.user_topology} \n"
+            f"    --template {self.conf.vagrant.template} \n"
+            f"    --output {self.conf.vagrant.vagrantfile} \n"
+        )
+        # a failed render leaves the previous Vagrantfile, never a truncated one
+        with File.atomic_output(self.conf.vagrant.vagrantfile) as output:
+            generate_helper.stream_template(
+                self.conf.vagrant.template,
+                generate_helper.vagrantfile_context(
+                    self.settings["vagrant"], self.topology
+                ),
+                output,
+                self.template_cache,
+            )
+
+    def blueprint(self) -> None:
+        """Generate the platform blueprint"""
+        PunchLogger().info_green(
+            f"  punchbox generate blueprint \n"
+            f"    --deployer {self.conf.env.deployer} \n"
+            f"    --topology {self.conf.punch.user_topology} \n"
+            f"    --settings {self.conf.punch.user_settings} \n"
+            f"    --output {self.conf.punch.blueprint} \n"
+        )
+        blueprint = generate_helper.build_blueprint(
+            self.settings, self.topology, self.conf.env.deployer
+        )
+        with File.atomic_output(self.conf.punch.blueprint) as output:
+            serialization.dump_yaml(blueprint, output, encoding="UTF-8")
+        with self.__lock:
+            self.__blueprint = blueprint
+            self.__deployment_settings = None
+
+    def deployment_settings(self) -> None:
+        """Generate the deployment settings from the blueprint"""
+        PunchLogger().info_green(
+            f"  punchbox generate deployment-settings \n"
+            f"    --blueprint {self.conf.punch.blueprint} \n"
+            f"    --template {self.conf.punch.deployment_settings_template} \n"
+            f"    --output {self.conf.punch.deployment_settings} \n"
+        )
+        rendered = generate_helper.render_template(
+            self.conf.punch.deployment_settings_template,
+            self.blueprint_dict,
+            self.template_cache,
+        )
+        _write_text(self.conf.punch.deployment_settings, rendered)
+        with self.__lock:
+            self.__deployment_settings = rendered
+
+    def legacy_settings(self) -> None:
+        """Generate the json deployment settings, kept for backward compatibility"""
+        PunchLogger().info_green(
+            f"  backward compatibility generation : \n"
+            f"             convert \n"
+            f"{self.conf.punch.deployment_settings} \n"
+            f"             into \n"
+            f"{self.conf.punch.punchplatform_deployment_settings} \n"
+        )
+        _write_text(
+            self.conf.punch.punchplatform_deployment_settings,
+            generate_helper.legacy_settings(self.deployment_settings_text),
+        )
+
+
+def _generate_all(message: str) -> bool:
+    return True
+
+
+def _template_inputs(template: str) -> Dict[str, Optional[str]]:
+    """The digests of a template, of the templates it pulls in, and of the hosts file
+    its hostnames are resolved from, if any"""
+    included = ansible.referenced_templates(template)
+    hosts_file = Environment.punchbox_hosts_file()
+    hosts_digest: Optional[str] = None
+    if hosts_file is not None:
+        hosts_digest = text_digest(
+            f"{os.path.abspath(hosts_file)} {file_digest(hosts_file)}"
+        )
+    return {
+        "template": file_digest(template),
+        "included_templates": text_digest(
+            "\n".join(f"{path} {file_digest(path)}" for path in included)
+        ),
+        "hosts_file": hosts_digest,
+    }
+
+
+def build(
+    workspace: str,
+    force: bool = False,
+    jobs: int = 4,
+    confirmed: Optional[Callable[[str], bool]] = None,
+    template_cache: Optional[str] = None,
+) -> Dict[str, float]:
+    """Generate the files of a workspace, the ones whose inputs changed
+
+    :param workspace: the workspace folder
+    :param force: generate every file, even the ones whose inputs did not change
+    :param jobs: the maximum number of files generated at the same time
+    :param confirmed: asks, before anything is generated, whether to generate a file.
+        Every file is generated if None
+    :param template_cache: where to keep the compiled templates, the workspace
+        jinja cache folder if None
+    :return: stage name -> duration in seconds, for every stage that ran
+    """
+    conf: punchbox_configuration.Punchbox = File.read_punchbox_settings_file(
+        f"{workspace}/conf/punchbox/punchbox.yml"
+    )
+    work_struct = workspace_hierarchy.WorkspaceHierarchy(workspace)
+    manifest: BuildManifest = BuildManifest(work_struct.target_build_manifest_file)
+    pipeline: BuildPipeline = BuildPipeline(
+        conf, template_cache or work_struct.jinja_cache_dir
+    )
+
+    def legacy_settings() -> None:
+        if os.path.exists(conf.punch.deployment_settings):
+            pipeline.legacy_settings()
+
+    build_steps: List[BuildStep] = [
+        BuildStep(
+            name=BuildStage.BLUEPRINT,
+            output=conf.punch.blueprint,
+            inputs=lambda: {
+                "settings": file_digest(conf.punch.user_settings),
+                "topology": file_digest(conf.punch.user_topology),
+                "deployer": text_digest(
+                    str(ansible.deployer_fingerprint(conf.env.deployer))
+                ),
+                "user": getpass.getuser(),
+                "version_backend": Environment.punchbox_version_backend(),
+            },
+            action=pipeline.blueprint,
+            confirmation=f"generate platform blueprint {conf.punch.blueprint} ?",
+        ),
+        BuildStep(
+            name=BuildStage.DEPLOYMENT_SETTINGS,
+            output=conf.punch.deployment_settings,
+            inputs=lambda: {
+                "blueprint": file_digest(conf.punch.blueprint),
+                **_template_inputs(conf.punch.deployment_settings_template),
+            },
+            action=pipeline.deployment_settings,
+            dependencies=(BuildStage.BLUEPRINT,),
+            confirmation=f"generate deployment settings {conf.punch.deployment_settings} ?",
+        ),
+        BuildStep(
+            name=BuildStage.LEGACY_SETTINGS,
+            output=conf.punch.punchplatform_deployment_settings,
+            inputs=lambda: {
+                "deployment_settings": file_digest(conf.punch.deployment_settings)
+            },
+            action=legacy_settings,
+            dependencies=(BuildStage.DEPLOYMENT_SETTINGS,),
+        ),
+    ]
+    if "vagrant" in pipeline.settings:
+        build_steps.insert(
+            0,
+            BuildStep(
+                name=BuildStage.VAGRANTFILE,
+                output=conf.vagrant.vagrantfile,
+                inputs=lambda: {
+                    "settings": file_digest(conf.punch.user_settings),
+                    "topology": file_digest(conf.punch.user_topology),
+                    **_template_inputs(conf.vagrant.template),
+                },
+                action=pipeline.vagrantfile,
+                confirmation=f"generate vagrantfile {conf.vagrant.vagrantfile} ?",
+            ),
+        )
+
+    stages: List[Stage] = WorkspaceHelper.plan_build(
+        build_steps, manifest, force, confirmed or _generate_all
+    )
+    return run_stages(stages, jobs)
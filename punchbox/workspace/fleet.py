@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import dataclasses
+import glob
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+
+from punchbox.common_lib.runtime_meta.environment import Environment
+from punchbox.workspace import build_pipeline
+
+
+@dataclasses.dataclass()
+class WorkspaceBuild(object):
+    """The outcome of one workspace build"""
+
+    workspace: str
+    seconds: float
+    # the error message if the build failed
+    error: Optional[str] = None
+    # stage name -> duration in seconds
+    stages: Dict[str, float] = dataclasses.field(default_factory=dict)
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+def shared_template_cache() -> str:
+    """The compiled template cache shared by every workspace of a fleet build"""
+    return os.path.join(Environment.punchbox_cache_dir(), "jinja")
+
+
+def expand_workspaces(patterns: Iterable[str]) -> List[str]:
+    """Return the workspace folders, in order and once each
+
+    :param patterns: workspace folders, or glob patterns matching several of them
+    :return: the workspace absolute paths
+    """
+    workspaces: List[str] = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for match in matches:
+            workspace = os.path.abspath(match)
+            if workspace not in workspaces:
+                workspaces.append(workspace)
+    return workspaces
+
+
+def build_workspace(
+    workspace: str, force: bool, template_cache: Optional[str]
+) -> WorkspaceBuild:
+    """Build a workspace, in a worker process. Failures are reported, not raised"""
+    start = time.perf_counter()
+    try:
+        stages = build_pipeline.build(
+            workspace, force=force, jobs=1, template_cache=template_cache
+        )
+    except (Exception, SystemExit) as error:
+        return WorkspaceBuild(
+            workspace=workspace,
+            seconds=time.perf_counter() - start,
+            error=" ".join(f"{type(error).__name__}: {error}".split()),
+        )
+    return WorkspaceBuild(
+        workspace=workspace, seconds=time.perf_counter() - start, stages=stages
+    )
+
+
+def build_all(
+    workspaces: List[str],
+    force: bool = False,
+    processes: Optional[int] = None,
+    template_cache: Optional[str] = None,
+) -> List[WorkspaceBuild]:
+    """Build many workspaces, in parallel on a process pool
+
+    The workers share the deployer component version cache, in the punchbox cache
+    folder, and one compiled template cache: identical templates are compiled once
+    for the whole fleet. Each workspace generates its files one after the other, the
+    parallelism is across workspaces.
+
+    :param workspaces: the workspace folders
+    :param force: generate every file, even the ones whose inputs did not change
+    :param processes: the number of worker processes, the number of cpus if None
+    :param template_cache: the compiled template cache, shared_template_cache if None
+    :return: the outcome of each workspace build, in workspaces order
+    """
+    template_cache = template_cache or shared_template_cache()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(build_workspace, workspace, force, template_cache)
+            for workspace in workspaces
+        ]
+        return [future.result() for future in futures]
+
+
+def summary(builds: List[WorkspaceBuild]) -> str:
+    """Format a fleet build outcome as a table
+
+    :param builds: the build_all result
+    :return: one line per workspace, then the totals
+    """
+    width = max([len("workspace")] + [len(build.workspace) for build in builds])
+    lines = [f"    {'workspace':<{width}}  {'status':<7} {'time':>9}"]
+    for build in builds:
+        status = "ok" if build.succeeded else "failed"
+        lines.append(
+            f"    {build.workspace:<{width}}  {status:<7} {build.seconds:8.3f}s"
+        )
+        if not build.succeeded:
+            lines.append(f"      {build.error}")
+    failures = len([build for build in builds if not build.succeeded])
+    lines.append(f"    {len(builds) - failures} succeeded, {failures} failed")
+    return "\n".join(lines)
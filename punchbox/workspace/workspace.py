@@ -1,14 +1,18 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import json
 import os
+import sys
 
 from pathlib import Path
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
 from typing import Union
 
 import click
-import yaml
 
 from typing_extensions import Final
 
@@ -21,12 +25,11 @@ from punchbox.common_lib.data_classes.workspace_configuration import (
 )
 from punchbox.common_lib.data_classes.workspace_hierarchy import WorkspaceHierarchy
 from punchbox.common_lib.runtime_meta import environment
-from punchbox.generate.generate import generate_blueprint
-from punchbox.generate.generate import generate_deployment
-from punchbox.generate.generate import generate_vagrantfile
 from punchbox.punch_entry_point import cli_configuration
 from punchbox.punch_entry_point.cli_configuration import PunchLogger
 from punchbox.utils.file import File
+from punchbox.workspace import build_pipeline
+from punchbox.workspace import fleet
 from punchbox.workspace import workspace_helper
 
 
@@ -145,8 +148,24 @@ def create_workspace(
     help="the punchbox workspace",
 )
 @click.option(*CommandOption.YES_OPT, is_flag=True, default=True, help="confirmed mode")
-@click.pass_context
-def build_workspace(ctx, workspace: Union[str, bytes, os.PathLike], yes: bool) -> None:
+@click.option(
+    CommandOption.FORCE_OPT,
+    is_flag=True,
+    default=False,
+    help="generate every file, even the ones whose inputs did not change",
+)
+@click.option(
+    *CommandOption.JOBS_OPT,
+    default=4,
+    type=click.IntRange(min=1),
+    help="the maximum number of files generated at the same time",
+)
+def build_workspace(
+    workspace: Union[str, bytes, os.PathLike],
+    yes: bool,
+    force: bool = False,
+    jobs: int = 4,
+) -> None:
     """
     Build your workspace.
 
@@ -154,86 +173,58 @@ def build_workspace(ctx, workspace: Union[str, bytes, os.PathLike], yes: bool) -
     various templates. This command make your workspace ready to move
     on to deploying a punch.
 
+    Each generated file is only generated again if one of its inputs (settings, topology,
+    template, deployer versions...) changed since the last build. Use --force to
+    generate them all. Files that do not depend on each other are generated
+    concurrently.
+
     By default this command is interactive and prompt before generating a file.
     If you want it to be silent use the confirmed mode.
     """
-    conf: punchbox_configuration.Punchbox = File.read_punchbox_settings_file(
-        f"{str(workspace)}/conf/punchbox/punchbox.yml"
+    # all the questions are asked first, the selected files are then generated
+    # concurrently
+    confirmed: Callable[[str], bool] = lambda message: not yes or click.confirm(message)
+    timings: Dict[str, float] = build_pipeline.build(
+        str(workspace), force=force, jobs=jobs, confirmed=confirmed
+    )
+    report: str = "".join(
+        f"    {name:<20} {seconds:8.3f}s \n" for name, seconds in timings.items()
     )
+    PunchLogger().info_green(f"  build timings: \n{report}")
 
-    with open(conf.punch.user_settings, "rb") as user_settings:
-        user_settings_dict = yaml.load(user_settings.read(), Loader=yaml.SafeLoader)
-        if "vagrant" in user_settings_dict:
-            if not yes or click.confirm(
-                f"generate vagrantfile {conf.vagrant.vagrantfile} ?"
-            ):
-                with open(conf.punch.user_topology, "rb") as topology, open(
-                    conf.punch.user_settings, "rb"
-                ) as settings, open(conf.vagrant.vagrantfile, "wb+") as vagrantfile:
-                    PunchLogger().info_green(
-                        f"  Punchbox generate vagrantfile \n"
-                        f"    --settings {conf.punch.user_settings}  \n"
-                        f"    --topology {conf.punch.user_topology} \n"
-                        f"    --template {conf.vagrant.template} \n"
-                        f"    --output {conf.vagrant.vagrantfile} \n"
-                    )
-                    ctx.invoke(
-                        generate_vagrantfile,
-                        settings=settings,
-                        topology=topology,
-                        template=conf.vagrant.template,
-                        output=vagrantfile,
-                    )
-
-    if not yes or click.confirm(
-        f"generate platform blueprint {conf.punch.blueprint} ?"
-    ):
-        with open(conf.punch.user_topology, "rb") as topology, open(
-            conf.punch.blueprint, "wb+"
-        ) as output, open(conf.punch.user_settings, "rb") as settings:
-            PunchLogger().info_green(
-                f"  punchbox generate blueprint \n"
-                f"    --deployer {conf.env.deployer} \n"
-                f"    --topology {conf.punch.user_topology} \n"
-                f"    --settings {conf.punch.user_settings} \n"
-                f"    --output {conf.punch.blueprint} \n"
-            )
-            ctx.invoke(
-                generate_blueprint,
-                deployer=conf.env.deployer,
-                topology=topology,
-                settings=settings,
-                output=output,
-            )
-
-    if not yes or click.confirm(
-        f"generate deployment settings {conf.punch.deployment_settings} ?"
-    ):
-        with open(conf.punch.blueprint, "rb") as blueprint, open(
-            conf.punch.deployment_settings, "wb+"
-        ) as output:
-            PunchLogger().info_green(
-                f"  punchbox generate deployment-settings \n"
-                f"    --blueprint {conf.punch.blueprint} \n"
-                f"    --template {conf.punch.deployment_settings_template} \n"
-                f"    --output {conf.punch.deployment_settings} \n"
-            )
-            ctx.invoke(
-                generate_deployment,
-                blueprint=blueprint,
-                template=conf.punch.deployment_settings_template,
-                output=output,
-            )
-
-        with open(conf.punch.deployment_settings, "rb") as yaml_in, open(
-            conf.punch.punchplatform_deployment_settings, "w+"
-        ) as json_out:
-            PunchLogger().info_green(
-                f"  backward compatibility generation : \n"
-                f"             convert \n"
-                f"{conf.punch.deployment_settings} \n"
-                f"             into \n"
-                f"{conf.punch.punchplatform_deployment_settings} \n"
-            )
-            yaml_object = yaml.load(yaml_in, Loader=yaml.SafeLoader)
-            json.dump(yaml_object, json_out)
+
+@workspace.command(name=Commands.BUILD_ALL_CMD)
+@click.argument("workspaces", nargs=-1, required=True)
+@click.option(
+    CommandOption.FORCE_OPT,
+    is_flag=True,
+    default=False,
+    help="generate every file, even the ones whose inputs did not change",
+)
+@click.option(
+    *CommandOption.JOBS_OPT,
+    default=None,
+    type=click.IntRange(min=1),
+    help="the number of workspaces built at the same time. The default is the number "
+    "of cpus",
+)
+def build_all_workspaces(
+    workspaces: Tuple[str, ...], force: bool = False, jobs: Optional[int] = None
+) -> None:
+    """
+    Build many workspaces.
+
+    Build each of the given workspaces, as 'punchbox workspace build' does but
+    without asking any question. Glob patterns are expanded, quote them to
+    build, for instance, all the workspaces of a folder: "platforms/*".
+
+    The workspaces are built in parallel, on a pool of processes sharing the
+    component version cache and the compiled templates. A summary of each
+    workspace build is printed once they are all done.
+    """
+    builds: List[fleet.WorkspaceBuild] = fleet.build_all(
+        fleet.expand_workspaces(workspaces), force=force, processes=jobs
+    )
+    click.echo(fleet.summary(builds))
+    if not all(build.succeeded for build in builds):
+        sys.exit(1)
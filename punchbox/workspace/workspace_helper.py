@@ -1,13 +1,35 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import dataclasses
 import os
 
+from typing import Callable
+from typing import Dict
 from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
 
 from punchbox.common_lib.data_classes import source_hierarchy
 from punchbox.common_lib.data_classes import workspace_hierarchy
+from punchbox.punch_entry_point.cli_configuration import PunchLogger
 from punchbox.utils.file import File
+from punchbox.workspace.build_graph import Stage
+from punchbox.workspace.build_manifest import BuildManifest
+
+
+@dataclasses.dataclass()
+class BuildStep(object):
+    """A workspace file generation, only performed again when its inputs change"""
+
+    name: str
+    output: str
+    inputs: Callable[[], Dict[str, Optional[str]]]
+    action: Callable[[], None]
+    dependencies: Tuple[str, ...] = ()
+    # the question asked before generating the file, if any
+    confirmation: Optional[str] = None
 
 
 class WorkspaceHelper(object):
@@ -59,3 +81,66 @@ class WorkspaceHelper(object):
             full_file_name: str = os.path.join(template_dir, file_name)
             if os.path.isfile(full_file_name):
                 File.copy_to_workspace(full_file_name, work_struct.template_dir)
+
+    @staticmethod
+    def plan_build(
+        steps: List[BuildStep],
+        manifest: BuildManifest,
+        force: bool,
+        confirmed: Callable[[str], bool],
+    ) -> List[Stage]:
+        """Turn build steps into a build graph, asking first which files to generate
+
+        A step is stale when its inputs changed, or when a step it depends on is
+        stale. The confirmation of every stale step is asked up front, before anything
+        runs. When it runs, a step checks its inputs again, once its dependencies are
+        generated, and is skipped if they did not change after all.
+
+        :param steps: the build steps, each one after the steps it depends on
+        :param manifest: the workspace build manifest
+        :param force: consider every step stale
+        :param confirmed: asks a confirmation question, return the answer
+        :return: the build graph stages
+        """
+        stale: Set[str] = set()
+        stages: List[Stage] = []
+        for step in steps:
+            up_to_date = manifest.is_up_to_date(step.name, step.inputs(), [step.output])
+            if force or not up_to_date or stale.intersection(step.dependencies):
+                stale.add(step.name)
+            selected = step.name in stale and (
+                step.confirmation is None or confirmed(step.confirmation)
+            )
+            stages.append(
+                Stage(
+                    name=step.name,
+                    action=WorkspaceHelper.incremental_action(
+                        step, manifest, force, step.name in stale, selected
+                    ),
+                    dependencies=step.dependencies,
+                )
+            )
+        return stages
+
+    @staticmethod
+    def incremental_action(
+        step: BuildStep,
+        manifest: BuildManifest,
+        force: bool,
+        stale: bool,
+        selected: bool,
+    ) -> Callable[[], None]:
+        def action() -> None:
+            if not stale:
+                PunchLogger().info_green(f"  {step.output} is up to date")
+            if not selected:
+                return
+            inputs = step.inputs()
+            if not force and manifest.is_up_to_date(step.name, inputs, [step.output]):
+                PunchLogger().info_green(f"  {step.output} is up to date")
+                return
+            step.action()
+            manifest.record(step.name, inputs, [step.output])
+            manifest.save()
+
+        return action
@@ -38,3 +38,21 @@ class TestEnvironment(object):
         assert (
             environment.Environment.punchbox_install_dir() == self.FAKE_ENV[install_dir]
         )
+
+    @pytest.mark.parametrize(
+        "value,enabled", [("", False), ("0", False), ("false", False), ("1", True)]
+    )
+    def test_timings(self, monkeypatch: MonkeyPatch, value: str, enabled: bool) -> None:
+        monkeypatch.setenv(
+            environment.Environment.PUNCHPLATFORM_PUNCHBOX_TIMINGS, value
+        )
+        assert environment.Environment.punchbox_timings() is enabled
+
+    @pytest.mark.parametrize("value,enabled", [("", False), ("0", False), ("1", True)])
+    def test_hostname_prefetch(
+        self, monkeypatch: MonkeyPatch, value: str, enabled: bool
+    ) -> None:
+        monkeypatch.setenv(
+            environment.Environment.PUNCHPLATFORM_PUNCHBOX_HOSTNAME_PREFETCH, value
+        )
+        assert environment.Environment.punchbox_hostname_prefetch() is enabled
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from typing import Any
+from typing import Dict
+
+from punchbox.generate import blueprint_format
+from punchbox.utils import serialization
+
+
+class TestBlueprintFormat(object):
+    @staticmethod
+    def blueprint() -> Dict[str, Any]:
+        cluster_settings = {"cluster_port": 9092, "zk_cluster": "common"}
+        return {
+            "platform": {"id": "punchbox-platform-id"},
+            "services": {
+                "kafka": {
+                    "settings": {"version": "2.8.1"},
+                    "clusters": {
+                        "common": {
+                            "settings": dict(cluster_settings),
+                            "servers": {
+                                "server1": {"settings": {**cluster_settings, "cpu": 1}},
+                                "server2": {
+                                    "settings": {**cluster_settings, "cluster_port": 1}
+                                },
+                            },
+                        }
+                    },
+                }
+            },
+            "users": {"operator": {}},
+        }
+
+    def test_servers_only_keep_overrides(self) -> None:
+        normalised = blueprint_format.normalise(TestBlueprintFormat.blueprint())
+        servers = normalised["services"]["kafka"]["clusters"]["common"]["servers"]
+        assert servers == {
+            "server1": {"settings": {"cpu": 1}},
+            "server2": {"settings": {"cluster_port": 1}},
+        }
+        assert normalised[blueprint_format.FORMAT_KEY] == blueprint_format.NORMALISED
+
+    def test_expand_restores_the_blueprint(self) -> None:
+        blueprint = TestBlueprintFormat.blueprint()
+        assert blueprint_format.expand(blueprint) is blueprint
+        assert blueprint_format.expand(blueprint_format.normalise(blueprint)) == (
+            TestBlueprintFormat.blueprint()
+        )
+
+    def test_expand_sorts_keys_as_the_dumped_file(self) -> None:
+        normalised = blueprint_format.normalise(TestBlueprintFormat.blueprint())
+        loaded = serialization.load_yaml(serialization.dump_yaml(normalised))
+        for blueprint in (normalised, loaded):
+            kafka = blueprint_format.expand(blueprint)["services"]["kafka"]
+            server = kafka["clusters"]["common"]["servers"]["server1"]
+            assert list(server["settings"]) == ["cluster_port", "cpu", "zk_cluster"]
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import json
+
+from typing import Any
+from typing import Dict
+from typing import List
+
+import click
+import pytest
+
+from _pytest.monkeypatch import MonkeyPatch
+
+from punchbox.generate import generate_helper
+from punchbox.utils import ansible
+from punchbox.utils import serialization
+
+
+class TestComputeBlueprintVersions(object):
+    @staticmethod
+    def blueprint() -> Dict[str, Any]:
+        return {
+            "services": {
+                "zookeeper": {"settings": {}, "clusters": {}},
+                "kafka": {"settings": {"version": "2.8.1"}, "clusters": {}},
+                "shiva": {"settings": {}, "clusters": {}},
+            }
+        }
+
+    def test_services_missing_version(self) -> None:
+        assert generate_helper.services_missing_version(
+            TestComputeBlueprintVersions.blueprint()
+        ) == {"zookeeper", "shiva"}
+
+    def test_only_missing_versions_are_requested(
+        self, monkeypatch: MonkeyPatch
+    ) -> None:
+        requested: List[str] = []
+
+        def fake_versions(deployer_path: str, component_names: Any) -> Dict[str, str]:
+            requested.extend(sorted(component_names))
+            return {"zookeeper": "3.5.7"}
+
+        monkeypatch.setattr(ansible, "get_components_version", fake_versions)
+        blueprint = TestComputeBlueprintVersions.blueprint()
+        generate_helper.compute_blueprint_versions(blueprint, "/deployer")
+        assert requested == ["shiva", "zookeeper"]
+        assert blueprint["services"]["zookeeper"]["settings"]["version"] == "3.5.7"
+        assert blueprint["services"]["kafka"]["settings"]["version"] == "2.8.1"
+        assert "version" not in blueprint["services"]["shiva"]["settings"]
+
+    def test_known_versions_are_not_probed(self, monkeypatch: MonkeyPatch) -> None:
+        def no_probe(deployer_path: str, component_names: Any) -> Dict[str, str]:
+            raise AssertionError("the deployer must not be probed")
+
+        monkeypatch.setattr(ansible, "get_components_version", no_probe)
+        blueprint = TestComputeBlueprintVersions.blueprint()
+        generate_helper.compute_blueprint_versions(
+            blueprint, None, {"zookeeper": "3.5.7", "kafka": "3.0.0"}
+        )
+        assert blueprint["services"]["zookeeper"]["settings"]["version"] == "3.5.7"
+        assert blueprint["services"]["kafka"]["settings"]["version"] == "2.8.1"
+        assert "version" not in blueprint["services"]["shiva"]["settings"]
+
+
+class TestCompileTopologyIndex(object):
+    def test_servers_indexed_by_service_and_cluster(self) -> None:
+        topology_dict: Dict[str, Any] = {
+            "servers": {
+                "server1": {"services": [{"service": "kafka"}]},
+                "server2": {
+                    "services": [
+                        {"service": "kafka", "cluster": "back"},
+                        {"service": "zookeeper"},
+                    ]
+                },
+                "server3": {"services": [{"service": "kafka"}]},
+                "server4": {"users": [{"user": "operator"}]},
+            }
+        }
+        assert generate_helper.compile_topology_index(topology_dict) == {
+            "kafka": {"common": ["server1", "server3"], "back": ["server2"]},
+            "zookeeper": {"common": ["server2"]},
+        }
+
+    def test_duplicates_keep_the_topology_order(self) -> None:
+        topology_dict: Dict[str, Any] = {
+            "servers": {
+                "server3": {"services": [{"service": "kafka"}]},
+                "server1": {
+                    "services": [
+                        {"service": "kafka"},
+                        {"service": "kafka", "cluster": "common"},
+                    ]
+                },
+                "server2": {"services": [{"service": "kafka"}] * 3},
+            }
+        }
+        assert generate_helper.compile_topology_index(topology_dict) == {
+            "kafka": {"common": ["server3", "server1", "server2"]}
+        }
+
+
+class TestVagrantfileContext(object):
+    def test_settings_and_topology_are_merged(self) -> None:
+        context = generate_helper.vagrantfile_context(
+            {"box": "bionic"}, {"servers": {"server1": {}}}
+        )
+        assert context == {"box": "bionic", "servers": {"server1": {}}}
+
+    def test_duplicate_keys_are_rejected(self) -> None:
+        with pytest.raises(click.BadParameter, match="servers"):
+            generate_helper.vagrantfile_context(
+                {"box": "bionic", "servers": {}}, {"servers": {"server1": {}}}
+            )
+
+
+class TestLegacySettings(object):
+    def test_same_json_as_the_yaml_document(self) -> None:
+        deployment_settings = (
+            "platform:\n  platform_id: test\n  servers: [server1, server2]\n"
+            "kafka:\n  clusters:\n    local: {brokers_port: 9092, ssl: false}\n"
+        )
+        legacy = generate_helper.legacy_settings(deployment_settings)
+        assert legacy == json.dumps(serialization.load_yaml(deployment_settings))
+        assert json.loads(legacy)["kafka"]["clusters"]["local"] == {
+            "brokers_port": 9092,
+            "ssl": False,
+        }
+
+
+class TestStreamTemplate(object):
+    def test_streamed_as_rendered(self, tmpdir: Any) -> None:
+        template = tmpdir.join("servers.j2")
+        template.write("{% for server in servers %}{{ server }}: é\n{% endfor %}")
+        context = {"servers": [f"server{index}" for index in range(100)]}
+
+        class RecordingOutput(io.BytesIO):
+            writes = 0
+
+            def write(self, data: bytes) -> int:
+                RecordingOutput.writes += 1
+                return super().write(data)
+
+        output = RecordingOutput()
+        generate_helper.stream_template(str(template), context, output, buffer_size=64)
+        rendered = generate_helper.render_template(str(template), context)
+        assert output.getvalue() == rendered.encode("UTF-8")
+        assert RecordingOutput.writes > 1
+
+
+class TestSubstituteLocalUser(object):
+    def test_only_exact_placeholders_are_replaced(self) -> None:
+        blueprint = {
+            "users": {"localusername": {"groups": ["localusergroup", "docker"]}},
+            "platform": {
+                "punch_daemons_user": "localusername",
+                "description": "runs as localusername",
+                "port": 22,
+            },
+        }
+        assert generate_helper.substitute_local_user(blueprint, "bob", "staff") == {
+            "users": {"bob": {"groups": ["staff", "docker"]}},
+            "platform": {
+                "punch_daemons_user": "bob",
+                "description": "runs as localusername",
+                "port": 22,
+            },
+        }
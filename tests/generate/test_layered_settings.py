@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from typing import Any
+from typing import Dict
+
+from punchbox.generate.layered_settings import LayeredSettings
+from punchbox.generate.layered_settings import materialise
+
+
+class TestLayeredSettings(object):
+    def test_most_specific_layer_wins(self) -> None:
+        service: Dict[str, Any] = {"port": 9092, "heap": "512m"}
+        cluster = LayeredSettings({"heap": "1g"}, service)
+        server = cluster.over({"cpu": 2})
+        assert dict(server) == {"port": 9092, "heap": "1g", "cpu": 2}
+
+    def test_writes_are_copy_on_write(self) -> None:
+        service: Dict[str, Any] = {"port": 9092}
+        cluster = LayeredSettings(service)
+        server = cluster.over({})
+        server["port"] = 9093
+        cluster["version"] = "2.8.1"
+        assert service == {"port": 9092}
+        assert cluster["port"] == 9092
+        assert server["port"] == 9093
+        assert server["version"] == "2.8.1"
+
+    def test_materialise_returns_plain_copies(self) -> None:
+        shared: Dict[str, Any] = {"tags": ["common"]}
+        blueprint = {"clusters": [LayeredSettings({"id": 1}, shared)]}
+        plain = materialise(blueprint)
+        assert plain == {"clusters": [{"id": 1, "tags": ["common"]}]}
+        assert type(plain["clusters"][0]) is dict
+        assert plain["clusters"][0]["tags"] is not shared["tags"]
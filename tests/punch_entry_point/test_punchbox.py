@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import importlib
+import subprocess
+import sys
+
+from typing import List
+
+import click
+import pytest
+
+from punchbox.punch_entry_point import punchbox
+
+# cumulative import time of the cli entry point, in microseconds. It is ~30ms once
+# the subcommands are lazily loaded, ~200ms when they are imported eagerly
+IMPORT_TIME_BUDGET_US: int = 120_000
+# modules only needed by the subcommands themselves
+HEAVY_MODULES: List[str] = ["jinja2", "yaml", "rich"]
+
+
+def run_python(code: str, *options: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+
+
+class TestLazyCommands(object):
+    def test_help_does_not_import_the_subcommands(self) -> None:
+        result = run_python(
+            "import sys\n"
+            "from punchbox.punch_entry_point import punchbox\n"
+            "try:\n"
+            "    punchbox.cli(['--help'])\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            "print(sorted(m for m in sys.modules\n"
+            f"             if m.split('.')[0] in {HEAVY_MODULES}))"
+        )
+        assert "Setup your workspace." in result.stdout
+        assert result.stdout.splitlines()[-1] == "[]"
+
+    @pytest.mark.skipif(
+        sys.version_info < (3, 7), reason="-X importtime needs python 3.7"
+    )
+    def test_import_time_budget(self) -> None:
+        # best of a few runs, not to fail on a busy machine
+        timings = []
+        for _ in range(3):
+            result = run_python("import punchbox.punchbox", "-X", "importtime")
+            lines = result.stderr.splitlines()
+            entry_point = [line for line in lines if line.endswith("punchbox.punchbox")]
+            timings.append(int(entry_point[-1].split("|")[1]))
+        assert min(timings) < IMPORT_TIME_BUDGET_US
+
+    def test_declared_short_help_matches_the_commands(self) -> None:
+        for name, lazy in punchbox.cli.lazy_commands.items():
+            module_name, attribute = lazy.import_path.split(":")
+            command = getattr(importlib.import_module(module_name), attribute)
+            assert isinstance(command, click.Command)
+            assert command.get_short_help_str() == lazy.short_help
+
+    def test_invoked_subcommand_is_loaded(self) -> None:
+        context = click.Context(punchbox.cli)
+        command = punchbox.cli.get_command(context, "generate")
+        assert isinstance(command, click.Group)
+        assert "blueprint" in command.list_commands(context)
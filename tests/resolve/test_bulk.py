@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+
+from pathlib import Path
+from typing import Any
+from typing import Dict
+
+import pytest
+
+from punchbox.resolve import bulk
+from punchbox.utils import serialization
+
+
+class TestBulk(object):
+
+    rules: Dict[str, Any] = {
+        "kafka": {
+            "match": "$.dag[?(@.type=='kafka_input')].settings",
+            "additional_values": {"brokers": "common"},
+        },
+    }
+
+    @pytest.fixture()
+    def tree(self, tmp_path: Path) -> Path:
+        channel = tmp_path / "pp-conf" / "tenants" / "mytenant" / "channels" / "apache"
+        channel.mkdir(parents=True)
+        for name in ("input", "output"):
+            (channel / f"{name}.json").write_text(
+                json.dumps({"dag": [{"type": f"kafka_{name}", "settings": {}}]})
+            )
+        (channel / "broken.json").write_text("{")
+        (tmp_path / "resolv.yml").write_text(serialization.dump_yaml(self.rules))
+        return tmp_path
+
+    def resolve(self, tree: Path, **kwargs: Any) -> bulk.TreeResolution:
+        return bulk.resolve_tree(
+            str(tree / "pp-conf"),
+            str(tree / "resolv.yml"),
+            str(tree / "cache"),
+            processes=1,
+            **kwargs,
+        )
+
+    def test_only_changed_files_are_resolved_again(self, tree: Path) -> None:
+        first = self.resolve(tree)
+        assert [file.path.split("/")[-1] for file in first.files] == [
+            "broken.json",
+            "input.json",
+            "output.json",
+        ]
+        assert [file.applied for file in first.files] == [[], ["kafka"], []]
+        assert not first.succeeded
+        assert not any(file.cached for file in first.files)
+
+        channel = tree / "pp-conf" / "tenants" / "mytenant" / "channels" / "apache"
+        (channel / "broken.json").write_text("{}")
+        second = self.resolve(tree, output=str(tree / "resolved"))
+        assert [file.cached for file in second.files] == [False, True, True]
+        assert second.succeeded
+        resolved = tree / "resolved" / "tenants" / "mytenant" / "channels" / "apache"
+        dag = json.loads((resolved / "input.json").read_text())["dag"]
+        assert dag[0]["settings"] == {"brokers": "common"}
+        totals = bulk.summary(second).splitlines()[-1]
+        assert totals.startswith("    3 files, 1 resolved, 2 cached, 0 failed")
+
+    def test_rules_change_invalidates_the_cache(self, tree: Path) -> None:
+        self.resolve(tree)
+        (tree / "resolv.yml").write_text(serialization.dump_yaml({}))
+        resolution = self.resolve(tree)
+        assert not any(file.cached for file in resolution.files)
+        assert all(file.applied == [] for file in resolution.files)
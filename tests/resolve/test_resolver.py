@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+
+from pathlib import Path
+from typing import Any
+from typing import Dict
+
+import pytest
+
+from _pytest.monkeypatch import MonkeyPatch
+from click.testing import CliRunner
+
+from punchbox.resolve import resolver
+from punchbox.resolve.resolve import resolve
+from punchbox.resolve.resolver import DocumentError
+from punchbox.resolve.resolver import Resolver
+from punchbox.resolve.resolver import ResolverError
+from punchbox.utils import serialization
+
+STANDALONE_RESOLV_YML: str = "conf/profiles/standalone/resolv.yml"
+
+
+class TestResolver(object):
+
+    rules: Dict[str, Any] = {
+        "kafka": {
+            "match": "$.dag[?(@.type=='kafka_input' || @.type=='kafka_output')].settings",
+            "additional_values": {"brokers": "common"},
+        },
+        "shiva": {
+            "match": "$.applications[?(@.runtime=='shiva')]",
+            "additional_values": {"cluster": "common"},
+        },
+        "archiving": {
+            "match": "$.archiving_pools[*]",
+            "additional_values": {"replication": 1},
+        },
+        "no_cron": {
+            "match": "$.[?(@.settings && (!(@.settings.cron)))]",
+            "additional_values": {"mode": "continuous"},
+        },
+        "mytenant_kafka": {
+            "match": "$.dag[?(@.type=='kafka_input')].settings",
+            "additional_values": {"brokers": "local"},
+            "selection": {"tenant": "mytenant", "channel": "*", "runtime": "*"},
+        },
+    }
+
+    def test_indexed_and_generic_filters(self) -> None:
+        document = {
+            "runtime": "storm",
+            "settings": {},
+            "dag": [
+                {"type": "kafka_input", "settings": {"topic": "logs"}},
+                {"type": "punchlet_node", "settings": {}},
+                {"type": "kafka_output", "settings": {}},
+            ],
+        }
+        resolved, applied = Resolver(self.rules).resolve(document)
+        assert [node["settings"] for node in resolved["dag"]] == [
+            {"topic": "logs", "brokers": "common"},
+            {},
+            {"brokers": "common"},
+        ]
+        assert resolved["mode"] == "continuous"
+        assert applied == ["kafka", "no_cron"]
+        # the document itself is left untouched
+        assert document["dag"][0]["settings"] == {"topic": "logs"}
+
+    def test_rules_are_applied_in_order(self) -> None:
+        document = {"dag": [{"type": "kafka_input", "settings": {}}]}
+        resolved, applied = Resolver(self.rules).resolve(
+            document, {"tenant": "mytenant"}
+        )
+        assert resolved["dag"][0]["settings"] == {"brokers": "local"}
+        assert applied == ["kafka", "mytenant_kafka"]
+        resolved, applied = Resolver(self.rules).resolve(
+            document, {"tenant": "othertenant"}
+        )
+        assert resolved["dag"][0]["settings"] == {"brokers": "common"}
+
+    def test_wildcard_and_runtime(self) -> None:
+        document = {
+            "settings": {"cron": "* * * * *"},
+            "archiving_pools": [{"name": "a"}, {"name": "b"}],
+            "applications": [{"runtime": "shiva"}, {"runtime": "spark"}],
+        }
+        resolved, applied = Resolver(self.rules).resolve(document)
+        assert resolved["archiving_pools"] == [
+            {"name": "a", "replication": 1},
+            {"name": "b", "replication": 1},
+        ]
+        assert resolved["applications"] == [
+            {"runtime": "shiva", "cluster": "common"},
+            {"runtime": "spark"},
+        ]
+        assert "mode" not in resolved
+        assert applied == ["shiva", "archiving"]
+
+    @pytest.mark.parametrize(
+        "match",
+        [
+            "$.dag[?(@.type=='kafka_input')",
+            "$.dag[?(@.type=)].settings",
+            "$.dag[?((@.type=='a')].settings",
+        ],
+    )
+    def test_unsupported_match(self, match: str) -> None:
+        with pytest.raises(ResolverError, match="broken"):
+            Resolver({"broken": {"match": match, "additional_values": {}}})
+
+    def test_shipped_rules_compile(self) -> None:
+        engine = resolver.load_resolver(STANDALONE_RESOLV_YML)
+        with open(STANDALONE_RESOLV_YML) as stream:
+            assert len(engine.rules) == len(serialization.load_yaml(stream))
+
+    def test_document_location(self) -> None:
+        location = resolver.document_location(
+            "pp-conf/tenants/mytenant/channels/apache/input.hjson"
+        )
+        assert location == {
+            "tenant": "mytenant",
+            "channel": "apache",
+            "runtime": None,
+            "name": "input",
+        }
+        assert resolver.document_location("punchline.yml")["tenant"] is None
+
+    def test_resolve_command(self, tmp_path: Path) -> None:
+        channel = tmp_path / "tenants" / "mytenant" / "channels" / "apache"
+        channel.mkdir(parents=True)
+        punchline = channel / "input.json"
+        punchline.write_text(
+            json.dumps({"dag": [{"type": "kafka_input", "settings": {}}]})
+        )
+        resolv_yml = tmp_path / "resolv.yml"
+        resolv_yml.write_text(serialization.dump_yaml(self.rules))
+        output = tmp_path / "resolved"
+        result = CliRunner().invoke(
+            resolve,
+            [
+                "--file",
+                str(punchline),
+                "--resolver",
+                str(resolv_yml),
+                "--output",
+                str(output),
+            ],
+        )
+        assert result.exit_code == 0, result.output
+        resolved = json.loads((output / "input.json").read_text())
+        assert resolved["dag"][0]["settings"] == {"brokers": "local"}
+
+    def test_hjson_without_hjson_package(
+        self, tmp_path: Path, monkeypatch: MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(resolver, "hjson", None)
+        punchline = tmp_path / "input.hjson"
+        punchline.write_text('{"dag": []}')
+        assert resolver.load_document(str(punchline)) == {"dag": []}
+        punchline.write_text("{\n  dag: []\n}")
+        with pytest.raises(DocumentError, match="input.hjson.*hjson python package"):
+            resolver.load_document(str(punchline))
+
+    def test_resolve_command_unparsable_file(self, tmp_path: Path) -> None:
+        punchline = tmp_path / "input.json"
+        punchline.write_text("{")
+        resolv_yml = tmp_path / "resolv.yml"
+        resolv_yml.write_text(serialization.dump_yaml(self.rules))
+        result = CliRunner().invoke(
+            resolve, ["--file", str(punchline), "--resolver", str(resolv_yml)]
+        )
+        assert result.exit_code == 1
+        assert f"Error: {punchline}: " in result.output
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import socket
+import stat
+import subprocess
+import sys
+import time
+
+from typing import Any
+
+from _pytest.capture import CaptureFixture
+from _pytest.monkeypatch import MonkeyPatch
+
+from punchbox.server import protocol
+from punchbox.server import server
+from punchbox.utils import serialization
+
+
+def start_server(socket_path: str) -> subprocess.Popen:
+    """Start a server serving a single command, once it listens"""
+    daemon = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "from punchbox.server import server\n"
+            f"server.serve({socket_path!r}, max_requests=1)",
+        ]
+    )
+    deadline = time.monotonic() + 10
+    while not protocol.is_listening(socket_path):
+        if time.monotonic() > deadline:
+            daemon.kill()
+            raise TimeoutError(f"no server listening on {socket_path}")
+        time.sleep(0.05)
+    return daemon
+
+
+class TestRunCommand(object):
+    def test_output_is_captured(self, tmpdir: Any) -> None:
+        response = server.run_command(
+            {"argv": ["generate", "--help"], "cwd": str(tmpdir), "environment": {}}
+        )
+        assert response["exit_code"] == 0
+        assert "blueprint" in response["stdout"]
+
+    def test_usage_error_exit_code(self, tmpdir: Any) -> None:
+        response = server.run_command(
+            {"argv": ["generate", "blueprint"], "cwd": str(tmpdir), "environment": {}}
+        )
+        assert response["exit_code"] == 2
+        assert "Missing option" in response["stderr"]
+
+    def test_client_environment_is_restored(self, tmpdir: Any) -> None:
+        cwd = os.getcwd()
+        with server.request_environment(str(tmpdir), {"PUNCHBOX_TEST_VAR": "on"}):
+            assert os.getcwd() == os.path.realpath(str(tmpdir))
+            assert os.environ["PUNCHBOX_TEST_VAR"] == "on"
+        assert os.getcwd() == cwd
+        assert "PUNCHBOX_TEST_VAR" not in os.environ
+
+    def test_server_environment_does_not_leak(
+        self, tmpdir: Any, monkeypatch: MonkeyPatch
+    ) -> None:
+        monkeypatch.setenv("PUNCHBOX_SERVER_ONLY", "server")
+        monkeypatch.setenv("PUNCHBOX_SHARED", "server")
+        monkeypatch.setenv("OTHER_VARIABLE", "server")
+        with server.request_environment(str(tmpdir), {"PUNCHBOX_SHARED": "client"}):
+            assert "PUNCHBOX_SERVER_ONLY" not in os.environ
+            assert os.environ["PUNCHBOX_SHARED"] == "client"
+            assert os.environ["OTHER_VARIABLE"] == "server"
+        assert os.environ["PUNCHBOX_SERVER_ONLY"] == "server"
+        assert os.environ["PUNCHBOX_SHARED"] == "server"
+
+
+class TestForward(object):
+    def test_no_server_listening(self, tmpdir: Any) -> None:
+        assert protocol.forward(str(tmpdir.join("server.sock")), ["--help"]) is None
+
+    def test_round_trip(self, tmpdir: Any) -> None:
+        socket_path = str(tmpdir.join("server.sock"))
+        daemon = start_server(socket_path)
+        try:
+            socket_mode = os.stat(socket_path).st_mode
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                connection.connect(socket_path)
+                protocol.send_message(
+                    connection, protocol.command_request(["generate", "--help"])
+                )
+                response = protocol.receive_message(connection)
+            assert response is not None
+            assert response["exit_code"] == 0
+            assert "vagrantfile" in response["stdout"]
+            assert daemon.wait(timeout=10) == 0
+            assert stat.S_IMODE(socket_mode) == 0o600
+            assert not os.path.exists(socket_path)
+        finally:
+            daemon.kill()
+
+    def test_prompts_are_answered_by_the_client(
+        self, tmpdir: Any, monkeypatch: MonkeyPatch, capsys: CaptureFixture
+    ) -> None:
+        workspace = tmpdir.mkdir("workspace")
+        punchbox_dir = workspace.join("conf", "punchbox")
+        punchbox_dir.join("settings.yml").write(
+            serialization.dump_yaml({"vagrant": {"os": "bionic"}}), ensure=True
+        )
+        punchbox_dir.join("topology.yml").write(
+            serialization.dump_yaml({"servers": {"server1": {"services": []}}})
+        )
+        workspace.join("Vagrantfile.j2").write("{{ os }} {{ servers | length }}\n")
+        punchbox_dir.join("punchbox.yml").write(
+            serialization.dump_yaml(
+                {
+                    "version": "1.0",
+                    "env": {
+                        "deployer": str(workspace.join("deployer")),
+                        "type": "test",
+                        "vagrantfile": str(workspace.join("Vagrantfile")),
+                        "workspace": str(workspace),
+                    },
+                    "punch": dict(
+                        {
+                            name: str(workspace.join(name))
+                            for name in (
+                                "blueprint",
+                                "deployment_settings",
+                                "deployment_settings_template",
+                                "punchplatform_deployment_settings",
+                                "resolv_conf",
+                                "resolv_conf_template",
+                                "user_resolver",
+                            )
+                        },
+                        user_settings=str(punchbox_dir.join("settings.yml")),
+                        user_topology=str(punchbox_dir.join("topology.yml")),
+                    ),
+                    "vagrant": {
+                        "template": str(workspace.join("Vagrantfile.j2")),
+                        "vagrantfile": str(workspace.join("Vagrantfile")),
+                    },
+                }
+            )
+        )
+        socket_path = str(tmpdir.join("server.sock"))
+        daemon = start_server(socket_path)
+        try:
+            # the vagrantfile only, not the blueprint and deployment settings
+            monkeypatch.setattr(sys, "stdin", io.StringIO("y\nn\nn\n"))
+            exit_code = protocol.forward(
+                socket_path, ["workspace", "build", "--workspace", str(workspace)]
+            )
+            output = capsys.readouterr()
+            assert exit_code == 0, output.err
+            assert "generate vagrantfile" in output.out
+            assert workspace.join("Vagrantfile").read() == "bionic 1"
+            assert not workspace.join("blueprint").exists()
+            assert daemon.wait(timeout=10) == 0
+        finally:
+            daemon.kill()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+
+from typing import Any
+from typing import Dict
+
+from _pytest.monkeypatch import MonkeyPatch
+
+from punchbox import api
+from punchbox.common_lib.runtime_meta.environment import Environment
+from punchbox.utils import ansible
+from punchbox.utils import serialization
+
+SETTINGS: Dict[str, Any] = {
+    "platform": {"platform_id": "test"},
+    "vagrant": {"box": "bionic"},
+}
+TOPOLOGY: Dict[str, Any] = {"servers": {"server1": {"users": [{"user": "operator"}]}}}
+DEPLOYMENT_TEMPLATE: str = (
+    "platform: {{ platform.platform_id }}\nusers: {{ users | list }}\n"
+)
+
+
+def create_workspace(workspace: str, deployment_template: str) -> None:
+    """Write a workspace, its deployer has no component"""
+    files = {
+        "conf/punchbox/settings.yml": serialization.dump_yaml(SETTINGS),
+        "conf/punchbox/topology.yml": serialization.dump_yaml(TOPOLOGY),
+        "templates/deployment.settings.j2": deployment_template,
+        "vagrant/Vagrantfile.j2": "{{ box }} {{ servers | length }}",
+    }
+    for name, content in files.items():
+        os.makedirs(os.path.dirname(os.path.join(workspace, name)), exist_ok=True)
+        with open(os.path.join(workspace, name), "w") as outfile:
+            outfile.write(content)
+    os.makedirs(os.path.join(workspace, "conf/punchbox/generated"))
+    os.makedirs(os.path.join(workspace, "pp-conf"))
+    punch = {
+        "blueprint": "conf/punchbox/generated/blueprint.yml",
+        "deployment_settings": "pp-conf/deployment-settings.yml",
+        "deployment_settings_template": "templates/deployment.settings.j2",
+        "punchplatform_deployment_settings": "pp-conf/legacy.settings",
+        "resolv_conf": "pp-conf/resolv.hjson",
+        "resolv_conf_template": "templates/resolv.hjson.j2",
+        "user_resolver": "conf/punchbox/resolv.yml",
+        "user_settings": "conf/punchbox/settings.yml",
+        "user_topology": "conf/punchbox/topology.yml",
+    }
+    vagrant = {
+        "template": "vagrant/Vagrantfile.j2",
+        "vagrantfile": "vagrant/Vagrantfile",
+    }
+    with open(os.path.join(workspace, "conf/punchbox/punchbox.yml"), "w") as out:
+        serialization.dump_yaml(
+            {
+                "version": "1.0",
+                "env": {
+                    "deployer": os.path.join(workspace, "deployer"),
+                    "type": "test",
+                    "vagrantfile": os.path.join(workspace, vagrant["vagrantfile"]),
+                    "workspace": workspace,
+                },
+                "punch": {
+                    key: os.path.join(workspace, path) for key, path in punch.items()
+                },
+                "vagrant": {
+                    key: os.path.join(workspace, path) for key, path in vagrant.items()
+                },
+            },
+            out,
+        )
+
+
+class TestApi(object):
+    def test_versions_map_or_deployer(self, monkeypatch: MonkeyPatch) -> None:
+        monkeypatch.setattr(
+            ansible,
+            "get_components_version",
+            lambda deployer_path, component_names=None: {},
+        )
+        from_deployer = api.build_blueprint(SETTINGS, TOPOLOGY, "/deployer")
+        from_map = api.build_blueprint(SETTINGS, TOPOLOGY, {"zookeeper": "3.5.7"})
+        assert from_deployer == from_map
+        assert from_map["platform"] == {"platform_id": "test"}
+        assert from_map["users"] == {"operator": {}}
+
+    def test_render_deployment_and_legacy_settings(self, tmpdir: Any) -> None:
+        template = tmpdir.join("deployment.settings.j2")
+        template.write(DEPLOYMENT_TEMPLATE)
+        blueprint = api.build_blueprint(
+            SETTINGS, TOPOLOGY, {"zookeeper": "3.5.7"}, normalised=True
+        )
+        deployment_settings = api.render_deployment(blueprint, str(template))
+        expected = {"platform": "test", "users": ["operator"]}
+        assert serialization.load_yaml(deployment_settings) == expected
+        assert json.loads(api.legacy_settings(deployment_settings)) == expected
+
+    def test_render_resolver_in_dumped_order(self, tmpdir: Any) -> None:
+        template = tmpdir.join("resolv.hjson.j2")
+        template.write("{{ users | list }}")
+        topology = {
+            "servers": {"server1": {"users": [{"user": "zeta"}, {"user": "alpha"}]}}
+        }
+        blueprint = api.build_blueprint(SETTINGS, topology, {})
+        loaded = serialization.load_yaml(api.dump_blueprint(blueprint))
+        rendered = api.render_resolver(blueprint, str(template))
+        assert rendered == api.render_resolver(loaded, str(template))
+        assert rendered == "['alpha', 'zeta']"
+
+    def test_build_workspace(self, tmpdir: Any, monkeypatch: MonkeyPatch) -> None:
+        monkeypatch.setattr(
+            ansible,
+            "get_components_version",
+            lambda deployer_path, component_names=None: {},
+        )
+        workspace = str(tmpdir)
+        create_workspace(workspace, DEPLOYMENT_TEMPLATE)
+
+        timings = api.build(workspace)
+        assert set(timings) == {
+            "vagrantfile",
+            "blueprint",
+            "deployment-settings",
+            "legacy-settings",
+        }
+        with open(os.path.join(workspace, "vagrant/Vagrantfile")) as infile:
+            assert infile.read() == "bionic 1"
+        with open(os.path.join(workspace, "pp-conf/legacy.settings")) as infile:
+            assert json.load(infile) == {"platform": "test", "users": ["operator"]}
+
+    def test_build_follows_every_input(
+        self, tmpdir: Any, monkeypatch: MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(
+            ansible,
+            "get_components_version",
+            lambda deployer_path, component_names=None: {},
+        )
+        workspace = str(tmpdir)
+        create_workspace(
+            workspace,
+            # the new line right after a block is trimmed
+            "{% include 'platform.j2' %}\n\n"
+            "address: {{ platform.platform_id | resolve_hostname_to_ip }}\n",
+        )
+        included = tmpdir.join("templates", "platform.j2")
+        included.write("platform: {{ platform.platform_id }}")
+        hosts_file = tmpdir.join("hosts")
+        hosts_file.write("10.0.0.1 test\n")
+        monkeypatch.setenv(
+            Environment.PUNCHPLATFORM_PUNCHBOX_HOSTS_FILE, str(hosts_file)
+        )
+        deployment_settings = tmpdir.join("pp-conf", "deployment-settings.yml")
+
+        api.build(workspace)
+        assert deployment_settings.read() == "platform: test\naddress: 10.0.0.1"
+        included.write("platform: included")
+        api.build(workspace)
+        assert deployment_settings.read() == "platform: included\naddress: 10.0.0.1"
+        hosts_file.write("10.0.0.2 test\n")
+        api.build(workspace)
+        assert deployment_settings.read() == "platform: included\naddress: 10.0.0.2"
+
+        monkeypatch.setenv(Environment.PUNCHPLATFORM_PUNCHBOX_VERSION_BACKEND, "shell")
+        api.build(workspace)
+        manifest = json.loads(
+            tmpdir.join("conf", "punchbox", "generated", "build-manifest.json").read()
+        )
+        assert manifest["blueprint"]["inputs"]["version_backend"] == "shell"
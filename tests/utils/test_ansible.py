@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import stat
+import zipfile
+
+from pathlib import Path
+from typing import Any
+from typing import List
+
+import jinja2
+import pytest
+
+from _pytest.monkeypatch import MonkeyPatch
+
+from punchbox import components
+from punchbox.common_lib.runtime_meta.environment import Environment
+from punchbox.utils import ansible
+from punchbox.utils import deployer as punch_deployer
+
+
+class TestComponentsVersion(object):
+    @pytest.fixture()
+    def deployer(self, tmp_path: Path, monkeypatch: MonkeyPatch) -> str:
+        monkeypatch.setenv(
+            Environment.PUNCHPLATFORM_PUNCHBOX_CACHE_DIR, str(tmp_path / "cache")
+        )
+        deployer_dir: Path = tmp_path / "deployer"
+        (deployer_dir / "bin").mkdir(parents=True)
+        versionof_shell: Path = deployer_dir / ansible.VERSIONOF_SHELL
+        versionof_shell.write_text('#!/bin/sh\necho "$2-6.3.0"\n')
+        versionof_shell.chmod(versionof_shell.stat().st_mode | stat.S_IEXEC)
+        return str(deployer_dir)
+
+    def test_probe_all_components(self, deployer: str) -> None:
+        versions = ansible.get_components_version(deployer)
+        assert list(versions) == components.COMPONENTS
+        assert versions["kafka"] == "kafka-6.3.0"
+
+    def test_cached_versions_do_not_spawn_probes(
+        self, deployer: str, monkeypatch: MonkeyPatch
+    ) -> None:
+        expected = ansible.get_components_version(deployer)
+
+        def fail(*args: Any, **kwargs: Any) -> str:
+            raise AssertionError("unexpected version probe")
+
+        monkeypatch.setattr(ansible, "probe_component_version", fail)
+        assert ansible.get_components_version(deployer) == expected
+
+    def test_fingerprint_follows_version_script(self, deployer: str) -> None:
+        fingerprint = ansible.deployer_fingerprint(deployer)
+        versionof_shell = os.path.join(deployer, ansible.VERSIONOF_SHELL)
+        with open(versionof_shell, "a") as script:
+            script.write("# new deployer release\n")
+        assert ansible.deployer_fingerprint(deployer) != fingerprint
+        assert ansible.deployer_fingerprint(f"{deployer}/missing") is None
+
+    def test_probe_requested_components_only(
+        self, deployer: str, monkeypatch: MonkeyPatch
+    ) -> None:
+        probed: List[str] = []
+        probe = ansible.probe_component_version
+
+        def spy(versionof_shell: str, component: str, *args: Any) -> str:
+            probed.append(component)
+            return probe(versionof_shell, component, *args)
+
+        monkeypatch.setattr(ansible, "probe_component_version", spy)
+        versions = ansible.get_components_version(
+            deployer, ["zookeeper", "kafka", "unknown"]
+        )
+        assert versions == {"zookeeper": "zookeeper-6.3.0", "kafka": "kafka-6.3.0"}
+        assert sorted(probed) == ["kafka", "zookeeper"]
+        assert ansible.get_components_version(deployer, []) == {}
+
+    def test_native_backend_reads_deployer_archive(
+        self, tmp_path: Path, deployer: str, monkeypatch: MonkeyPatch
+    ) -> None:
+        def fail(*args: Any, **kwargs: Any) -> str:
+            raise AssertionError("unexpected version probe")
+
+        monkeypatch.setattr(ansible, "probe_component_version", fail)
+        archive_path = str(tmp_path / "punch-deployer-6.3.0.zip")
+        with zipfile.ZipFile(archive_path, "w") as archive:
+            archive.writestr(
+                f"punch-deployer-6.3.0/{punch_deployer.VERSION_MANIFEST}",
+                "kafka: 2.8.1\nzookeeper: 3.5.7\n",
+            )
+        versions = ansible.get_components_version(
+            archive_path, ["kafka", "zookeeper"], backend="native"
+        )
+        assert versions == {"kafka": "2.8.1", "zookeeper": "3.5.7"}
+        with pytest.raises(KeyError):
+            ansible.get_components_version(archive_path, ["shiva"], backend="native")
+
+    def test_auto_backend_falls_back_to_version_script(self, deployer: str) -> None:
+        with open(os.path.join(deployer, punch_deployer.VERSION_MANIFEST), "w") as f:
+            f.write("kafka: 2.8.1\n")
+        versions = ansible.get_components_version(deployer, ["kafka", "shiva"])
+        assert versions == {"shiva": "shiva-6.3.0", "kafka": "2.8.1"}
+        with pytest.raises(ValueError):
+            ansible.get_components_version(deployer, backend="unknown")
+
+
+class TestLoadTemplate(object):
+    def test_environment_and_bytecode_are_cached(self, tmp_path: Path) -> None:
+        template_path = tmp_path / "hello.j2"
+        template_path.write_text("hello {{ name | to_basename }}")
+        cache_dir = tmp_path / ".jinja-cache"
+        template = ansible.load_template(str(template_path), str(cache_dir))
+        assert template.render(name="/home/punch") == "hello punch"
+        assert ansible.load_template(str(template_path), str(cache_dir)) is template
+        assert len(list(cache_dir.iterdir())) == 1
+
+    def test_bytecode_is_replaced_atomically(
+        self, tmp_path: Path, monkeypatch: MonkeyPatch
+    ) -> None:
+        template_path = tmp_path / "hello.j2"
+        template_path.write_text("hello")
+        cache_dir = tmp_path / ".jinja-cache"
+        template = ansible.load_template(str(template_path), str(cache_dir))
+        (cache_file,) = cache_dir.iterdir()
+        bytecode = cache_file.read_bytes()
+
+        def interrupted_write(bucket: Any, outfile: Any) -> None:
+            outfile.write(bytecode[:10])
+            raise OSError("disk full")
+
+        monkeypatch.setattr(jinja2.bccache.Bucket, "write_bytecode", interrupted_write)
+        env = template.environment
+        env.bytecode_cache.dump_bytecode(
+            env.bytecode_cache.get_bucket(env, "hello.j2", None, "hello")
+        )
+        assert list(cache_dir.iterdir()) == [cache_file]
+        assert cache_file.read_bytes() == bytecode
+
+    def test_template_change_is_reloaded(self, tmp_path: Path) -> None:
+        template_path = tmp_path / "hello.j2"
+        template_path.write_text("hello")
+        assert ansible.load_template(str(template_path)).render() == "hello"
+        template_path.write_text("bye")
+        os.utime(str(template_path), (0, 0))
+        assert ansible.load_template(str(template_path)).render() == "bye"
+
+    def test_referenced_templates(self, tmp_path: Path) -> None:
+        templates = {
+            "deployment.j2": "{% include 'kafka.j2' %}{% include name %}",
+            "kafka.j2": "{% import 'macros.j2' as macros %}{% include 'kafka.j2' %}",
+            "macros.j2": "{% macro port() %}9092{% endmacro %}",
+        }
+        for name, source in templates.items():
+            (tmp_path / name).write_text(source)
+        assert ansible.referenced_templates(str(tmp_path / "deployment.j2")) == [
+            str(tmp_path / "kafka.j2"),
+            str(tmp_path / "macros.j2"),
+        ]
+        assert ansible.referenced_templates(str(tmp_path / "macros.j2")) == []
+
+
+class TestFilters(object):
+
+    urls: List[str] = ["server1:9092/topic", "server2:9200", "server3", "server4/a/b"]
+
+    def test_url_filters(self) -> None:
+        assert [ansible.url_to_host(url) for url in self.urls] == [
+            "server1",
+            "server2",
+            "server3",
+            "server4/a/b",
+        ]
+        assert [ansible.url_to_port(url, "80") for url in self.urls] == [
+            "9092",
+            "9200",
+            "80",
+            "80",
+        ]
+        assert [ansible.url_to_path(url) for url in self.urls] == [
+            "/topic",
+            "/",
+            "/",
+            "/a/b",
+        ]
+
+    def test_url_filters_accept_lists(self) -> None:
+        for url_filter in (
+            ansible.url_to_host,
+            ansible.url_to_port,
+            ansible.url_to_path,
+        ):
+            assert url_filter(self.urls) == [url_filter(url) for url in self.urls]
+
+    def test_regex_subst(self) -> None:
+        assert ansible.regex_subst("server1:9092", "server([0-9]+)", "node\\1") == (
+            "node1:9092"
+        )
+        assert ansible.regex_subst([["a1"], "b2"], "[0-9]", "") == [["a"], "b"]
+
+    def test_regex_subst_patterns_cache_is_bounded(self) -> None:
+        for index in range(ansible.REGEX_CACHE_SIZE + 10):
+            ansible.regex_subst("value", f"v{index}", "")
+        cache = ansible.compiled_pattern.cache_info()
+        assert cache.currsize <= ansible.REGEX_CACHE_SIZE
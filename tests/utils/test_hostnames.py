@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import socket
+
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from _pytest.monkeypatch import MonkeyPatch
+
+from punchbox.common_lib.runtime_meta.environment import Environment
+from punchbox.generate import generate_helper
+from punchbox.utils import hostnames
+from punchbox.utils.hostnames import HostnameResolver
+
+
+class TestHostnames(object):
+    @pytest.fixture()
+    def lookups(self, monkeypatch: MonkeyPatch) -> List[str]:
+        lookups: List[str] = []
+
+        def gethostbyname(hostname: str) -> str:
+            lookups.append(hostname)
+            if hostname.startswith("unknown"):
+                raise socket.gaierror(f"unknown host {hostname}")
+            return f"10.0.0.{len(hostname)}"
+
+        monkeypatch.setattr(socket, "gethostbyname", gethostbyname)
+        return lookups
+
+    @pytest.fixture()
+    def template(self, tmp_path: Path) -> str:
+        template = tmp_path / "hosts.j2"
+        template.write_text(
+            "{% for name in servers %}{% for _ in range(3) %}"
+            "{{ name | resolve_hostname_to_ip }} "
+            "{% endfor %}{% endfor %}"
+        )
+        return str(template)
+
+    def test_read_hosts_file(self, tmp_path: Path) -> None:
+        hosts_file = tmp_path / "hosts"
+        hosts_file.write_text(
+            "# comment\n127.0.0.1 localhost\n\n"
+            "10.0.0.1 server1 server1.punch # alias\n10.0.0.2 server1\n"
+        )
+        assert hostnames.read_hosts_file(str(hosts_file)) == {
+            "localhost": "127.0.0.1",
+            "server1": "10.0.0.1",
+            "server1.punch": "10.0.0.1",
+        }
+
+    def test_each_hostname_is_looked_up_once(self, lookups: List[str]) -> None:
+        resolver = HostnameResolver()
+        assert resolver.resolve("server1") == resolver.resolve("server1")
+        assert lookups == ["server1"]
+
+    def test_offline_resolver_never_looks_up(self, lookups: List[str]) -> None:
+        resolver = HostnameResolver({"server1": "10.1.1.1"}, offline=True)
+        assert resolver.resolve("server1") == "10.1.1.1"
+        with pytest.raises(Exception, match="server2"):
+            resolver.resolve("server2")
+        resolver.prefetch(["server3"])
+        assert lookups == []
+
+    def test_prefetch_skips_unknown_hostnames(self, lookups: List[str]) -> None:
+        resolver = HostnameResolver()
+        resolver.prefetch(["server1", "unknown1", "server1"])
+        assert sorted(lookups) == ["server1", "unknown1"]
+        assert resolver.resolve("server1") == "10.0.0.7"
+        with pytest.raises(socket.gaierror):
+            resolver.resolve("unknown1")
+
+    def test_failed_lookups_are_not_retried(self, lookups: List[str]) -> None:
+        resolver = HostnameResolver()
+        resolver.prefetch(["unknown1"])
+        for _ in range(2):
+            with pytest.raises(socket.gaierror):
+                resolver.resolve("unknown1")
+        resolver.prefetch(["unknown1"])
+        assert lookups == ["unknown1"]
+
+    def test_context_hostnames(self) -> None:
+        blueprint = {
+            "services": {
+                "kafka": {"clusters": {"local": {"servers": {"s1": {}, "s2": {}}}}},
+                "shiva": {"clusters": {"common": {"servers": {"s2": {}, "s3": {}}}}},
+            }
+        }
+        assert hostnames.context_hostnames(blueprint) == ["s1", "s2", "s3"]
+
+    def test_render_resolves_each_server_once(
+        self, lookups: List[str], template: str
+    ) -> None:
+        rendered = generate_helper.render_template(
+            template, {"servers": {"server1": {}, "server22": {}}}
+        )
+        assert rendered.split() == ["10.0.0.7"] * 3 + ["10.0.0.8"] * 3
+        assert sorted(lookups) == ["server1", "server22"]
+
+    def test_render_only_prefetches_on_demand(
+        self, lookups: List[str], tmp_path: Path, monkeypatch: MonkeyPatch
+    ) -> None:
+        template = tmp_path / "first.j2"
+        template.write_text("{{ 'server1' | resolve_hostname_to_ip }}")
+        context = {"servers": {"server1": {}, "server22": {}}}
+        generate_helper.render_template(str(template), context)
+        assert lookups == ["server1"]
+        lookups.clear()
+        monkeypatch.setenv(Environment.PUNCHPLATFORM_PUNCHBOX_HOSTNAME_PREFETCH, "1")
+        generate_helper.render_template(str(template), context)
+        assert sorted(lookups) == ["server1", "server22"]
+
+    def test_render_offline_from_hosts_file(
+        self,
+        lookups: List[str],
+        template: str,
+        tmp_path: Path,
+        monkeypatch: MonkeyPatch,
+    ) -> None:
+        hosts_file = tmp_path / "hosts"
+        hosts_file.write_text("192.168.0.1 server1\n")
+        monkeypatch.setenv(
+            Environment.PUNCHPLATFORM_PUNCHBOX_HOSTS_FILE, str(hosts_file)
+        )
+        rendered = generate_helper.render_template(
+            template, {"servers": {"server1": {}}}
+        )
+        assert rendered.split() == ["192.168.0.1"] * 3
+        assert lookups == []
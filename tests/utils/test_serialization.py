@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+
+import yaml
+
+from punchbox.utils import serialization
+
+
+class TestSerialization(object):
+
+    document = {"platform": {"id": "punchbox", "ports": [9092, 9200]}, "users": {}}
+
+    def test_dump_matches_pure_python_dumper(self) -> None:
+        expected = yaml.dump(TestSerialization.document, Dumper=yaml.SafeDumper)
+        assert serialization.dump_yaml(TestSerialization.document) == expected
+
+    def test_round_trip_through_stream(self) -> None:
+        stream = io.StringIO()
+        assert serialization.dump_yaml(TestSerialization.document, stream) is None
+        stream.seek(0)
+        assert serialization.load_yaml(stream) == TestSerialization.document
+
+    def test_encoded_dump_to_binary_stream_with_encoding_attribute(self) -> None:
+        class LazyBinaryFile(io.BytesIO):
+            encoding = None
+
+        stream = LazyBinaryFile()
+        serialization.dump_yaml(TestSerialization.document, stream, encoding="UTF-8")
+        expected = serialization.dump_yaml(TestSerialization.document)
+        assert stream.getvalue() == expected.encode("UTF-8")
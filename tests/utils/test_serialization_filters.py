@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import collections
+import datetime
+import json
+
+from typing import Any
+from typing import Dict
+
+import pytest
+
+from punchbox.utils import serialization
+from punchbox.utils import serialization_filters
+
+
+class TestSerializationFilters(object):
+
+    document: Dict[str, Any] = {
+        "platform": {"id": "punchbox", "ports": [9092, 9200], "empty": {}},
+        "services": {"kafka": {"version": "6.4.5", "heap": "-Xmx512m"}},
+        "users": [],
+        "ratio": 0.75,
+        "missing": None,
+        "label": "déploiement",
+    }
+
+    @pytest.mark.parametrize("optional_indent", [0, 3])
+    def test_to_nice_yaml_shifts_every_line(self, optional_indent: int) -> None:
+        transformed = serialization.dump_yaml(
+            self.document, indent=4, default_flow_style=False, line_break="\n"
+        )
+        expected = "".join(
+            " " * optional_indent + line + "\n" for line in transformed.split("\n")
+        )
+        transformed = serialization_filters.to_nice_yaml(
+            self.document, optional_indent=optional_indent
+        )
+        assert transformed == expected
+
+    @pytest.mark.parametrize("indent", [2, 4, 3])
+    def test_to_nice_json_matches_json_module(self, indent: int) -> None:
+        expected = json.dumps(self.document, indent=indent, sort_keys=True)
+        assert serialization_filters.to_nice_json(self.document, indent) == expected
+
+    def test_to_nice_json_falls_back_to_to_json(self) -> None:
+        # mixed keys cannot be sorted
+        document = {1: "one", "two": 2}
+        assert serialization_filters.to_nice_json(document) == json.dumps(document)
+
+    def test_encoder_handles_template_values(self) -> None:
+        document = {
+            "settings": collections.ChainMap({"cpu": 2}, {"cpu": 1, "memory": 4096}),
+            "tags": {"front"},
+            "day": datetime.date(2021, 3, 1),
+        }
+        expected = {
+            "settings": {"cpu": 2, "memory": 4096},
+            "tags": ["front"],
+            "day": "2021-03-01",
+        }
+        assert json.loads(serialization_filters.to_json(document)) == expected
+        assert json.loads(serialization_filters.to_nice_json(document)) == expected
+
+    def test_to_json_matches_json_module(self) -> None:
+        assert serialization_filters.to_json(self.document) == json.dumps(self.document)
+        assert serialization_filters.to_json(
+            self.document, sort_keys=True
+        ) == json.dumps(self.document, sort_keys=True)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import pstats
+import threading
+
+from punchbox.utils import timings
+
+
+class TestTimings(object):
+    def test_spans_are_ignored_when_disabled(self) -> None:
+        timings.disable()
+        with timings.span("ignored"):
+            pass
+        assert timings.current() is None
+        assert timings.disable() is None
+
+    def test_nested_spans_of_the_same_name_are_summed(self) -> None:
+        timings.enable()
+        for _ in range(3):
+            with timings.span("stage"):
+                with timings.span("render"):
+                    pass
+        root = timings.disable()
+        assert list(root.children) == ["stage"]
+        stage = root.children["stage"]
+        assert stage.calls == 3
+        assert stage.children["render"].calls == 3
+        assert stage.seconds >= stage.children["render"].seconds
+
+    def test_worker_thread_spans_nest_in_the_given_parent(self) -> None:
+        timings.enable()
+        with timings.span("build"):
+            parent = timings.current()
+
+            def work() -> None:
+                with timings.span("stage", parent):
+                    with timings.span("render"):
+                        pass
+
+            worker = threading.Thread(target=work)
+            worker.start()
+            worker.join()
+        root = timings.disable()
+        assert "render" in root.children["build"].children["stage"].children
+
+    def test_report_lists_every_span(self) -> None:
+        timings.enable()
+        with timings.span("yaml load"):
+            pass
+        report = timings.report(timings.disable())
+        assert [line.split()[0] for line in report.splitlines()] == [
+            "span",
+            "punchbox",
+            "yaml",
+        ]
+
+    def test_instrument_writes_the_dumps(self, tmpdir, capsys) -> None:
+        profile = os.path.join(str(tmpdir), "punchbox.prof")
+        trace_memory = os.path.join(str(tmpdir), "punchbox.tracemalloc")
+        done = timings.instrument(True, profile, trace_memory)
+        with timings.span("work"):
+            sum(range(1000))
+        done()
+        assert "work" in capsys.readouterr().err
+        assert pstats.Stats(profile).total_calls > 0
+        assert os.path.getsize(trace_memory) > 0
+        assert timings.current() is None
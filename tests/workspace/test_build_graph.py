@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import threading
+
+from typing import List
+
+import pytest
+
+from punchbox.workspace.build_graph import Stage
+from punchbox.workspace.build_graph import StageExit
+from punchbox.workspace.build_graph import run_stages
+from punchbox.workspace.build_graph import topological_order
+
+
+class TestBuildGraph(object):
+    def test_dependencies_run_first(self) -> None:
+        calls: List[str] = []
+        stages = [
+            Stage("legacy", lambda: calls.append("legacy"), ("deployment",)),
+            Stage("deployment", lambda: calls.append("deployment"), ("blueprint",)),
+            Stage("blueprint", lambda: calls.append("blueprint")),
+        ]
+        assert [s.name for s in topological_order(stages)] == [
+            "blueprint",
+            "deployment",
+            "legacy",
+        ]
+        timings = run_stages(stages, jobs=4)
+        assert calls == ["blueprint", "deployment", "legacy"]
+        assert set(timings) == {"blueprint", "deployment", "legacy"}
+
+    def test_independent_stages_overlap(self) -> None:
+        # both stages only complete if they run at the same time
+        barrier = threading.Barrier(2, timeout=5)
+        stages = [Stage("vagrantfile", barrier.wait), Stage("blueprint", barrier.wait)]
+        assert set(run_stages(stages, jobs=2)) == {"vagrantfile", "blueprint"}
+
+    def test_failure_stops_dependent_stages(self) -> None:
+        calls: List[str] = []
+
+        def fail() -> None:
+            raise RuntimeError("template error")
+
+        stages = [
+            Stage("blueprint", fail),
+            Stage("deployment", lambda: calls.append("deployment"), ("blueprint",)),
+        ]
+        with pytest.raises(RuntimeError):
+            run_stages(stages, jobs=2)
+        assert calls == []
+        with pytest.raises(ValueError):
+            topological_order([Stage("a", fail, ("a",))])
+
+    def test_exit_is_a_stage_failure(self) -> None:
+        calls: List[str] = []
+        stages = [
+            Stage("blueprint", lambda: sys.exit(1)),
+            Stage("deployment", lambda: calls.append("deployment"), ("blueprint",)),
+        ]
+        with pytest.raises(StageExit, match="blueprint"):
+            run_stages(stages, jobs=2)
+        assert calls == []
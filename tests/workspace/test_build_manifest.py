@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+
+from punchbox.workspace.build_manifest import BuildManifest
+from punchbox.workspace.build_manifest import file_digest
+
+
+class TestBuildManifest(object):
+    def test_stage_skipped_until_inputs_or_outputs_change(self, tmp_path: Path) -> None:
+        manifest_path = str(tmp_path / "build-manifest.json")
+        template = tmp_path / "Vagrantfile.j2"
+        output = tmp_path / "Vagrantfile"
+        template.write_text("{{ box }}")
+        output.write_text("ubuntu")
+        inputs = {"template": file_digest(str(template))}
+
+        manifest = BuildManifest(manifest_path)
+        assert not manifest.is_up_to_date("vagrantfile", inputs, [str(output)])
+        manifest.record("vagrantfile", inputs, [str(output)])
+        manifest.save()
+
+        manifest = BuildManifest(manifest_path)
+        assert manifest.is_up_to_date("vagrantfile", inputs, [str(output)])
+        template.write_text("{{ box }} ")
+        changed_inputs = {"template": file_digest(str(template))}
+        assert not manifest.is_up_to_date("vagrantfile", changed_inputs, [str(output)])
+        output.write_text("edited by hand")
+        assert not manifest.is_up_to_date("vagrantfile", inputs, [str(output)])
+        output.unlink()
+        assert not manifest.is_up_to_date("vagrantfile", inputs, [str(output)])
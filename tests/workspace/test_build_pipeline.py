@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+
+from typing import Any
+from typing import Dict
+
+import jinja2
+import pytest
+
+from _pytest.monkeypatch import MonkeyPatch
+
+from punchbox.common_lib.data_classes import punchbox_configuration
+from punchbox.generate import generate_helper
+from punchbox.generate import layered_settings
+from punchbox.utils import serialization
+from punchbox.workspace.build_pipeline import BuildPipeline
+
+
+@pytest.fixture()
+def conf(tmpdir: Any) -> punchbox_configuration.Punchbox:
+    root = str(tmpdir)
+    settings = {"platform": {"platform_id": "test"}, "vagrant": {"os": "bionic"}}
+    topology = {"servers": {"server1": {"services": []}}}
+    files = {
+        "settings.yml": serialization.dump_yaml(settings),
+        "topology.yml": serialization.dump_yaml(topology),
+        "deployment.yml.j2": "platform: {{ platform.platform_id }}\n",
+        "Vagrantfile.j2": "{{ os }} {{ servers | length }}\n",
+    }
+    for name, content in files.items():
+        with open(os.path.join(root, name), "w") as outfile:
+            outfile.write(content)
+    return punchbox_configuration.Punchbox(
+        version="1.0",
+        env={
+            "deployer": os.path.join(root, "deployer"),
+            "type": "test",
+            "vagrantfile": os.path.join(root, "Vagrantfile"),
+            "workspace": root,
+        },
+        punch={
+            "blueprint": os.path.join(root, "blueprint.yml"),
+            "deployment_settings": os.path.join(root, "deployment.yml"),
+            "deployment_settings_template": os.path.join(root, "deployment.yml.j2"),
+            "punchplatform_deployment_settings": os.path.join(root, "legacy.json"),
+            "resolv_conf": os.path.join(root, "resolv.hjson"),
+            "resolv_conf_template": os.path.join(root, "resolv.hjson.j2"),
+            "user_resolver": os.path.join(root, "resolv.yml"),
+            "user_settings": os.path.join(root, "settings.yml"),
+            "user_topology": os.path.join(root, "topology.yml"),
+        },
+        vagrant={
+            "template": os.path.join(root, "Vagrantfile.j2"),
+            "vagrantfile": os.path.join(root, "Vagrantfile"),
+        },
+    )
+
+
+class TestBuildPipeline(object):
+    def test_stages_share_parsed_documents(
+        self, conf: punchbox_configuration.Punchbox, monkeypatch: MonkeyPatch
+    ) -> None:
+        blueprint: Dict[str, Any] = {
+            "platform": {"platform_id": "test"},
+            "services": {},
+        }
+        monkeypatch.setattr(
+            generate_helper, "build_blueprint", lambda *args: dict(blueprint)
+        )
+        loaded = []
+        load_yaml = serialization.load_yaml
+
+        def counting_load_yaml(stream: Any) -> Any:
+            loaded.append(stream)
+            return load_yaml(stream)
+
+        monkeypatch.setattr(serialization, "load_yaml", counting_load_yaml)
+        pipeline = BuildPipeline(conf)
+        pipeline.vagrantfile()
+        pipeline.blueprint()
+        pipeline.deployment_settings()
+        # the user settings and topology only, the blueprint is never read back
+        assert len(loaded) == 2
+        with open(conf.vagrant.vagrantfile) as infile:
+            assert infile.read() == "bionic 1"
+        with open(conf.punch.deployment_settings) as infile:
+            assert infile.read() == "platform: test"
+        pipeline.legacy_settings()
+        with open(conf.punch.punchplatform_deployment_settings) as infile:
+            assert json.load(infile) == {"platform": "test"}
+
+    def test_skipped_stage_output_is_read_from_disk(
+        self, conf: punchbox_configuration.Punchbox
+    ) -> None:
+        with open(conf.punch.blueprint, "w") as outfile:
+            outfile.write("platform:\n  platform_id: ondisk\nservices: {}\n")
+        pipeline = BuildPipeline(conf)
+        pipeline.deployment_settings()
+        with open(conf.punch.deployment_settings) as infile:
+            assert infile.read() == "platform: ondisk"
+
+    def test_memory_and_file_renders_agree(
+        self, conf: punchbox_configuration.Punchbox, monkeypatch: MonkeyPatch
+    ) -> None:
+        platform = layered_settings.LayeredSettings({"platform_id": "test"})
+        blueprint = {"platform": platform, "users": {"zeta": {}, "alpha": {}}}
+        monkeypatch.setattr(
+            generate_helper,
+            "build_blueprint",
+            lambda *args: layered_settings.materialise(blueprint),
+        )
+        with open(conf.punch.deployment_settings_template, "w") as outfile:
+            outfile.write("{% for user in users %}{{ user }} {% endfor %}\n")
+        pipeline = BuildPipeline(conf)
+        pipeline.blueprint()
+        pipeline.deployment_settings()
+        in_memory = pipeline.deployment_settings_text
+        # the blueprint stage skipped, the blueprint is read from its file
+        BuildPipeline(conf).deployment_settings()
+        with open(conf.punch.deployment_settings) as infile:
+            assert infile.read() == in_memory == "alpha zeta "
+
+    def test_failed_render_keeps_the_previous_file(
+        self, conf: punchbox_configuration.Punchbox
+    ) -> None:
+        pipeline = BuildPipeline(conf)
+        pipeline.vagrantfile()
+        with open(conf.vagrant.template, "w") as outfile:
+            outfile.write("{{ os }}\n" * 10000 + "{{ undefined }}\n")
+        with pytest.raises(jinja2.UndefinedError):
+            BuildPipeline(conf).vagrantfile()
+        with open(conf.vagrant.vagrantfile) as infile:
+            assert infile.read() == "bionic 1"
+        assert sorted(os.listdir(os.path.dirname(conf.vagrant.vagrantfile))) == [
+            "Vagrantfile",
+            "Vagrantfile.j2",
+            "deployment.yml.j2",
+            "settings.yml",
+            "topology.yml",
+        ]
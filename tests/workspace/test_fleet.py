@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+
+from typing import Any
+
+from punchbox.workspace import fleet
+
+
+class TestFleet(object):
+    def test_expand_workspaces(self, tmpdir: Any) -> None:
+        for name in ("platform-b", "platform-a", "other"):
+            tmpdir.mkdir(name)
+        root = str(tmpdir)
+        assert fleet.expand_workspaces(
+            [os.path.join(root, "other"), os.path.join(root, "*")]
+        ) == [
+            os.path.join(root, "other"),
+            os.path.join(root, "platform-a"),
+            os.path.join(root, "platform-b"),
+        ]
+
+    def test_failures_are_reported(self, tmpdir: Any) -> None:
+        missing = str(tmpdir.join("missing"))
+        builds = fleet.build_all(
+            [missing], processes=1, template_cache=str(tmpdir.join("jinja"))
+        )
+        assert [build.workspace for build in builds] == [missing]
+        assert not builds[0].succeeded
+        assert "punchbox.yml" in builds[0].error
+        assert fleet.summary(builds).splitlines()[-1] == "    0 succeeded, 1 failed"